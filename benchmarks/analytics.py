@@ -0,0 +1,70 @@
+"""
+Benchmark of the NumPy growth analytics on a synthetic multi-year channel history.
+
+Usage:
+    python -m benchmarks.analytics --channels 2000 --days 1095
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CHANNELS = 2_000
+DEFAULT_DAYS = 3 * 365
+DEFAULT_BUDGET_S = 1.0
+
+METRICS = ["total_views", "channel_subs"]
+
+
+def best_of(repeat: int, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--channels", type=int, default=DEFAULT_CHANNELS)
+    arg_parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_S,
+                            help="Maximum total duration in seconds.")
+    args = arg_parser.parse_args(argv)
+
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from benchmarks import history
+    from yt_common.growth import breakouts_on, growth_metrics, load_series
+
+    channels = history.channel_history(args.channels * args.days, days=args.days)
+
+    load_s, (ids, days, matrices) = best_of(args.repeat, lambda: load_series(channels, METRICS))
+    metrics_s, results = best_of(
+        args.repeat, lambda: {metric: growth_metrics(matrix) for metric, matrix in matrices.items()}
+    )
+    flagged_s, flagged = best_of(
+        args.repeat, lambda: {metric: breakouts_on(ids, result) for metric, result in results.items()}
+    )
+
+    total_s = load_s + metrics_s + flagged_s
+    print(json.dumps({
+        "channels": len(ids),
+        "days": len(days),
+        "snapshots": len(channels),
+        "load_series_s": round(load_s, 4),
+        "growth_metrics_s": round(metrics_s, 4),
+        "breakouts_s": round(flagged_s, 4),
+        "total_s": round(total_s, 4),
+        "breakouts": {metric: len(df) for metric, df in flagged.items()},
+    }, indent=2))
+    return 0 if total_s <= args.budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Synthetic BigQuery histories for the benchmark suite.
+
+The generated frames follow the schemas from `updating_tables_daily/yt_config/schemas.py`
+and end on the current date, so the date arithmetic of the functions
+(`CURRENT_DATE()`, `datetime.now()`) hits the generated rows.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stand_ins import load_fixture
+
+CHANNEL_HISTORY_DAYS = 90
+TRENDING_HISTORY_DAYS = 30
+PL_MARKET_SHARE = 0.9
+PL_AUDIO_SHARE = 0.7
+
+
+def channel_ids(num_of_channels: int) -> np.ndarray:
+    return np.array([f"UC{i:022d}" for i in range(num_of_channels)], dtype=object)
+
+
+def channel_history(snapshots: int, days: int = CHANNEL_HISTORY_DAYS, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a channel info history with (roughly) the requested number of daily snapshots.
+
+    Args:
+        snapshots (int): Total number of rows, i.e. channels x days.
+        days (int): Number of days of history.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: Rows shaped like `CHANNEL_INFO_SCHEMA`.
+    """
+    rng = np.random.default_rng(seed)
+    days = max(8, min(days, snapshots))
+    num_of_channels = max(5, snapshots // days)
+    template = load_fixture("youtube_channels_list.json")["items"][0]
+
+    ids = channel_ids(num_of_channels)
+    base_views = rng.integers(10_000, 500_000_000, num_of_channels)
+    views_rate = rng.integers(0, 2_000_000, num_of_channels)
+    base_subs = rng.integers(100, 5_000_000, num_of_channels)
+    subs_rate = rng.integers(0, 5_000, num_of_channels)
+    markets = np.where(rng.random(num_of_channels) < PL_MARKET_SHARE, "PL", "None")
+
+    today = pd.Timestamp(datetime.date.today())
+    day_offsets = np.arange(days)[::-1]
+    channel_idx = np.repeat(np.arange(num_of_channels), days)
+    day_idx = np.tile(np.arange(days), num_of_channels)
+
+    return pd.DataFrame({
+        "channel_id": ids[channel_idx],
+        "channel_name": np.array([f"Kanał {i}" for i in range(num_of_channels)], dtype=object)[channel_idx],
+        "kind": template["kind"],
+        "channel_published": pd.Timestamp(template["snippet"]["publishedAt"]),
+        "channel_logo_url": template["snippet"]["thumbnails"]["medium"]["url"],
+        "total_views": base_views[channel_idx] + views_rate[channel_idx] * day_idx,
+        "channel_market": markets[channel_idx],
+        "channel_subs": base_subs[channel_idx] + subs_rate[channel_idx] * day_idx,
+        "channel_videos": rng.integers(1, 2_000, num_of_channels)[channel_idx],
+        "channel_description": template["snippet"]["description"],
+        "updated_at": today - pd.to_timedelta(day_offsets[day_idx], unit="D"),
+    })
+
+
+def channel_metadata(channels: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return one metadata row per channel of a channel history.
+
+    The content hashes are placeholders, like the ones of a migrated table, so the first
+    ingestion stores a new version of every refreshed channel.
+    """
+    metadata = channels.drop_duplicates("channel_id")
+    return metadata.assign(content_hash="", valid_from=metadata["updated_at"])[[
+        "channel_id", "content_hash", "channel_name", "kind", "channel_published", "channel_logo_url",
+        "channel_market", "channel_description", "valid_from",
+    ]]
+
+
+def trending_history(rows_per_day: int, num_of_channels: int, days: int = TRENDING_HISTORY_DAYS,
+                     seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a daily top videos history.
+
+    Args:
+        rows_per_day (int): Number of trending videos captured each day.
+        num_of_channels (int): Size of the channel pool the videos are drawn from.
+        days (int): Number of days of history, ending yesterday.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: Rows shaped like `DAILY_TOP_VIDEOS_SCHEMA`.
+    """
+    rng = np.random.default_rng(seed + 1)
+    template = load_fixture("youtube_videos_list.json")["items"][0]
+    category_ids = np.array([c["id"] for c in load_fixture("youtube_video_categories_list.json")["items"]])
+    rows = rows_per_day * days
+
+    today = pd.Timestamp(datetime.date.today())
+    day_offsets = np.repeat(np.arange(1, days + 1), rows_per_day)
+
+    return pd.DataFrame({
+        "video_id": np.array([f"v{i:010d}" for i in range(rows)], dtype=object),
+        "kind": template["kind"],
+        "live_broadcast": template["snippet"]["liveBroadcastContent"],
+        "channel_id": channel_ids(num_of_channels)[rng.integers(0, num_of_channels, rows)],
+        "video_category_id": category_ids[rng.integers(0, len(category_ids), rows)],
+        "video_title": template["snippet"]["title"],
+        "video_description": template["snippet"]["description"],
+        "default_language": template["snippet"]["defaultLanguage"],
+        "default_audio_language": np.where(rng.random(rows) < PL_AUDIO_SHARE, "pl", "en"),
+        "video_published": pd.Timestamp(template["snippet"]["publishedAt"]),
+        "video_duration": rng.integers(30, 7_200, rows),
+        "video_views": rng.lognormal(12, 1.5, rows).astype(np.int64),
+        "video_likes": rng.integers(0, 100_000, rows),
+        "video_comments": rng.integers(0, 10_000, rows),
+        "video_captured_at": today - pd.to_timedelta(day_offsets, unit="D"),
+    })
+
+
+def categories_table() -> pd.DataFrame:
+    """Return the categories dimension built from the recorded videoCategories response, as of yesterday."""
+    response = load_fixture("youtube_video_categories_list.json")
+    items = response["items"]
+    return pd.DataFrame({
+        "category_id": [c["id"] for c in items],
+        "category_name": [c["snippet"]["title"] for c in items],
+        "region_code": "PL",
+        "etag": response["etag"],
+        "updated_at": pd.Timestamp(datetime.date.today() - datetime.timedelta(days=1)),
+    })
@@ -0,0 +1,250 @@
+"""
+pandas implementations of the BigQuery queries issued by the functions.
+
+Each handler is registered with a pattern that identifies the query shape. When a
+function starts issuing a query no pattern matches, the `LocalBigQuery` stand-in
+raises, so the handlers have to be kept in step with the SQL of the functions.
+"""
+import datetime
+import re
+
+import pandas as pd
+
+TABLE_CHANNEL_INFO = "yt_channel_info"
+TABLE_CATEGORIES_NAME = "categories_names"
+TABLE_DAILY_TOP_VIDEOS = "yt_daily_top_videos"
+# Default names of the tables behind the TABLE_CHANNEL_INFO and TABLE_DAILY_TOP_VIDEOS views
+TABLE_CHANNEL_SNAPSHOTS = f"{TABLE_CHANNEL_INFO}_snapshots"
+TABLE_CHANNEL_METADATA = f"{TABLE_CHANNEL_INFO}_metadata"
+TABLE_VIDEO_SNAPSHOTS = f"{TABLE_DAILY_TOP_VIDEOS}_snapshots"
+TABLE_VIDEO_METADATA = f"{TABLE_DAILY_TOP_VIDEOS}_metadata"
+
+
+def _dates(column: pd.Series) -> pd.Series:
+    return pd.to_datetime(column).dt.normalize()
+
+
+def _days_ago(days: int) -> pd.Timestamp:
+    return pd.Timestamp(datetime.date.today() - datetime.timedelta(days=days))
+
+
+def latest_metadata(storage, sql, params):
+    columns = [column.strip() for column in re.search(r"SELECT\s+(.*?)\s+FROM", sql, re.S).group(1).split(",")]
+    table = re.search(r"FROM\s+`[^`]*?\.([^`.]+)`", sql).group(1)
+    id_column = re.search(r"PARTITION BY (\w+)", sql).group(1)
+    metadata = storage.table(table)
+    if not len(metadata):
+        return pd.DataFrame(columns=columns)
+    if "ids" in params:
+        metadata = metadata[metadata[id_column].isin(params["ids"])]
+    latest = metadata.sort_values("valid_from").drop_duplicates(id_column, keep="last")
+    return latest[columns].reset_index(drop=True)
+
+
+def shard_statuses(storage, sql, params):
+    table = re.search(r"FROM\s+`[^`]*?\.([^`.]+)`", sql).group(1)
+    columns = ["shard", "attempt", "status", "error", "dispatched_at"]
+    statuses = storage.table(table)
+    if not len(statuses):
+        return pd.DataFrame(columns=columns)
+    statuses = statuses[statuses["run_id"] == params["run_id"]]
+    dispatched = statuses[statuses["status"] == "dispatched"].groupby(["shard", "attempt"], as_index=False)
+    statuses = statuses.assign(reported=statuses["status"] != "dispatched")
+    latest = statuses.sort_values(["updated_at", "reported"]).drop_duplicates(["shard", "attempt"], keep="last")
+    latest = latest.merge(dispatched["updated_at"].min().rename(columns={"updated_at": "dispatched_at"}),
+                          on=["shard", "attempt"], how="left")
+    return latest[columns].reset_index(drop=True)
+
+
+def shard_channel_ids(storage, sql, params):
+    table = re.search(r"FROM\s+`[^`]*?\.([^`.]+)`", sql).group(1)
+    statuses = storage.table(table)
+    first = statuses[(statuses["run_id"] == params["run_id"]) & (statuses["attempt"] == 1)
+                     & (statuses["status"] == "dispatched") & statuses["shard"].isin(params["shards"])]
+    return first[["shard", "channel_ids"]].reset_index(drop=True)
+
+
+def ingested_videos(storage, sql, params):
+    day = pd.Timestamp(re.search(r"DATE\('(\d{4}-\d{2}-\d{2})'\)", sql).group(1))
+    columns = [column.strip() for column in re.search(r"SELECT\s+(.*?)\s+FROM", sql, re.S).group(1).split(",")]
+    snapshots = storage.table(TABLE_VIDEO_SNAPSHOTS)
+    if not len(snapshots):
+        return pd.DataFrame(columns=columns)
+    snapshots = snapshots[_dates(snapshots["video_captured_at"]) == day]
+    videos = snapshots.merge(storage.table(TABLE_VIDEO_METADATA).drop(columns="valid_from"),
+                             on=["video_id", "content_hash"])
+    latest = videos.sort_values("video_views").drop_duplicates("video_id", keep="last")
+    return latest[columns].reset_index(drop=True)
+
+
+def ingested_channels(storage, sql, params):
+    day = pd.Timestamp(re.search(r"DATE\('(\d{4}-\d{2}-\d{2})'\)", sql).group(1))
+    columns = [column.strip() for column in re.search(r"SELECT\s+(.*?)\s+FROM", sql, re.S).group(1).split(",")]
+    snapshots = storage.table(TABLE_CHANNEL_SNAPSHOTS)
+    if not len(snapshots):
+        return pd.DataFrame(columns=columns)
+    snapshots = snapshots[_dates(snapshots["updated_at"]) == day]
+    channels = snapshots.merge(storage.table(TABLE_CHANNEL_METADATA).drop(columns="valid_from"),
+                               on=["channel_id", "content_hash"])
+    latest = channels.sort_values("total_views").drop_duplicates("channel_id", keep="last")
+    return latest[columns].reset_index(drop=True)
+
+
+def daily_top_videos(storage, sql, params):
+    run_date = pd.Timestamp(re.search(r"DATE\('(\d{4}-\d{2}-\d{2})'\)", sql).group(1))
+    limit = int(re.search(r"LIMIT (\d+)", sql).group(1))
+    videos = storage.table(TABLE_DAILY_TOP_VIDEOS)
+    captured = _dates(videos["video_captured_at"])
+    day = captured[captured <= run_date].max()
+    videos = videos[(captured == day) & (videos["default_audio_language"] == "pl")]
+    videos = videos[videos["video_category_id"].astype(str).isin(params["category_ids"])]
+    channels = storage.table(TABLE_CHANNEL_INFO)
+    channels = channels[channels["channel_id"].isin(videos["channel_id"]) & (_dates(channels["updated_at"]) <= day)]
+    latest_channels = channels.sort_values("updated_at").drop_duplicates("channel_id", keep="last")
+    df = videos.merge(latest_channels[["channel_id", "channel_name"]], on="channel_id")
+    df = df.sort_values("video_views", ascending=False).drop_duplicates("video_category_id").head(limit)
+    return df[["video_id", "video_title", "video_views", "video_category_id", "channel_name"]].reset_index(drop=True)
+
+
+def top_categories_weekly(storage, sql, params):
+    videos = storage.table(TABLE_DAILY_TOP_VIDEOS)
+    captured = _dates(videos["video_captured_at"])
+    videos = videos[(captured >= _days_ago(7)) & (captured <= _days_ago(1))]
+    return videos.groupby("video_category_id").size().rename("occurrences").reset_index()
+
+
+def known_hashes(storage, sql, params):
+    id_column, table = re.search(r"SELECT\s+(\w+), content_hash\s+FROM\s+`[^`]*?\.([^`.]+)`", sql).groups()
+    metadata = storage.table(table)
+    if not len(metadata):
+        return pd.DataFrame(columns=[id_column, "content_hash"])
+    return metadata[[id_column, "content_hash"]].drop_duplicates()
+
+
+def channel_history(storage, sql, params):
+    run_date = pd.Timestamp(re.search(r"DATE\('(\d{4}-\d{2}-\d{2})'\)", sql).group(1))
+    days = re.search(r"INTERVAL (\d+) DAY", sql)
+    channels = storage.table(TABLE_CHANNEL_INFO)
+    updated = _dates(channels["updated_at"])
+    in_history = updated <= run_date
+    if days:
+        in_history &= updated >= run_date - pd.Timedelta(days=int(days.group(1)))
+    channels = channels[(channels["channel_market"] == "PL") & in_history]
+    return channels.groupby(["channel_id", "updated_at"], as_index=False).agg(
+        channel_name=("channel_name", "first"),
+        total_views=("total_views", "max"),
+        channel_subs=("channel_subs", "max"),
+    )
+
+
+def _hours(delta: pd.Series) -> pd.Series:
+    return delta.dt.total_seconds() / 3600
+
+
+def merge_video_velocity(storage, sql, params):
+    state_name, staging_name = re.findall(r"`[^`]*?\.([^`.]+)` AS [st]\b", sql)
+    captured_at = pd.Timestamp(params["captured_at"])
+    retention = pd.Timedelta(days=params["retention_days"])
+    state = storage.table(state_name)
+    staging = storage.table(staging_name).set_index("video_id")
+
+    if len(state):
+        state = state.set_index("video_id")
+        matched = state.index.intersection(staging.index)
+        new = staging.loc[matched]
+        old = state.loc[matched]
+        newer = new["captured_at"] > old["last_captured_at"]
+        matched = matched[newer.to_numpy()]
+        new, old = new.loc[matched], old.loc[matched]
+        state.loc[matched, "video_title"] = new["video_title"]
+        state.loc[matched, "views_per_hour"] = (new["video_views"] - old["last_views"]) / _hours(
+            new["captured_at"] - old["last_captured_at"])
+        state.loc[matched, "days_trending"] = old["days_trending"] + (
+            new["captured_at"].dt.normalize() > old["last_captured_at"].dt.normalize()).astype(int)
+        state.loc[matched, "last_views"] = new["video_views"]
+        state.loc[matched, "last_captured_at"] = new["captured_at"]
+        stale = ~state.index.isin(staging.index) & (state["last_captured_at"] < captured_at - retention)
+        state = state[~stale].reset_index()
+    inserted = staging.loc[~staging.index.isin(state["video_id"] if len(state) else [])]
+    inserted = pd.DataFrame({
+        "video_id": inserted.index,
+        "channel_id": inserted["channel_id"].to_numpy(),
+        "video_title": inserted["video_title"].to_numpy(),
+        "first_seen_at": inserted["captured_at"].to_numpy(),
+        "first_views": inserted["video_views"].to_numpy(),
+        "last_captured_at": inserted["captured_at"].to_numpy(),
+        "last_views": inserted["video_views"].to_numpy(),
+        "days_trending": 1,
+        "views_per_hour": (inserted["video_views"] / _hours(inserted["captured_at"] - inserted["video_published"])).to_numpy(),
+    })
+    storage.write(state_name, pd.concat([state, inserted], ignore_index=True) if len(state) else inserted, "replace")
+    return pd.DataFrame()
+
+
+def records_index(storage, sql, params):
+    columns = [column.strip() for column in re.search(r"SELECT\s+(.*?)\s+FROM", sql, re.S).group(1).split(",")]
+    table = re.search(r"FROM\s+`[^`]*?\.([^`.]+)`", sql).group(1)
+    records = storage.table(table)
+    if not len(records):
+        return pd.DataFrame(columns=columns)
+    return records[columns]
+
+
+def channel_counters(storage, sql, params):
+    day = pd.Timestamp(re.search(r"DATE\('(\d{4}-\d{2}-\d{2})'\)", sql).group(1))
+    # The snapshot tables start empty, the wide history stands in for the snapshots of past days
+    channels = storage.table(TABLE_CHANNEL_INFO)
+    channels = channels[_dates(channels["updated_at"]) == day]
+    return channels.groupby("channel_id", as_index=False).agg(
+        total_views=("total_views", "max"),
+        channel_subs=("channel_subs", "max"),
+    )
+
+
+def category_names(storage, sql, params):
+    categories = storage.table(TABLE_CATEGORIES_NAME)
+    return categories.drop_duplicates("category_id")[["category_id", "category_name"]]
+
+
+def category_etags(storage, sql, params):
+    categories = storage.table(TABLE_CATEGORIES_NAME)
+    return categories.drop_duplicates("region_code")[["region_code", "etag"]]
+
+
+def _weekly_difference(storage, metric: str, alias: str) -> pd.DataFrame:
+    channels = storage.table(TABLE_CHANNEL_INFO)
+    channels = channels[channels["channel_market"] == "PL"]
+    updated = _dates(channels["updated_at"])
+    latest = channels[updated == _days_ago(1)].groupby("channel_id")[metric].max()
+    week_ago = channels[updated == _days_ago(7)].groupby("channel_id")[metric].max()
+    df = channels[["channel_id", "channel_name", "channel_logo_url"]].drop_duplicates()
+    df[alias] = df["channel_id"].map(latest - week_ago)
+    return df.reset_index(drop=True)
+
+
+def views_increase(storage, sql, params):
+    return _weekly_difference(storage, "total_views", "views_difference")
+
+
+def subs_increase(storage, sql, params):
+    return _weekly_difference(storage, "channel_subs", "subs_difference")
+
+
+HANDLERS = [
+    (r"^\s*MERGE", merge_video_velocity),
+    (r"PARTITION BY \w+ ORDER BY valid_from DESC", latest_metadata),
+    (r"PARTITION BY shard, attempt", shard_statuses),
+    (r"shard IN UNNEST\(@shards\)", shard_channel_ids),
+    (r"PARTITION BY video_id ORDER BY video_views DESC", ingested_videos),
+    (r"PARTITION BY channel_id ORDER BY total_views DESC", ingested_channels),
+    (r"entity_id, entity_name, value, achieved_on", records_index),
+    (r"MAX\(channel_subs\) AS channel_subs\s+FROM\s+`[^`]*_snapshots`", channel_counters),
+    (r"default_audio_language = 'pl'", daily_top_videos),
+    (r"(?i)AS occurrences", top_categories_weekly),
+    (r"AS views_difference", views_increase),
+    (r"AS subs_difference", subs_increase),
+    (r"SELECT\s+\w+, content_hash", known_hashes),
+    (r"GROUP BY\s+channel_id, updated_at", channel_history),
+    (r"ANY_VALUE\(category_name\)", category_names),
+    (r"ANY_VALUE\(etag\)", category_etags),
+]
@@ -0,0 +1,246 @@
+"""
+Offline benchmark of the Cloud Function entry points.
+
+Every scenario runs in a fresh process against the recorded API fixtures and a
+synthetic BigQuery history, and reports the latency, peak RSS and external call
+counts per stage. Results are written as sorted JSON so that a regression shows up
+as a diff of the committed results file.
+
+Usage:
+    python -m benchmarks.run --scale small
+    python -m benchmarks.run --scale large --scenario youtube_data_pipeline
+    python -m benchmarks.run --scale medium --compare benchmarks/results/medium.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# Scenario name -> (function folder, entry point[, request args])
+SCENARIOS = {
+    "youtube_data_pipeline": ("updating_tables_daily", "youtube_data_pipeline"),
+    "youtube_data_pipeline_stats": ("updating_tables_daily", "youtube_data_pipeline", {"mode": "stats"}),
+    "youtube_data_pipeline_sharded": ("updating_tables_daily", "youtube_data_pipeline", {"role": "coordinator"}),
+    "tweet_daily_top": ("tweet_daily_top", "tweet_daily_top"),
+    "tweet_weekly_growth": ("tweet_weekly_growth", "hello_http"),
+    "tweet_top_categories": ("tweet_top_categories", "hello_http"),
+    "tweet_breakout_channels": ("tweet_breakout_channels", "tweet_breakout_channels"),
+    "tweet_records": ("tweet_records", "tweet_records"),
+}
+
+# Scale name -> channel snapshots in the history, trending rows per day
+SCALES = {
+    "small": (1_000, 100),
+    "medium": (100_000, 1_000),
+    "large": (1_000_000, 10_000),
+}
+
+RSS_SAMPLE_INTERVAL = 0.005
+REGRESSION_THRESHOLD = 0.10
+
+
+class LocalRequest:
+    """Minimal stand-in for `flask.Request`."""
+
+    def __init__(self, args: dict = None, headers: dict = None, json_body: dict = None):
+        self.args = args or {}
+        self.headers = headers or {}
+        self._json = json_body
+
+    def get_json(self, silent=False):
+        return self._json
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * resource.getpagesize() / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler(threading.Thread):
+    """Samples the resident set size in the background to attribute peaks to stages."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.samples.append((time.perf_counter(), current_rss_mb()))
+            time.sleep(RSS_SAMPLE_INTERVAL)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def peak_between(self, start: float, end: float) -> float:
+        window = [rss for at, rss in self.samples if start <= at <= end]
+        return max(window) if window else current_rss_mb()
+
+
+def run_scenario(scenario: str, channel_snapshots: int, trending_rows: int) -> dict:
+    """
+    Run one entry point against the stand-ins. Meant to be called in a fresh process.
+
+    Returns:
+        dict: Latency, peak RSS, per-stage metrics and call counts of the scenario.
+    """
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from benchmarks import history, queries, stand_ins
+    from yt_common import instrumentation
+    from yt_common.loader import load_function_module
+
+    os.environ.update({
+        "PROJECT_ID": stand_ins.PROJECT_ID,
+        "DATASET_NAME": stand_ins.DATASET_NAME,
+        "TABLE_CHANNEL_INFO": queries.TABLE_CHANNEL_INFO,
+        "TABLE_CATEGORIES_NAME": queries.TABLE_CATEGORIES_NAME,
+        "TABLE_DAILY_TOP_VIDEOS": queries.TABLE_DAILY_TOP_VIDEOS,
+    })
+
+    channels = history.channel_history(channel_snapshots)
+    channel_ids = channels["channel_id"].unique()
+    # The wide histories stand in for the views, the snapshot tables start empty
+    storage = stand_ins.LocalStorage({
+        queries.TABLE_CHANNEL_INFO: channels,
+        queries.TABLE_CHANNEL_METADATA: history.channel_metadata(channels),
+        queries.TABLE_DAILY_TOP_VIDEOS: history.trending_history(trending_rows, len(channel_ids)),
+        queries.TABLE_CATEGORIES_NAME: history.categories_table(),
+    }, views=(queries.TABLE_CHANNEL_INFO, queries.TABLE_DAILY_TOP_VIDEOS))
+    youtube = stand_ins.LocalYouTube(trending_rows, list(channel_ids))
+
+    sampler = RssSampler()
+    stage_peaks = {}
+
+    def record_peak(run, span):
+        end = time.perf_counter()
+        peak = sampler.peak_between(end - span.duration, end)
+        stage_peaks[span.stage] = max(stage_peaks.get(span.stage, 0.0), peak)
+
+    function_dir, entry_point, *request_args = SCENARIOS[scenario]
+    with tempfile.TemporaryDirectory() as workdir, stand_ins.installed(storage, youtube, queries.HANDLERS):
+        os.chdir(workdir)
+        try:
+            module = load_function_module(REPO_ROOT, function_dir)
+            stand_ins.CALLS.clear()
+            instrumentation.add_span_listener(record_peak)
+            sampler.start()
+            started = time.perf_counter()
+            body, status = getattr(module, entry_point)(LocalRequest(*request_args, headers={"X-Timing": "1"}))
+            latency = time.perf_counter() - started
+        finally:
+            if sampler.is_alive():
+                sampler.stop()
+            instrumentation.remove_span_listener(record_peak)
+            os.chdir(REPO_ROOT)
+
+    stages = body.get("stages", {}) if isinstance(body, dict) else {}
+    for stage, metrics in stages.items():
+        metrics["peak_rss_mb"] = round(stage_peaks.get(stage, 0.0), 1)
+    return {
+        "channel_snapshots": channel_snapshots,
+        "trending_rows": trending_rows,
+        "status": status,
+        "message": body.get("message") if isinstance(body, dict) else body,
+        "latency_s": round(latency, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": stages,
+        "calls": dict(stand_ins.CALLS),
+    }
+
+
+def run_isolated(scenario: str, channel_snapshots: int, trending_rows: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_scenario, (scenario, channel_snapshots, trending_rows))
+
+
+def compare(previous: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """
+    List the metrics that changed by more than the threshold between two result sets.
+
+    Returns:
+        list: Human readable lines, one per changed metric.
+    """
+    changes = []
+
+    def check(label, old, new):
+        if old is None or new is None:
+            return
+        if old == 0:
+            if new != 0:
+                changes.append(f"{label}: {old} -> {new}")
+        elif abs(new - old) / old > threshold:
+            changes.append(f"{label}: {old} -> {new} ({(new - old) / old:+.0%})")
+
+    for scenario, result in current.items():
+        before = previous.get(scenario)
+        if before is None:
+            changes.append(f"{scenario}: new scenario")
+            continue
+        check(f"{scenario}.latency_s", before.get("latency_s"), result["latency_s"])
+        check(f"{scenario}.peak_rss_mb", before.get("peak_rss_mb"), result["peak_rss_mb"])
+        for stage, metrics in result["stages"].items():
+            before_stage = before.get("stages", {}).get(stage, {})
+            for metric in ("duration", "peak_rss_mb", "api_calls", "rows", "bytes"):
+                check(f"{scenario}.{stage}.{metric}", before_stage.get(metric), metrics.get(metric))
+        for call in sorted(set(result["calls"]) | set(before.get("calls", {}))):
+            check(f"{scenario}.calls.{call}", before.get("calls", {}).get(call, 0), result["calls"].get(call, 0))
+    return changes
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--scale", choices=SCALES, default="small")
+    arg_parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                            help="Scenario to run, may be repeated (default: all).")
+    arg_parser.add_argument("--channel-snapshots", type=int, help="Override the history size of the scale.")
+    arg_parser.add_argument("--trending-rows", type=int, help="Override the trending rows per day of the scale.")
+    arg_parser.add_argument("--output", help="Results file (default: benchmarks/results/<scale>.json).")
+    arg_parser.add_argument("--compare", help="Results file to compare against.")
+    args = arg_parser.parse_args(argv)
+
+    channel_snapshots, trending_rows = SCALES[args.scale]
+    channel_snapshots = args.channel_snapshots or channel_snapshots
+    trending_rows = args.trending_rows or trending_rows
+
+    results = {}
+    for scenario in args.scenario or SCENARIOS:
+        result = run_isolated(scenario, channel_snapshots, trending_rows)
+        results[scenario] = result
+        print(f"{scenario}: {result['latency_s']:.3f} s, peak RSS {result['peak_rss_mb']:.1f} MB, "
+              f"status {result['status']}")
+        for stage, metrics in sorted(result["stages"].items()):
+            print(f"    {stage:<15} {metrics['duration']:>9.4f} s  x{metrics['count']:<5} "
+                  f"{metrics['api_calls']:>6} calls  {metrics['rows']:>9} rows  {metrics['peak_rss_mb']:>8.1f} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.scale}.json")
+    if args.compare:
+        with open(args.compare) as f:
+            changes = compare(json.load(f), results)
+        print("\n".join(changes) if changes else "No changes above the threshold.")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
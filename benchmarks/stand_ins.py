@@ -0,0 +1,354 @@
+"""
+Offline stand-ins for the external services used by the Cloud Functions.
+
+- `LocalYouTube` replays the recorded YouTube Data API responses from `fixtures/`,
+  cloned to the requested number of trending videos and trimmed to the `fields` masks.
+- `LocalStorage` / `LocalBigQuery` keep the tables as DataFrames in memory and answer
+  the queries issued by the functions with pandas implementations registered per query shape.
+- `LocalTwitter` replays the recorded Twitter responses for `requests.post`,
+  `requests.get` (logo downloads) and `tweepy.API.simple_upload`.
+
+`installed` patches the client constructors before the function modules are imported,
+so the import-time `google.auth.default()` calls never reach the network.
+"""
+import collections
+import contextlib
+import copy
+import io
+import json
+import os
+import re
+import types
+from unittest import mock
+
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+PROJECT_ID = "bench-project"
+DATASET_NAME = "bench"
+
+# External calls made during a scenario, keyed by `<service>.<method>`
+CALLS = collections.Counter()
+
+
+def load_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _parse_fields(text: str, pos: int = 0) -> tuple:
+    """Parse a partial-response `fields` mask into nested dicts, an empty dict selecting the whole value."""
+    tree, name = {}, ""
+    while pos < len(text) and text[pos] != ")":
+        char = text[pos]
+        if char == "(":
+            selected, pos = _parse_fields(text, pos + 1)
+            _add_path(tree, name).update(selected)
+            name = ""
+        elif char == ",":
+            if name:
+                _add_path(tree, name)
+            name = ""
+        else:
+            name += char
+        pos += 1
+    if name:
+        _add_path(tree, name)
+    return tree, pos
+
+
+def _add_path(tree: dict, path: str) -> dict:
+    for key in path.split("/"):
+        tree = tree.setdefault(key, {})
+    return tree
+
+
+def _project(value, tree: dict):
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    return {key: _project(value[key], selected) for key, selected in tree.items() if key in value}
+
+
+def partial_response(response: dict, fields: str = None) -> dict:
+    """Keep the fields of a response selected by a `fields` mask, like the API does."""
+    return _project(response, _parse_fields(fields)[0]) if fields else response
+
+
+class _Request:
+    """Stand-in for `googleapiclient.http.HttpRequest`."""
+
+    def __init__(self, name: str, response: dict):
+        self.name = name
+        self.response = response
+        self.headers = {}
+
+    def execute(self):
+        CALLS[self.name] += 1
+        if self.response.get("etag") and self.headers.get("If-None-Match") == self.response["etag"]:
+            from googleapiclient.errors import HttpError
+
+            raise HttpError(types.SimpleNamespace(status=304, reason="Not Modified"), b"")
+        return self.response
+
+
+class _Resource:
+    def __init__(self, list_method):
+        self.list = list_method
+
+
+class LocalYouTube:
+    """
+    Stand-in for the `youtube` v3 discovery client.
+
+    Args:
+        trending_rows (int): Number of items returned by `videos.list(chart="mostPopular")`.
+        channel_ids (list): Channel ids the trending videos are attributed to.
+    """
+
+    def __init__(self, trending_rows: int, channel_ids: list):
+        video = load_fixture("youtube_videos_list.json")
+        template = video["items"][0]
+        items = []
+        for i in range(trending_rows):
+            item = copy.deepcopy(template)
+            item["id"] = f"t{i:010d}"
+            item["snippet"]["channelId"] = channel_ids[i % len(channel_ids)]
+            item["statistics"]["viewCount"] = str(int(template["statistics"]["viewCount"]) * (trending_rows - i))
+            items.append(item)
+        self._videos = dict(video, items=items)
+        self._channel_response = load_fixture("youtube_channels_list.json")
+        self._categories = load_fixture("youtube_video_categories_list.json")
+
+    def videos(self):
+        return _Resource(self._videos_list)
+
+    def channels(self):
+        return _Resource(self._channels_list)
+
+    def videoCategories(self):
+        return _Resource(self._video_categories_list)
+
+    def _videos_list(self, part, chart=None, regionCode=None, maxResults=5, id=None, fields=None, **kwargs):
+        if id is not None:
+            wanted = set(id.split(","))
+            items = [item for item in self._videos["items"] if item["id"] in wanted]
+            return _Request("youtube.videos.list", partial_response(dict(self._videos, items=items), fields))
+        return _Request("youtube.videos.list", partial_response(self._videos, fields))
+
+    def _channels_list(self, part, id, fields=None, **kwargs):
+        template = self._channel_response["items"][0]
+        items = [dict(template, id=channel_id) for channel_id in id.split(",")]
+        return _Request("youtube.channels.list", partial_response(dict(self._channel_response, items=items), fields))
+
+    def _video_categories_list(self, part, regionCode=None, **kwargs):
+        return _Request("youtube.videoCategories.list", self._categories)
+
+
+class LocalStorage:
+    """
+    In-memory tables, appended to by the `pandas_gbq.to_gbq` stand-in.
+
+    Args:
+        tables (dict): Name -> DataFrame of the initial tables.
+        views (tuple): Names of the tables standing in for views, holding the rows the view would return.
+    """
+
+    def __init__(self, tables: dict = None, views: tuple = ()):
+        self._frames = {name: [df] for name, df in (tables or {}).items()}
+        self._cache = {}
+        self.views = set(views)
+
+    def table(self, name: str) -> pd.DataFrame:
+        if name not in self._cache:
+            frames = self._frames.get(name, [])
+            self._cache[name] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        return self._cache[name]
+
+    def exists(self, name: str) -> bool:
+        return name in self._frames
+
+    def nbytes(self, name: str) -> int:
+        return int(self.table(name).memory_usage(deep=False).sum()) if self.exists(name) else 0
+
+    def write(self, name: str, df: pd.DataFrame, if_exists: str = "append") -> None:
+        if if_exists == "replace" or name not in self._frames:
+            self._frames[name] = []
+        self._frames[name].append(df)
+        self._cache.pop(name, None)
+
+    def to_gbq(self, dataframe, destination_table, project_id=None, if_exists="fail", **kwargs):
+        CALLS["bigquery.load"] += 1
+        self.write(destination_table.split(".")[-1], dataframe, if_exists)
+
+
+class QueryJob:
+    """Stand-in for `google.cloud.bigquery.QueryJob`."""
+
+    def __init__(self, df: pd.DataFrame, total_bytes_processed: int):
+        self._df = df
+        self.total_bytes_processed = total_bytes_processed
+
+    def result(self):
+        return self
+
+    def to_dataframe(self, *args, **kwargs):
+        return self._df
+
+    def __iter__(self):
+        return iter(self._df.to_dict("records"))
+
+
+class NotFound(Exception):
+    pass
+
+
+def query_parameters(job_config) -> dict:
+    """Return the values of the query parameters of a job configuration by name."""
+    parameters = getattr(job_config, "query_parameters", None) or []
+    return {
+        parameter.name: parameter.values if hasattr(parameter, "values") else parameter.value
+        for parameter in parameters
+    }
+
+
+class LocalBigQuery:
+    """
+    Stand-in for `google.cloud.bigquery.Client` backed by `LocalStorage`.
+
+    Args:
+        storage (LocalStorage): The tables.
+        handlers (list): `(pattern, handler)` pairs; the first pattern found in the SQL picks
+            the `handler(storage, sql, params)` returning the result DataFrame, `params` being
+            the query parameters of the job by name.
+    """
+
+    def __init__(self, storage: LocalStorage, handlers: list):
+        self.storage = storage
+        self.handlers = [(re.compile(pattern, re.S), handler) for pattern, handler in handlers]
+        self.view_queries = {}
+
+    def query(self, sql, job_config=None, **kwargs):
+        CALLS["bigquery.query"] += 1
+        for pattern, handler in self.handlers:
+            if pattern.search(sql):
+                scanned = sum(self.storage.nbytes(name) for name in referenced_tables(sql))
+                return QueryJob(handler(self.storage, sql, query_parameters(job_config)), scanned)
+        raise NotImplementedError(f"No local handler for query:\n{sql}")
+
+    def get_table(self, table_ref):
+        name = str(table_ref).split(".")[-1]
+        if not self.storage.exists(name):
+            raise NotFound(table_ref)
+        schema = [types.SimpleNamespace(name=column) for column in self.storage.table(name).columns]
+        table_type = "VIEW" if name in self.storage.views else "TABLE"
+        return types.SimpleNamespace(table_id=name, schema=schema, table_type=table_type,
+                                     view_query=self.view_queries.get(name))
+
+    def create_table(self, table, exists_ok=False, **kwargs):
+        name = getattr(table, "table_id", str(table)).split(".")[-1]
+        if getattr(table, "view_query", None):
+            self.storage.views.add(name)
+            self.view_queries[name] = table.view_query
+        if not self.storage.exists(name):
+            self.storage.write(name, pd.DataFrame())
+        return table
+
+    def update_table(self, table, fields, **kwargs):
+        name = getattr(table, "table_id", str(table)).split(".")[-1]
+        if "view_query" in fields:
+            self.view_queries[name] = table.view_query
+        return table
+
+
+def referenced_tables(sql: str) -> set:
+    return set(re.findall(r"`[^`]*?\.([^`.]+)`", sql))
+
+
+class _Response:
+    def __init__(self, status_code: int, body: dict = None, content: bytes = b""):
+        self.status_code = status_code
+        self._body = body or {}
+        self.content = content or json.dumps(self._body).encode()
+        self.text = self.content.decode("latin-1")
+
+    def json(self):
+        return self._body
+
+
+class _Media:
+    """Mimics the repr of `tweepy.models.Media`, which the functions parse for the media id."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        return f"Media({', '.join(f'{key}={value!r}' for key, value in self.__dict__.items())})"
+
+
+class LocalTwitter:
+    """Replays the recorded Twitter responses and serves a generated logo for image downloads."""
+
+    def __init__(self):
+        self._tweet = load_fixture("twitter_create_tweet.json")
+        self._media = load_fixture("twitter_media_upload.json")
+        self._logo = _logo_bytes()
+
+    def post(self, url, json=None, auth=None, **kwargs):
+        CALLS["twitter.create_tweet"] += 1
+        return _Response(self._tweet["status_code"], self._tweet["body"])
+
+    def get(self, url, **kwargs):
+        CALLS["http.get"] += 1
+        return _Response(200, content=self._logo)
+
+    def api(self, *args, **kwargs):
+        twitter = self
+
+        class LocalTweepyAPI:
+            def simple_upload(self, filename=None, file=None, **kwargs):
+                CALLS["twitter.media_upload"] += 1
+                return _Media(**twitter._media)
+
+        return LocalTweepyAPI()
+
+
+def _logo_bytes() -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (240, 240), (204, 32, 32)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@contextlib.contextmanager
+def installed(storage: LocalStorage, youtube: LocalYouTube, handlers: list):
+    """
+    Patch the Google, YouTube and Twitter clients with the local stand-ins.
+
+    Args:
+        storage (LocalStorage): Tables served by the BigQuery stand-in.
+        youtube (LocalYouTube): The YouTube stand-in.
+        handlers (list): Query handlers of the BigQuery stand-in.
+
+    Yields:
+        LocalBigQuery: The BigQuery stand-in.
+    """
+    bigquery_client = LocalBigQuery(storage, handlers)
+    twitter = LocalTwitter()
+    patches = [
+        ("google.auth.default", lambda *args, **kwargs: (None, PROJECT_ID)),
+        ("google.cloud.bigquery.Client", lambda *args, **kwargs: bigquery_client),
+        ("googleapiclient.discovery.build", lambda *args, **kwargs: youtube),
+        ("pandas_gbq.to_gbq", storage.to_gbq),
+        ("requests.post", twitter.post),
+        ("requests.get", twitter.get),
+        ("tweepy.API", twitter.api),
+        ("tweepy.OAuth1UserHandler", lambda *args, **kwargs: None),
+    ]
+    with contextlib.ExitStack() as stack:
+        for target, replacement in patches:
+            stack.enter_context(mock.patch(target, replacement))
+        yield bigquery_client
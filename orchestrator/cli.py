@@ -0,0 +1,149 @@
+"""
+Command line runner of the jobs for an arbitrary date or date range.
+
+Every date is processed in its own process of a pool, in the working directory
+`<output>/<date>/<job>`, where the rendered images (and in dry-run mode the CSV
+files and `tweets.jsonl`) are saved.
+
+Usage:
+    python orchestrator/cli.py daily_top --date 2024-09-01 --dry-run
+    python orchestrator/cli.py weekly_growth --start 2024-06-02 --end 2024-09-01 --dry-run --workers 8
+    python orchestrator/cli.py dag --start 2024-09-01 --end 2024-09-07
+
+`dag` runs the jobs scheduled for each date, one after another. The YouTube API only
+serves the current trending list, so `ingest` can only run for today.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+ORCHESTRATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+for import_path in (ORCHESTRATOR_DIR, os.path.dirname(ORCHESTRATOR_DIR)):
+    if import_path not in sys.path:
+        sys.path.append(import_path)
+
+from yt_common.instrumentation import start_run
+
+
+def run_ingest(orchestrator, day, dry_run):
+    if day != datetime.date.today():
+        raise ValueError("The ingestion can only run for today")
+    orchestrator.pipeline.run_pipeline(dry_run=dry_run)
+
+
+def run_daily_top(orchestrator, day, dry_run):
+    daily_top = orchestrator.daily_top
+    daily_top.post_daily_top(daily_top.get_daily_top_videos(day), dry_run=dry_run)
+
+
+def run_weekly_growth(orchestrator, day, dry_run):
+    orchestrator.weekly_growth.run_weekly_growth(run_date=day, dry_run=dry_run)
+
+
+def run_top_categories(orchestrator, day, dry_run):
+    orchestrator.top_categories.run_top_categories(run_date=day, dry_run=dry_run)
+
+
+def run_breakout_channels(orchestrator, day, dry_run):
+    orchestrator.breakout_channels.run_breakouts(run_date=day, dry_run=dry_run)
+
+
+def run_records(orchestrator, day, dry_run):
+    # The index only keeps the current holders, a record broken and lost since is not found
+    orchestrator.records.run_records(run_date=day, dry_run=dry_run)
+
+
+def run_scheduled(orchestrator, day, dry_run):
+    names = orchestrator.scheduled_jobs(day)
+    if day != datetime.date.today():
+        names.remove('ingest')
+    for name in names:
+        CLI_JOBS[name](orchestrator, day, dry_run)
+
+
+CLI_JOBS = {
+    'ingest': run_ingest,
+    'daily_top': run_daily_top,
+    'weekly_growth': run_weekly_growth,
+    'top_categories': run_top_categories,
+    'breakout_channels': run_breakout_channels,
+    'records': run_records,
+    'dag': run_scheduled,
+}
+
+
+def run_job_for_date(job: str, day: str, output_root: str, dry_run: bool) -> dict:
+    """
+    Run a job for one date in the current (worker) process.
+
+    Args:
+        job (str): Name of the job, a key of `CLI_JOBS`.
+        day (str): The date in ISO format.
+        output_root (str): Root directory of the outputs.
+        dry_run (bool): Save the tweets to disk instead of posting them.
+
+    Returns:
+        dict: The status and the timing summary of the run.
+    """
+    # Importing the orchestrator loads the job modules once per worker process
+    import main as orchestrator
+
+    workdir = os.path.join(os.path.abspath(output_root), day, job)
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    error = None
+    with start_run(f"cli.{job}") as run:
+        try:
+            CLI_JOBS[job](orchestrator, datetime.date.fromisoformat(day), dry_run)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return {"date": day, "job": job, "status": "failed" if error else "ok", "error": error, **run.summary()}
+
+
+def date_range(start: datetime.date, end: datetime.date) -> list:
+    if end < start:
+        raise ValueError("The end date is before the start date")
+    return [start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("job", choices=CLI_JOBS)
+    arg_parser.add_argument("--date", type=datetime.date.fromisoformat, help="Single date to run the job for.")
+    arg_parser.add_argument("--start", type=datetime.date.fromisoformat, help="First date of the range.")
+    arg_parser.add_argument("--end", type=datetime.date.fromisoformat, help="Last date of the range (inclusive).")
+    arg_parser.add_argument("--dry-run", action="store_true", help="Render and save the tweets without posting.")
+    arg_parser.add_argument("--output", default="cli_output", help="Root directory of the outputs.")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    args = arg_parser.parse_args(argv)
+
+    if args.date:
+        days = [args.date]
+    elif args.start:
+        days = date_range(args.start, args.end or datetime.date.today())
+    else:
+        days = [datetime.date.today()]
+
+    # Spawned workers do not inherit the clients (and their connections) of the parent
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(days)), mp_context=context) as executor:
+        futures = [
+            executor.submit(run_job_for_date, args.job, day.isoformat(), args.output, args.dry_run)
+            for day in days
+        ]
+        results = [future.result() for future in futures]
+
+    for result in results:
+        print(json.dumps(result, default=str))
+    failed = [result for result in results if result["status"] != "ok"]
+    print(f"{len(results) - len(failed)}/{len(results)} runs succeeded.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Minimal dependency graph runner.
+
+Jobs whose dependencies have finished are started on a thread pool, so independent
+branches run concurrently. Every job receives the results of its dependencies, which
+lets downstream jobs reuse the DataFrames produced upstream instead of re-querying them.
+A job whose dependency failed is skipped.
+"""
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Job:
+    """
+    A node of the graph.
+
+    Args:
+        name (str): Unique name of the job.
+        func (callable): Called with a dict mapping each dependency name to its result.
+        depends_on (tuple): Names of the jobs that have to succeed first.
+    """
+
+    def __init__(self, name: str, func, depends_on: tuple = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+class JobResult:
+    def __init__(self, status: str, result=None, error: str = None, duration: float = 0.0):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.duration = duration
+
+    def to_dict(self) -> dict:
+        summary = {"status": self.status, "duration": round(self.duration, 4)}
+        if self.error:
+            summary["error"] = self.error
+        return summary
+
+
+def _run_job(job: Job, inputs: dict) -> JobResult:
+    started = time.perf_counter()
+    try:
+        result = job.func(inputs)
+    except Exception as e:
+        return JobResult(FAILED, error=f"{type(e).__name__}: {e}", duration=time.perf_counter() - started)
+    return JobResult(OK, result=result, duration=time.perf_counter() - started)
+
+
+def run_dag(jobs: list, max_workers: int = 4) -> dict:
+    """
+    Run the jobs in dependency order, independent ones concurrently.
+
+    Args:
+        jobs (list): The jobs; every dependency has to be one of them.
+        max_workers (int): Maximum number of jobs running at the same time.
+
+    Returns:
+        dict: Mapping of job name to its `JobResult`, in the order of `jobs`.
+    """
+    by_name = {job.name: job for job in jobs}
+    for job in jobs:
+        missing = [name for name in job.depends_on if name not in by_name]
+        if missing:
+            raise ValueError(f"Job {job.name} depends on unknown jobs: {', '.join(missing)}")
+
+    results = {}
+    pending = list(jobs)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [job for job in pending if all(name in results for name in job.depends_on)]
+            while ready:
+                for job in ready:
+                    pending.remove(job)
+                    failed = [name for name in job.depends_on if results[name].status != OK]
+                    if failed:
+                        results[job.name] = JobResult(SKIPPED, error=f"Dependency failed: {', '.join(failed)}")
+                        continue
+                    inputs = {name: results[name].result for name in job.depends_on}
+                    # Copy the context, so spans of the job are recorded in the current run
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, _run_job, job, inputs)] = job
+                # Skipped jobs may have made their dependants ready
+                ready = [job for job in pending if all(name in results for name in job.depends_on)]
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle between: {', '.join(job.name for job in pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future).name] = future.result()
+
+    return {job.name: results[job.name] for job in jobs}
@@ -0,0 +1,139 @@
+import functions_framework
+
+import datetime
+import os
+
+from yt_common.instrumentation import instrumented
+from yt_common.loader import load_function_module
+
+from dag import OK, SKIPPED, Job, run_dag
+
+# Directory containing the function folders
+JOBS_ROOT = os.path.abspath(os.getenv('JOBS_ROOT', os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# ISO weekdays (1 = Monday, 7 = Sunday) of the weekly jobs
+WEEKLY_GROWTH_WEEKDAY = int(os.getenv('WEEKLY_GROWTH_WEEKDAY', '7'))
+TOP_CATEGORIES_WEEKDAY = int(os.getenv('TOP_CATEGORIES_WEEKDAY', '7'))
+
+MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', '4'))
+
+# The modules share the cached credentials and clients of `yt_common.clients`
+pipeline = load_function_module(JOBS_ROOT, 'updating_tables_daily')
+daily_top = load_function_module(JOBS_ROOT, 'tweet_daily_top')
+weekly_growth = load_function_module(JOBS_ROOT, 'tweet_weekly_growth')
+top_categories = load_function_module(JOBS_ROOT, 'tweet_top_categories')
+breakout_channels = load_function_module(JOBS_ROOT, 'tweet_breakout_channels')
+records = load_function_module(JOBS_ROOT, 'tweet_records')
+
+
+def ingest(inputs):
+    return pipeline.run_pipeline()
+
+
+def post_daily_top(inputs):
+    ingested = inputs['ingest']
+    df_top_daily = daily_top.select_daily_top(ingested['top_daily_videos'], ingested['channel_info'])
+    return daily_top.post_daily_top(df_top_daily)
+
+
+def post_weekly_growth(inputs):
+    # Same window as the standalone job: the day before the run against 7 days before it
+    weekly_growth.run_weekly_growth(run_date=datetime.date.today())
+
+
+def post_top_categories(inputs):
+    top_categories.run_top_categories()
+
+
+def post_breakout_channels(inputs):
+    # The analytics need the history, including the snapshots just uploaded by the ingestion
+    return breakout_channels.run_breakouts()
+
+
+def post_records(inputs):
+    # The index was just rewritten by the ingestion
+    return records.run_records()
+
+
+# Job name -> (function, dependencies)
+JOBS = {
+    'ingest': (ingest, ()),
+    'daily_top': (post_daily_top, ('ingest',)),
+    'breakout_channels': (post_breakout_channels, ('ingest',)),
+    'records': (post_records, ('ingest',)),
+    # Compare the days before the run, so they do not wait for today's ingestion
+    'weekly_growth': (post_weekly_growth, ()),
+    'top_categories': (post_top_categories, ()),
+}
+
+
+def scheduled_jobs(day: datetime.date) -> list:
+    """
+    Return the names of the jobs scheduled for the given day.
+
+    Args:
+        day (datetime.date): The day of the run.
+
+    Returns:
+        list: The daily jobs plus the weekly jobs falling on that weekday.
+    """
+    names = ['ingest', 'daily_top', 'breakout_channels', 'records']
+    if day.isoweekday() == WEEKLY_GROWTH_WEEKDAY:
+        names.append('weekly_growth')
+    if day.isoweekday() == TOP_CATEGORIES_WEEKDAY:
+        names.append('top_categories')
+    return names
+
+
+def build_jobs(names: list) -> list:
+    """
+    Build the graph of the selected jobs, including the jobs they depend on.
+
+    Args:
+        names (list): Names of the jobs to run.
+
+    Returns:
+        list: The `Job` objects in the order of `JOBS`.
+    """
+    unknown = [name for name in names if name not in JOBS]
+    if unknown:
+        raise ValueError(f"Unknown jobs: {', '.join(unknown)}")
+
+    selected = set()
+    to_visit = list(names)
+    while to_visit:
+        name = to_visit.pop()
+        if name not in selected:
+            selected.add(name)
+            to_visit.extend(JOBS[name][1])
+    return [Job(name, func, depends_on) for name, (func, depends_on) in JOBS.items() if name in selected]
+
+
+@functions_framework.http
+@instrumented("daily_dag")
+def daily_dag(request):
+    """
+    HTTP Cloud Function running the ingestion and the tweet jobs of the day as one dependency graph.
+
+    The ingested DataFrames are passed to the downstream jobs in-process, and independent jobs run
+    concurrently. The jobs are still deployable as standalone functions.
+
+    Args:
+        request (flask.Request): The request object. `?jobs=daily_top,weekly_growth` runs the listed
+            jobs (and their dependencies) instead of the ones scheduled for today.
+
+    Returns:
+        Response with the status of every job.
+    """
+    try:
+        requested = request.args.get('jobs') if request is not None else None
+        names = requested.split(',') if requested else scheduled_jobs(datetime.date.today())
+        results = run_dag(build_jobs(names), max_workers=MAX_CONCURRENT_JOBS)
+    except Exception as e:
+        return f"Error during execution: {str(e)}", 500
+
+    summary = ", ".join(f"{name}: {result.status}" for name, result in results.items())
+    errors = [f"{name}: {result.error}" for name, result in results.items() if result.status not in (OK, SKIPPED)]
+    if errors or any(result.status == SKIPPED for result in results.values()):
+        return f"DAG finished with errors ({summary}). " + " ".join(errors), 500
+    return f"DAG executed successfully ({summary}).", 200
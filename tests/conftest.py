@@ -0,0 +1,65 @@
+"""
+Put the shared package and the `yt_config` package of the ingestion on the path, as the
+deployment does by copying them next to each function.
+"""
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (ROOT, os.path.join(ROOT, "updating_tables_daily")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(scope="session")
+def stand_ins():
+    """Install the benchmark stand-ins of the Google, YouTube and Twitter clients for the session."""
+    from benchmarks import queries, stand_ins
+
+    environ = {
+        "PROJECT_ID": stand_ins.PROJECT_ID,
+        "DATASET_NAME": stand_ins.DATASET_NAME,
+        "TABLE_CHANNEL_INFO": queries.TABLE_CHANNEL_INFO,
+        "TABLE_CATEGORIES_NAME": queries.TABLE_CATEGORIES_NAME,
+        "TABLE_DAILY_TOP_VIDEOS": queries.TABLE_DAILY_TOP_VIDEOS,
+    }
+    storage = stand_ins.LocalStorage()
+    youtube = stand_ins.LocalYouTube(0, [])
+    with mock.patch.dict(os.environ, environ), stand_ins.installed(storage, youtube, queries.HANDLERS):
+        yield storage
+
+
+@pytest.fixture(scope="session")
+def pipeline(stand_ins):
+    """The `main.py` of `updating_tables_daily`, imported against the benchmark stand-ins."""
+    from yt_common.loader import load_function_module
+
+    return load_function_module(ROOT, "updating_tables_daily")
+
+
+@pytest.fixture(scope="session")
+def daily_top(stand_ins):
+    """The `main.py` of `tweet_daily_top`, imported against the benchmark stand-ins."""
+    from yt_common.loader import load_function_module
+
+    return load_function_module(ROOT, "tweet_daily_top")
+
+
+@pytest.fixture(scope="session")
+def orchestrator(stand_ins):
+    """The `main.py` of `orchestrator`, with the job modules imported against the benchmark stand-ins."""
+    from yt_common.loader import load_function_module
+
+    return load_function_module(ROOT, "orchestrator")
+
+
+@pytest.fixture(scope="session")
+def top_categories(stand_ins):
+    """The `main.py` of `tweet_top_categories`, imported against the benchmark stand-ins."""
+    from yt_common.loader import load_function_module
+
+    return load_function_module(ROOT, "tweet_top_categories")
@@ -0,0 +1,79 @@
+import types
+
+import pytest
+from googleapiclient.errors import HttpError
+
+
+class CategoriesRequest:
+    def __init__(self, api, region):
+        self.api = api
+        self.region = region
+        self.headers = {}
+
+    def execute(self):
+        self.api.requests.append((self.region, self.headers.get("If-None-Match")))
+        etag = self.api.etags[self.region]
+        if self.headers.get("If-None-Match") == etag:
+            raise HttpError(types.SimpleNamespace(status=304, reason="Not Modified"), b"")
+        return {"etag": etag, "items": [{"id": "10", "snippet": {"title": f"Music {self.region}"}}]}
+
+
+class CategoriesApi:
+    """Stand-in of `videoCategories`, answering 304 when the sent ETag is the current one."""
+
+    def __init__(self, etags):
+        self.etags = etags
+        self.requests = []
+
+    def videoCategories(self):
+        return self
+
+    def list(self, part, regionCode):
+        return CategoriesRequest(self, regionCode)
+
+
+@pytest.fixture
+def refresh(pipeline, monkeypatch):
+    """Run `refresh_categories` against the stored and the current ETags, returning the uploads."""
+    uploads = []
+    monkeypatch.setattr(pipeline, "upload_dataframe", lambda df, *args: uploads.append(df))
+
+    def run(stored, current, regions):
+        api = CategoriesApi(current)
+        monkeypatch.setattr(pipeline, "CLIENT_YT", api)
+        monkeypatch.setattr(pipeline, "get_category_etags", lambda: stored)
+        return pipeline.refresh_categories(regions), api.requests, uploads
+
+    return run
+
+
+def test_not_modified_keeps_the_stored_categories(refresh):
+    categories, requests, uploads = refresh({"PL": "e1"}, {"PL": "e1"}, ["PL"])
+
+    assert categories is None
+    assert requests == [("PL", "e1")]
+    assert uploads == []
+
+
+def test_changed_categories_replace_the_table(refresh):
+    categories, requests, uploads = refresh({"PL": "e1"}, {"PL": "e2"}, ["PL"])
+
+    assert requests == [("PL", "e1")]
+    assert len(uploads) == 1
+    assert categories["etag"].tolist() == ["e2"]
+    assert categories["category_name"].tolist() == ["Music PL"]
+
+
+def test_regions_without_etag_are_fetched_in_full(refresh):
+    _, requests, uploads = refresh({}, {"PL": "e1"}, ["PL"])
+
+    assert requests == [("PL", None)]
+    assert len(uploads) == 1
+
+
+def test_unchanged_region_is_fetched_again_when_another_changed(refresh):
+    categories, requests, uploads = refresh({"PL": "e1", "DE": "d1"}, {"PL": "e1", "DE": "d2"}, ["PL", "DE"])
+
+    assert requests == [("PL", "e1"), ("DE", "d1"), ("PL", None)]
+    assert categories["region_code"].tolist() == ["PL", "DE"]
+    assert categories["etag"].tolist() == ["e1", "d2"]
@@ -0,0 +1,59 @@
+import datetime
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def cli(orchestrator):
+    import cli
+
+    return cli
+
+
+def test_date_range_includes_both_ends(cli):
+    days = cli.date_range(datetime.date(2024, 2, 27), datetime.date(2024, 3, 1))
+
+    assert [day.isoformat() for day in days] == ["2024-02-27", "2024-02-28", "2024-02-29", "2024-03-01"]
+    assert cli.date_range(datetime.date(2024, 3, 1), datetime.date(2024, 3, 1)) == [datetime.date(2024, 3, 1)]
+    with pytest.raises(ValueError, match="before the start"):
+        cli.date_range(datetime.date(2024, 3, 2), datetime.date(2024, 3, 1))
+
+
+def test_ingest_only_runs_for_today(cli, orchestrator, monkeypatch):
+    runs = []
+    monkeypatch.setattr(orchestrator.pipeline, "run_pipeline", lambda dry_run: runs.append(dry_run))
+
+    with pytest.raises(ValueError, match="only run for today"):
+        cli.run_ingest(orchestrator, datetime.date.today() - datetime.timedelta(days=1), dry_run=True)
+    cli.run_ingest(orchestrator, datetime.date.today(), dry_run=True)
+
+    assert runs == [True]
+
+
+def test_past_days_run_the_scheduled_jobs_without_ingest(cli, orchestrator, monkeypatch):
+    ran = []
+    for name in cli.CLI_JOBS:
+        monkeypatch.setitem(cli.CLI_JOBS, name, lambda orchestrator, day, dry_run, name=name: ran.append(name))
+    past_day = datetime.date.today() - datetime.timedelta(days=7)
+
+    cli.run_scheduled(orchestrator, past_day, dry_run=True)
+
+    expected = orchestrator.scheduled_jobs(past_day)
+    expected.remove("ingest")
+    assert ran == expected
+
+
+def test_failed_dates_are_reported(cli, orchestrator, monkeypatch, tmp_path):
+    def fail(orchestrator, day, dry_run):
+        raise RuntimeError("no data")
+
+    monkeypatch.setitem(cli.CLI_JOBS, "daily_top", fail)
+    # The worker processes import the orchestrator as `main`
+    monkeypatch.setitem(sys.modules, "main", orchestrator)
+    monkeypatch.chdir(tmp_path)
+
+    result = cli.run_job_for_date("daily_top", "2024-05-01", str(tmp_path), dry_run=True)
+
+    assert result["status"] == "failed" and result["error"] == "RuntimeError: no data"
+    assert (tmp_path / "2024-05-01" / "daily_top").is_dir()
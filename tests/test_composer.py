@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from yt_common.composer import (
+    MAX_TWEET_WEIGHT,
+    MIN_TITLE_WEIGHT,
+    compose_daily_top_tweets,
+    truncate_to_weight,
+    weighted_length,
+)
+
+
+def top_videos(**columns):
+    row = {
+        "category_name": "Film & Animation",
+        "video_title": "Zażółć gęślą jaźń",
+        "video_views": 1234567,
+        "channel_name": "Kanał",
+        "video_id": "abc123",
+    }
+    row.update(columns)
+    return pd.DataFrame([row])
+
+
+def test_weighted_length_counts_urls_and_wide_characters():
+    assert weighted_length("abc") == 3
+    assert weighted_length("ą…") == 1 + 2
+    assert weighted_length("𝗔😀") == 4
+    assert weighted_length("see https://www.youtube.com/watch?v=" + "x" * 80) == 4 + 23
+
+
+def test_truncate_to_weight_keeps_the_ellipsis_within_the_budget():
+    assert truncate_to_weight("abcdef", 6) == "abcdef"
+    assert truncate_to_weight("abcdef", 5) == "abc…"
+    assert truncate_to_weight("abcdef", 1) == ""
+
+
+def test_short_tweet_keeps_its_title_and_hashtags():
+    tweet, = compose_daily_top_tweets(top_videos())
+
+    assert "#Film_and_Animation" in tweet
+    assert "#Kanał" in tweet
+    assert "𝗭𝗮𝘇𝗼𝗹𝗰 𝗴𝗲𝘀𝗹𝗮 𝗷𝗮𝘇𝗻" in tweet
+
+
+def test_long_title_is_truncated_to_the_limit():
+    tweet, = compose_daily_top_tweets(top_videos(video_title="Bardzo długi tytuł " * 20))
+
+    assert weighted_length(tweet) <= MAX_TWEET_WEIGHT
+    assert "…" in tweet
+
+
+def test_long_channel_name_is_shortened_to_leave_room_for_the_title():
+    tweet, = compose_daily_top_tweets(top_videos(channel_name="Kanał z bardzo długą nazwą " * 20,
+                                                 video_title="Tytuł " * 20))
+
+    assert weighted_length(tweet) <= MAX_TWEET_WEIGHT
+    title_line = next(line for line in tweet.splitlines() if line.startswith("Film: "))
+    # The bold glyphs weigh 2, the last one may not fit
+    assert weighted_length(title_line[len("Film: "):]) >= MIN_TITLE_WEIGHT - 1
+    assert "#Kanał_z_bardzo_długą_nazwą_" in tweet
+
+
+def test_template_over_the_limit_is_rejected():
+    with pytest.raises(ValueError):
+        compose_daily_top_tweets(top_videos(), headers=["x" * MAX_TWEET_WEIGHT])
@@ -0,0 +1,103 @@
+import threading
+import time
+import types
+
+import pytest
+
+
+@pytest.fixture
+def dag(orchestrator):
+    import dag
+
+    return dag
+
+
+def test_jobs_run_after_their_dependencies(dag):
+    order = []
+
+    def job(name, value):
+        def func(inputs):
+            order.append(name)
+            return value + sum(inputs.values())
+        return func
+
+    jobs = [
+        dag.Job("report", job("report", 100), ("left", "right")),
+        dag.Job("left", job("left", 10), ("source",)),
+        dag.Job("right", job("right", 20), ("source",)),
+        dag.Job("source", job("source", 1)),
+    ]
+
+    results = dag.run_dag(jobs, max_workers=2)
+
+    assert order[0] == "source" and order[-1] == "report"
+    assert list(results) == ["report", "left", "right", "source"]
+    assert results["report"].result == 100 + 11 + 21
+
+
+def test_jobs_after_a_failed_dependency_are_skipped(dag):
+    def fail(inputs):
+        raise RuntimeError("quota")
+
+    jobs = [
+        dag.Job("ingest", fail),
+        dag.Job("daily_top", lambda inputs: 1, ("ingest",)),
+        dag.Job("summary", lambda inputs: 2, ("daily_top",)),
+        dag.Job("weekly_growth", lambda inputs: 3),
+    ]
+
+    results = dag.run_dag(jobs)
+
+    assert results["ingest"].status == dag.FAILED and "quota" in results["ingest"].error
+    assert results["daily_top"].status == dag.SKIPPED
+    assert results["summary"].status == dag.SKIPPED
+    assert results["weekly_growth"].status == dag.OK
+
+
+def test_unknown_dependency_and_cycles_are_rejected(dag):
+    with pytest.raises(ValueError, match="unknown jobs: missing"):
+        dag.run_dag([dag.Job("a", lambda inputs: 1, ("missing",))])
+    with pytest.raises(ValueError, match="cycle"):
+        dag.run_dag([dag.Job("a", lambda inputs: 1, ("b",)), dag.Job("b", lambda inputs: 1, ("a",))])
+
+
+def test_no_more_jobs_than_workers_run_at_once(dag):
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def func(inputs):
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+
+    results = dag.run_dag([dag.Job(f"job{i}", func) for i in range(6)], max_workers=2)
+
+    assert all(result.status == dag.OK for result in results.values())
+    assert running["peak"] == 2
+
+
+def test_selected_jobs_bring_their_dependencies(orchestrator):
+    jobs = orchestrator.build_jobs(["daily_top", "weekly_growth"])
+
+    assert [job.name for job in jobs] == ["ingest", "daily_top", "weekly_growth"]
+    with pytest.raises(ValueError, match="Unknown jobs: tweet"):
+        orchestrator.build_jobs(["tweet"])
+
+
+def test_jobs_parameter_runs_the_listed_jobs(orchestrator, dag, monkeypatch):
+    ran = []
+
+    def run_dag(jobs, max_workers):
+        ran.extend(job.name for job in jobs)
+        return {job.name: dag.JobResult(dag.OK) for job in jobs}
+
+    monkeypatch.setattr(orchestrator, "run_dag", run_dag)
+    request = types.SimpleNamespace(args={"jobs": "records"}, headers={})
+
+    body, status = orchestrator.daily_dag(request)
+
+    assert status == 200
+    assert ran == ["ingest", "records"]
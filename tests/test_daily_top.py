@@ -0,0 +1,18 @@
+import pandas as pd
+
+
+def test_videos_without_their_channel_are_left_out(daily_top, monkeypatch):
+    monkeypatch.setattr(daily_top, "get_category_names", lambda: {"10": "Music", "20": "Gaming"})
+    videos = pd.DataFrame({
+        "video_id": ["known", "unknown"],
+        "channel_id": ["UC1", "UC2"],
+        "video_category_id": ["10", "20"],
+        "video_views": [100, 200],
+        "default_audio_language": ["pl", "pl"],
+    })
+    channels = pd.DataFrame({"channel_id": ["UC1"], "channel_name": ["Channel"]})
+
+    selected = daily_top.select_daily_top(videos, channels)
+
+    assert selected["video_id"].tolist() == ["known"]
+    assert selected["channel_name"].tolist() == ["Channel"]
@@ -0,0 +1,72 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from yt_config.frames import DESCRIPTION_COLUMNS, STRING_DTYPE, build_frame, without_descriptions
+from yt_config.schemas import CHANNEL_INFO_SCHEMA
+
+ROW = {
+    "channel_id": "UC1",
+    "channel_name": "Channel",
+    "kind": "youtube#channel",
+    "channel_published": "2020-01-01T10:00:00Z",
+    "channel_logo_url": "https://example.com/logo.png",
+    "total_views": 1000,
+    "channel_market": "PL",
+    "channel_subs": 10,
+    "channel_videos": 5,
+    "channel_description": "About",
+    "updated_at": datetime.datetime(2024, 5, 1, 13, 30),
+}
+
+
+def test_columns_get_the_declared_dtypes():
+    df = build_frame([ROW, dict(ROW, channel_id="UC2")], CHANNEL_INFO_SCHEMA)
+
+    assert list(df.columns) == [field["name"] for field in CHANNEL_INFO_SCHEMA]
+    assert df["channel_name"].dtype == STRING_DTYPE
+    assert isinstance(df["kind"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["channel_market"].dtype, pd.CategoricalDtype)
+    assert df["total_views"].dtype == "int64"
+    assert df["channel_videos"].dtype == "int32"
+    assert str(df["channel_published"].dtype) == "datetime64[ns, UTC]"
+    # DATE columns are kept at midnight
+    assert df["updated_at"].tolist() == [pd.Timestamp("2024-05-01")] * 2
+
+
+def test_excluded_fields_are_left_out():
+    df = build_frame([ROW], CHANNEL_INFO_SCHEMA, exclude=DESCRIPTION_COLUMNS)
+
+    assert "channel_description" not in df.columns
+    assert list(without_descriptions(build_frame([ROW], CHANNEL_INFO_SCHEMA)).columns) == list(df.columns)
+
+
+def test_missing_field_raises():
+    row = {name: value for name, value in ROW.items() if name != "channel_subs"}
+
+    with pytest.raises(KeyError, match="channel_subs"):
+        build_frame([row], CHANNEL_INFO_SCHEMA)
+
+
+def test_missing_values_of_nullable_fields_are_kept_as_na():
+    schema = [
+        {"name": "status", "type": "STRING", "mode": "REQUIRED"},
+        {"name": "rows", "type": "INTEGER", "mode": "NULLABLE"},
+        {"name": "error", "type": "STRING", "mode": "NULLABLE"},
+    ]
+
+    rows = [{"status": "done", "rows": 3, "error": None}, {"status": "failed", "rows": None, "error": "quota"}]
+
+    df = build_frame(rows, schema)
+
+    assert df["rows"].dtype == "Int64"
+    assert df["rows"].isna().tolist() == [False, True]
+    assert df["error"].isna().tolist() == [True, False]
+
+
+def test_no_rows_give_an_empty_typed_frame():
+    df = build_frame([], CHANNEL_INFO_SCHEMA)
+
+    assert df.empty
+    assert df["total_views"].dtype == "int64"
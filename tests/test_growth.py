@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from yt_common.growth import breakouts_on, growth_metrics, rolling_stats
+
+
+def test_rolling_stats_match_pandas_with_missing_days():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(100, 10, size=(3, 40))
+    matrix[rng.random(matrix.shape) < 0.2] = np.nan
+
+    mean, std = rolling_stats(matrix, 7)
+
+    expected = pd.DataFrame(matrix.T).rolling(7, min_periods=4)
+    np.testing.assert_allclose(mean, expected.mean().to_numpy().T, equal_nan=True)
+    np.testing.assert_allclose(std, expected.std().to_numpy().T, equal_nan=True, atol=1e-8)
+
+
+def test_sudden_surge_is_flagged_as_breakout():
+    rng = np.random.default_rng(1)
+    gains = rng.normal(100, 10, size=(2, 42))
+    # The first channel gains ten times more over the last week
+    gains[0, -7:] = 1000
+    matrix = np.cumsum(gains, axis=1)
+
+    metrics = growth_metrics(matrix)
+
+    assert metrics['breakout'][:, -1].tolist() == [True, False]
+    assert metrics['acceleration'][0, -1] > 0
+    flagged = breakouts_on(np.array(['surging', 'steady']), metrics)
+    assert flagged['channel_id'].tolist() == ['surging']
+
+
+def test_short_history_has_no_statistics():
+    metrics = growth_metrics(np.arange(10, dtype=float).reshape(1, 10))
+
+    assert np.isnan(metrics['zscore']).all()
+    assert not metrics['breakout'].any()
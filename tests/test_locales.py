@@ -0,0 +1,49 @@
+import os
+import re
+import string
+
+import pytest
+
+from yt_common.locales import DEFAULT_LOCALE, LOCALES
+from yt_common.records import CHANNEL_METRICS, SCOPES, VIDEO_METRICS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOB_DIRS = ["tweet_daily_top", "tweet_weekly_growth", "tweet_top_categories", "tweet_breakout_channels",
+            "tweet_records", "yt_common"]
+
+# Keys passed to `localized` as literals
+LOCALIZED_KEY = re.compile(r"localized\(\s*\w+,\s*'(\w+)'")
+# Keys kept in constants or lists of the jobs before being passed to `localized`
+INDIRECT_KEY = re.compile(r"'(daily_top_record_\w+|breakout_\w+_header)'")
+
+
+def used_keys() -> set:
+    keys = {f"record_{metric}" for metric in (*VIDEO_METRICS, *CHANNEL_METRICS)}
+    keys |= {f"record_scope_{scope}" for scope in SCOPES}
+    for job_dir in JOB_DIRS:
+        for name in os.listdir(os.path.join(ROOT, job_dir)):
+            if name.endswith(".py"):
+                with open(os.path.join(ROOT, job_dir, name), encoding="utf-8") as f:
+                    source = f.read()
+                keys |= set(LOCALIZED_KEY.findall(source)) | set(INDIRECT_KEY.findall(source))
+    return keys
+
+
+def placeholders(text: str) -> set:
+    return {field for _, field, _, _ in string.Formatter().parse(text) if field}
+
+
+def test_jobs_use_keys_of_the_locales():
+    keys = used_keys()
+
+    assert {"daily_top_template", "record_header", "breakout_total_views_header"} <= keys
+    assert keys <= set(LOCALES[DEFAULT_LOCALE])
+
+
+@pytest.mark.parametrize("locale", sorted(LOCALES))
+def test_every_locale_has_every_key_with_the_same_placeholders(locale):
+    default = LOCALES[DEFAULT_LOCALE]
+
+    assert set(LOCALES[locale]) == set(default)
+    for key, text in default.items():
+        assert placeholders(LOCALES[locale][key]) == placeholders(text), key
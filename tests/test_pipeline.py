@@ -0,0 +1,75 @@
+import datetime
+import types
+
+import pandas as pd
+
+from benchmarks.stand_ins import query_parameters
+
+
+def test_unknown_refresh_mode_is_rejected(pipeline, monkeypatch):
+    monkeypatch.setattr(pipeline, "run_pipeline", lambda **kwargs: 1 / 0)
+    request = types.SimpleNamespace(headers={}, args={"mode": "everything"}, get_json=lambda silent=False: None)
+
+    body, status = pipeline.youtube_data_pipeline(request)
+
+    assert status == 400
+
+
+def test_full_refresh_is_the_default(pipeline):
+    assert pipeline.REFRESH_MODE == pipeline.FULL_REFRESH
+
+
+class RecordingBigQuery:
+    def __init__(self):
+        self.jobs = []
+
+    def query(self, sql, job_config=None):
+        self.jobs.append((sql, job_config))
+        return types.SimpleNamespace(result=lambda: None, to_dataframe=pd.DataFrame, total_bytes_processed=0)
+
+
+def test_velocity_update_merges_the_staged_videos(pipeline, monkeypatch):
+    client = RecordingBigQuery()
+    uploads = []
+    monkeypatch.setattr(pipeline, "CLIENT_BQ", client)
+    monkeypatch.setattr(pipeline, "upload_dataframe", lambda df, dataset, table, *args: uploads.append((table, df)))
+    videos = pd.DataFrame({
+        "video_id": ["v1"],
+        "channel_id": ["UC1"],
+        "video_title": ["Title"],
+        "video_views": [1000],
+        "video_published": [pd.Timestamp("2024-04-30", tz="UTC")],
+        "video_likes": [10],
+    })
+    captured_at = pd.Timestamp("2024-05-01 12:00", tz="UTC")
+
+    pipeline.update_video_velocity(videos, captured_at)
+
+    (table, staging), = uploads
+    assert table == pipeline.TABLE_VIDEO_VELOCITY_STAGING
+    assert staging["captured_at"].tolist() == [captured_at]
+    assert "video_likes" not in staging.columns
+    (sql, job_config), = client.jobs
+    assert f"MERGE\n            `{pipeline.PROJECT_ID}.{pipeline.DATASET_NAME}.{pipeline.TABLE_VIDEO_VELOCITY}` AS s" in sql
+    assert f".{pipeline.TABLE_VIDEO_VELOCITY_STAGING}` AS t" in sql
+    assert "WHEN MATCHED AND t.captured_at > s.last_captured_at THEN UPDATE SET" in sql
+    assert "WHEN NOT MATCHED BY TARGET THEN INSERT" in sql
+    assert "TIMESTAMP_SUB(@captured_at, INTERVAL @retention_days DAY)" in sql
+    assert query_parameters(job_config) == {
+        "captured_at": captured_at.to_pydatetime(),
+        "retention_days": pipeline.VELOCITY_RETENTION_DAYS,
+    }
+
+
+def test_fastest_rising_videos_read_the_run_day_and_the_day_before(monkeypatch):
+    from yt_common import velocity
+
+    client = RecordingBigQuery()
+    monkeypatch.setattr(velocity, "get_bigquery_client", lambda project_id: client)
+
+    velocity.get_fastest_rising_videos("project", "dataset", "velocity", limit=3, run_date=datetime.date(2024, 5, 1))
+
+    (sql, _), = client.jobs
+    assert "FROM\n        `project.dataset.velocity`" in sql
+    assert "BETWEEN DATE_SUB(DATE('2024-05-01'), INTERVAL 1 DAY) AND DATE('2024-05-01')" in sql
+    assert "ORDER BY\n        views_per_hour DESC\n    LIMIT 3" in sql
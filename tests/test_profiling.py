@@ -0,0 +1,64 @@
+import json
+import threading
+import types
+
+import pytest
+
+from yt_common.instrumentation import instrumented
+from yt_common.profiling import LocalProfileStore, profiled
+
+
+class FailingStore:
+    def save(self, name, data):
+        raise OSError("disk full")
+
+
+def test_overlapping_profiles_run_the_second_block_unprofiled(tmp_path):
+    store = LocalProfileStore(str(tmp_path))
+    inside, release = threading.Event(), threading.Event()
+    profiles = {}
+
+    def first():
+        with profiled("job", "first", store) as profile:
+            inside.set()
+            release.wait(5)
+        profiles["first"] = profile
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    inside.wait(5)
+    with profiled("job", "second", store) as profile:
+        profiles["second"] = profile
+    release.set()
+    thread.join()
+
+    assert profiles["second"] is None
+    assert len(profiles["first"].locations) == 3
+    with profiled("job", "third", store) as profile:
+        pass
+    assert len(profile.locations) == 3
+
+
+def test_failed_save_keeps_the_error_of_the_block():
+    with pytest.raises(ZeroDivisionError):
+        with profiled("job", "run", FailingStore()) as profile:
+            1 / 0
+
+    assert profile.error == "OSError('disk full')"
+    assert profile.locations == []
+
+
+def test_failed_save_is_logged(monkeypatch, capsys):
+    monkeypatch.setattr("yt_common.profiling.get_profile_store", FailingStore)
+    request = types.SimpleNamespace(args={"profile": "1"}, headers={})
+
+    @instrumented("job")
+    def handler(request):
+        raise KeyError("boom")
+
+    with pytest.raises(KeyError):
+        handler(request)
+
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    failed = [event for event in events if event["event"] == "profile_failed"]
+    assert failed[0]["severity"] == "ERROR" and "disk full" in failed[0]["error"]
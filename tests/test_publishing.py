@@ -0,0 +1,66 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from yt_common import publishing
+from yt_common.locales import localized
+from yt_common.publishing import Post, publish
+
+TARGETS = (
+    {"name": "pl", "locale": "pl"},
+    {"name": "en", "locale": "en"},
+    {"name": "pl_backup", "locale": "pl"},
+)
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    """Replace the Twitter calls, returning the posts sent to every target."""
+    posts = {}
+    lock = threading.Lock()
+
+    def post_tweet(target, post):
+        with lock:
+            posts.setdefault(target["name"], []).append(post)
+        return True
+
+    monkeypatch.setattr(publishing, "post_tweet", post_tweet)
+    return posts
+
+
+def test_every_target_gets_the_posts_of_its_locale(posted):
+    composed = []
+    image = b"png"
+
+    def compose(locale):
+        composed.append(locale)
+        return [Post(localized(locale, "categories_caption"), image, "chart.png")]
+
+    assert publish(compose, TARGETS) == 3
+
+    assert sorted(composed) == ["en", "pl"]
+    assert posted["pl"][0].text == posted["pl_backup"][0].text == localized("pl", "categories_caption")
+    assert posted["en"][0].text == localized("en", "categories_caption")
+    assert all(posts[0].image is image for posts in posted.values())
+
+
+def test_job_renders_its_image_once_for_all_locales(top_categories, posted, monkeypatch):
+    renders = []
+    render = top_categories.generate_categories_wordcloud
+
+    def counted_render(df):
+        renders.append(df)
+        return render(df)
+
+    monkeypatch.setattr(top_categories, "generate_categories_wordcloud", counted_render)
+    monkeypatch.setattr(publishing, "load_targets", lambda: TARGETS)
+    df = pd.DataFrame({"category_name": ["Music", "Gaming"], "occurrences": [10, 5]})
+
+    assert top_categories.run_top_categories(df) == 3
+
+    assert len(renders) == 1
+    assert posted["en"][0].text == localized("en", "categories_caption")
+    assert posted["pl"][0].text == localized("pl", "categories_caption")
+    # The localized title is drawn on the shared render, once per locale
+    assert posted["pl"][0].image == posted["pl_backup"][0].image != posted["en"][0].image
@@ -0,0 +1,97 @@
+import datetime
+
+import pandas as pd
+
+from yt_common.records import ALL, CHANNEL_WEEKLY_SUBS, REGION, RECORD_COLUMNS, VIDEO_VIEWS, RecordsIndex
+
+from yt_config.records import ENTRY_COLUMNS, record_candidates, update_leaderboards
+
+DAY = datetime.date(2024, 5, 1)
+NEXT_DAY = DAY + datetime.timedelta(days=1)
+
+
+def candidates(*entries, day=DAY):
+    """Build candidate entries of the overall video views leaderboard from (video id, views) pairs."""
+    return pd.DataFrame(
+        [[VIDEO_VIEWS, ALL, "", video_id, f"Title {video_id}", views, pd.Timestamp(day)]
+         for video_id, views in entries],
+        columns=ENTRY_COLUMNS,
+    )
+
+
+def board(index):
+    return index[(index["metric"] == VIDEO_VIEWS) & (index["scope"] == ALL)].reset_index(drop=True)
+
+
+def test_first_run_builds_leaderboards_without_broken_records():
+    index = update_leaderboards(pd.DataFrame(columns=RECORD_COLUMNS), candidates(("a", 10), ("b", 30)), 3, DAY)
+
+    views = board(index)
+    assert views["entity_id"].tolist() == ["b", "a"]
+    assert views["rank"].tolist() == [1, 2]
+    assert views["previous_entity_id"].isna().all()
+    assert views["broken_on"].isna().all()
+    assert RecordsIndex(index).broken_on(DAY) == []
+
+
+def test_leader_beating_its_own_record_keeps_the_broken_record():
+    first = update_leaderboards(pd.DataFrame(columns=RECORD_COLUMNS), candidates(("a", 10)), 3, DAY)
+    second = update_leaderboards(first, candidates(("b", 20), day=NEXT_DAY), 3, NEXT_DAY)
+    third = update_leaderboards(second, candidates(("b", 40), day=NEXT_DAY), 3, NEXT_DAY)
+
+    leader = board(third).iloc[0]
+    assert (leader["entity_id"], leader["value"]) == ("b", 40)
+    assert (leader["previous_entity_id"], leader["previous_value"]) == ("a", 10)
+    assert leader["broken_on"] == pd.Timestamp(NEXT_DAY)
+    assert [record.entity_id for record in RecordsIndex(third).broken_on(NEXT_DAY)] == ["b"]
+
+
+def test_leader_improving_without_a_previous_holder_breaks_nothing():
+    first = update_leaderboards(pd.DataFrame(columns=RECORD_COLUMNS), candidates(("a", 10)), 3, DAY)
+    second = update_leaderboards(first, candidates(("a", 15), day=NEXT_DAY), 3, NEXT_DAY)
+
+    leader = board(second).iloc[0]
+    assert (leader["entity_id"], leader["value"]) == ("a", 15)
+    assert pd.isna(leader["previous_entity_id"])
+    assert RecordsIndex(second).broken_on(NEXT_DAY) == []
+
+
+def test_leaderboards_are_cut_back_to_top_k():
+    first = update_leaderboards(pd.DataFrame(columns=RECORD_COLUMNS), candidates(("a", 10), ("b", 20)), 2, DAY)
+    second = update_leaderboards(first, candidates(("c", 15), ("b", 5), day=NEXT_DAY), 2, NEXT_DAY)
+
+    views = board(second)
+    assert views["entity_id"].tolist() == ["b", "c"]
+    # A video is kept once, at its best value
+    assert views["value"].tolist() == [20, 15]
+    assert views["achieved_on"].tolist() == [pd.Timestamp(DAY), pd.Timestamp(NEXT_DAY)]
+
+
+def test_channels_without_a_country_are_ranked_overall_only():
+    channels = pd.DataFrame({
+        "channel_id": ["with_market", "stored_none", "empty", "missing"],
+        "channel_name": ["A", "B", "C", "D"],
+        "channel_market": ["PL", "None", "", None],
+        "total_views": [100, 100, 100, 100],
+        "channel_subs": [10, 10, 10, 10],
+    })
+    week_ago = channels[["channel_id", "total_views", "channel_subs"]].assign(total_views=50, channel_subs=5)
+
+    entries = record_candidates(pd.DataFrame(), channels, week_ago, "PL", DAY)
+
+    subs = entries[entries["metric"] == CHANNEL_WEEKLY_SUBS]
+    assert sorted(subs[subs["scope"] == ALL]["entity_id"]) == ["empty", "missing", "stored_none", "with_market"]
+    regional = subs[subs["scope"] == REGION]
+    assert regional[["entity_id", "scope_value"]].values.tolist() == [["with_market", "PL"]]
+
+
+def test_rank_counts_the_room_left_on_the_leaderboard():
+    index = update_leaderboards(pd.DataFrame(columns=RECORD_COLUMNS), candidates(("a", 10), ("b", 30)), 3, DAY)
+
+    records = RecordsIndex(index, top_k=3)
+    assert records.rank_of(VIDEO_VIEWS, 40) == 1
+    assert records.rank_of(VIDEO_VIEWS, 20) == 2
+    # The board holds two of its three entries, a smaller value still enters it
+    assert records.rank_of(VIDEO_VIEWS, 5) == 3
+    assert RecordsIndex(index, top_k=2).rank_of(VIDEO_VIEWS, 5) is None
+    assert records.rank_of(VIDEO_VIEWS, 5, REGION, "PL") == 1
@@ -0,0 +1,110 @@
+import pandas as pd
+import pytest
+
+from yt_config.shards import DISPATCHED, DONE, FAILED, split_shards
+
+NOW = pd.Timestamp("2024-05-01 12:00", tz="UTC")
+RECENTLY = NOW - pd.Timedelta(seconds=30)
+LONG_AGO = NOW - pd.Timedelta(hours=1)
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.tasks = []
+        self.scheduled = []
+
+    def dispatch(self, task):
+        self.tasks.append(task)
+
+    def schedule(self, task, delay_seconds):
+        self.scheduled.append((task, delay_seconds))
+
+
+@pytest.fixture
+def shard_table(pipeline, monkeypatch):
+    """Replace the shard status table with a dict (shard, attempt) -> (status, error, dispatched_at)."""
+    statuses = {}
+
+    def record(run_id, rows):
+        for row in rows:
+            dispatched_at = NOW if row["status"] == DISPATCHED else statuses[(row["shard"], row["attempt"])][2]
+            statuses[(row["shard"], row["attempt"])] = (row["status"], row["error"], dispatched_at)
+
+    monkeypatch.setattr(pipeline, "record_shard_status", record)
+    monkeypatch.setattr(pipeline, "get_shard_statuses", lambda run_id: dict(statuses))
+    monkeypatch.setattr(pipeline, "get_shard_channel_ids", lambda run_id, shards: {s: [f"UC{s}"] for s in shards})
+    monkeypatch.setattr(pipeline, "SHARD_MAX_ATTEMPTS", 2)
+    return statuses
+
+
+def test_split_shards_is_stable_and_complete():
+    ids = [f"UC{i}" for i in range(100)]
+
+    shards = split_shards(ids, 4)
+
+    assert sorted(id for shard in shards.values() for id in shard) == sorted(ids)
+    assert split_shards(list(reversed(ids)), 4) == shards
+
+
+def test_failed_and_lost_shards_are_dispatched_again(pipeline):
+    statuses = {
+        (0, 1): (DONE, None, LONG_AGO),
+        (1, 1): (FAILED, "quota", RECENTLY),
+        (2, 1): (DISPATCHED, None, LONG_AGO),
+        (3, 1): (DISPATCHED, None, RECENTLY),
+        # A slow first attempt finishing after the re-dispatch
+        (4, 1): (DONE, None, LONG_AGO),
+        (4, 2): (DISPATCHED, None, RECENTLY),
+    }
+
+    pending, retry = pipeline.pending_shards("run", statuses, NOW)
+
+    assert pending == [1, 2, 3]
+    assert retry == {1: 2, 2: 2}
+
+
+def test_shard_failing_every_attempt_raises(pipeline, monkeypatch):
+    monkeypatch.setattr(pipeline, "SHARD_MAX_ATTEMPTS", 2)
+    statuses = {(0, 1): (FAILED, "quota", LONG_AGO), (0, 2): (FAILED, "quota", RECENTLY)}
+
+    with pytest.raises(RuntimeError, match="quota"):
+        pipeline.pending_shards("run", statuses, NOW)
+
+
+def test_check_dispatches_again_and_schedules_the_next_check(pipeline, shard_table):
+    queue = RecordingQueue()
+    pipeline.dispatch_shards("run", {0: (1, ["UC0"]), 1: (1, ["UC1"])}, pipeline.STATS_REFRESH, queue)
+    pipeline.record_shard_status("run", [
+        {"shard": 0, "attempt": 1, "status": DONE, "error": None},
+        {"shard": 1, "attempt": 1, "status": FAILED, "error": "quota"},
+    ])
+    task = {"check": True, "run_id": "run", "day": "2024-05-01", "refresh_mode": pipeline.STATS_REFRESH}
+
+    pending = pipeline.run_check(task, queue)
+
+    assert pending == 1
+    assert [(task["shard"], task["attempt"]) for task in queue.tasks] == [(0, 1), (1, 1), (1, 2)]
+    assert queue.tasks[-1]["channel_ids"] == ["UC1"]
+    assert queue.tasks[-1]["refresh_mode"] == pipeline.STATS_REFRESH
+    assert queue.scheduled == [(task, pipeline.SHARD_POLL_SECONDS)]
+
+
+def test_check_finishes_the_run_once_all_shards_are_done(pipeline, shard_table, monkeypatch):
+    finished = []
+    monkeypatch.setattr(pipeline, "finish_coordinator", finished.append)
+    queue = RecordingQueue()
+    shard_table[(0, 1)] = (DONE, None, LONG_AGO)
+    task = {"check": True, "run_id": "run", "day": "2024-05-01", "refresh_mode": pipeline.FULL_REFRESH}
+
+    assert pipeline.run_check(task, queue) == 0
+    assert [str(day) for day in finished] == ["2024-05-01"]
+    assert queue.scheduled == []
+
+
+def test_worker_rejects_an_unknown_refresh_mode(pipeline, shard_table):
+    task = {"run_id": "run", "shard": 0, "attempt": 1, "refresh_mode": "everything", "channel_ids": ["UC0"]}
+    shard_table[(0, 1)] = (DISPATCHED, None, NOW)
+
+    with pytest.raises(ValueError, match="refresh mode"):
+        pipeline.run_worker(task)
+    assert shard_table[(0, 1)][0] == FAILED
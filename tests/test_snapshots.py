@@ -0,0 +1,133 @@
+import types
+
+import pandas as pd
+
+from yt_config.frames import build_frame
+from yt_config.schemas import CHANNEL_INFO_SCHEMA, CHANNEL_METADATA_SCHEMA, CHANNEL_SNAPSHOTS_SCHEMA
+from yt_config.snapshots import content_columns, content_hash, migration_query, split_snapshot, wide_view_query
+
+
+class ViewClient:
+    def __init__(self, table):
+        self.table = table
+        self.updates = []
+        self.queries = []
+        self.created = []
+
+    def get_table(self, table_ref):
+        return self.table
+
+    def update_table(self, table, fields):
+        self.updates.append((table.view_query, fields))
+
+    def query(self, sql):
+        self.queries.append(sql)
+        return types.SimpleNamespace(result=lambda: None, total_bytes_processed=0)
+
+    def create_table(self, table):
+        self.created.append((table.table_id, table.view_query))
+
+
+def test_view_joins_each_content_once():
+    query = wide_view_query(CHANNEL_INFO_SCHEMA, CHANNEL_SNAPSHOTS_SCHEMA, "p.d.snapshots", "p.d.metadata",
+                            "channel_id")
+
+    assert "PARTITION BY channel_id, content_hash ORDER BY valid_from) = 1" in query
+    assert "ON m.channel_id = s.channel_id AND m.content_hash = s.content_hash" in query
+
+
+def test_outdated_view_query_is_replaced(pipeline, monkeypatch):
+    client = ViewClient(types.SimpleNamespace(table_type="VIEW", view_query="SELECT 1"))
+    monkeypatch.setattr(pipeline, "CLIENT_BQ", client)
+
+    pipeline.create_bq_view("d", "view", "SELECT 2", "MIGRATE")
+    pipeline.create_bq_view("d", "view", "SELECT 2", "MIGRATE")
+
+    assert client.updates == [("SELECT 2", ["view_query"])]
+
+
+def test_wide_table_is_migrated_before_the_view_takes_its_name(pipeline, monkeypatch):
+    client = ViewClient(types.SimpleNamespace(table_type="TABLE"))
+    monkeypatch.setattr(pipeline, "CLIENT_BQ", client)
+
+    pipeline.create_bq_view("d", "view", "SELECT 2", "MIGRATE")
+
+    assert client.queries == ["MIGRATE"]
+    assert client.created == [("view", "SELECT 2")]
+
+
+def test_migration_copies_the_rows_then_renames_the_wide_table():
+    query = migration_query(CHANNEL_SNAPSHOTS_SCHEMA, CHANNEL_METADATA_SCHEMA, "p.d.info", "p.d.snapshots",
+                            "p.d.metadata", "channel_id", "updated_at")
+
+    columns = "channel_id, total_views, channel_subs, channel_videos, content_hash, updated_at"
+    assert f"INSERT INTO `p.d.snapshots` ({columns})" in query
+    assert "MIN(updated_at)" in query and "GROUP BY channel_id, content_hash" in query
+    assert query.index("COMMIT TRANSACTION") < query.index("ALTER TABLE `p.d.info` RENAME TO `info_wide`")
+
+
+def _channels(**changes):
+    row = {
+        "channel_id": "UC1",
+        "channel_name": "Channel",
+        "kind": "youtube#channel",
+        "channel_published": pd.Timestamp("2020-01-01", tz="UTC"),
+        "channel_logo_url": "https://example.com/logo.png",
+        "total_views": 1000,
+        "channel_market": "PL",
+        "channel_subs": 10,
+        "channel_videos": 5,
+        "channel_description": "About",
+        "updated_at": pd.Timestamp("2024-05-01").date(),
+    }
+    second = dict(row, channel_id="UC2", channel_name="Other", total_views=50)
+    return build_frame([dict(row, **changes), second], CHANNEL_INFO_SCHEMA)
+
+
+def _split(df, known_hashes=frozenset()):
+    return split_snapshot(df, CHANNEL_SNAPSHOTS_SCHEMA, CHANNEL_METADATA_SCHEMA, "channel_id", "updated_at",
+                          known_hashes)
+
+
+def test_hash_is_stable_while_the_metadata_is_unchanged():
+    columns = content_columns(CHANNEL_METADATA_SCHEMA, "channel_id")
+
+    first = content_hash(_channels(), columns)
+    next_day = _channels(total_views=2000, channel_subs=20, updated_at=pd.Timestamp("2024-05-02").date())
+    next_day = content_hash(next_day, columns)
+
+    assert first.tolist() == next_day.tolist()
+    assert first[0] != first[1]
+
+
+def test_hash_changes_with_the_metadata():
+    columns = content_columns(CHANNEL_METADATA_SCHEMA, "channel_id")
+
+    first = content_hash(_channels(), columns)
+    renamed = content_hash(_channels(channel_name="Renamed"), columns)
+    described = content_hash(_channels(channel_description="New about"), columns)
+
+    assert renamed[0] != first[0] and described[0] != first[0]
+    assert renamed[1] == first[1]
+
+
+def test_known_metadata_is_not_stored_again():
+    snapshots, metadata = _split(_channels())
+    known = set(zip(metadata["channel_id"], metadata["content_hash"]))
+
+    _, again = _split(_channels(total_views=2000), known)
+    _, renamed = _split(_channels(channel_name="Renamed"), known)
+
+    assert len(metadata) == 2 and again.empty
+    assert renamed["channel_name"].tolist() == ["Renamed"]
+
+
+def test_split_then_join_gives_back_the_wide_rows():
+    wide = _channels()
+
+    snapshots, metadata = _split(wide)
+    # The join of `wide_view_query`
+    joined = snapshots.merge(metadata.drop(columns="valid_from"), on=["channel_id", "content_hash"])
+
+    columns = [field["name"] for field in CHANNEL_INFO_SCHEMA]
+    pd.testing.assert_frame_equal(joined[columns], wide[columns])
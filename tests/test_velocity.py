@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+DAY_1 = pd.Timestamp("2024-05-01 12:00", tz="UTC")
+DAY_2 = pd.Timestamp("2024-05-02 12:00", tz="UTC")
+
+
+def captured(*videos):
+    return pd.DataFrame([
+        {"video_id": video_id, "channel_id": "UC1", "video_title": f"Title {video_id}",
+         "video_published": pd.Timestamp("2024-05-01 02:00", tz="UTC"), "video_views": views}
+        for video_id, views in videos
+    ])
+
+
+@pytest.fixture
+def velocity(pipeline, stand_ins, request, monkeypatch):
+    """Point the velocity table at a table of the test, returning a reader of its rows by video."""
+    name = f"velocity_{request.node.name}"
+    monkeypatch.setattr(pipeline, "TABLE_VIDEO_VELOCITY", name)
+    monkeypatch.setattr(pipeline, "TABLE_VIDEO_VELOCITY_STAGING", f"{name}_staging")
+    stand_ins.write(name, pd.DataFrame())
+    return lambda: stand_ins.table(name).set_index("video_id").sort_index()
+
+
+def test_each_run_merges_only_its_videos(pipeline, velocity):
+    pipeline.update_video_velocity(captured(("v1", 1000), ("v2", 500)), DAY_1)
+    pipeline.update_video_velocity(captured(("v1", 3400), ("v3", 200)), DAY_2)
+
+    state = velocity()
+    assert state.index.tolist() == ["v1", "v2", "v3"]
+    # Since the publication for a new video, between the last two captures afterwards
+    assert state.loc["v2", "views_per_hour"] == 50
+    assert state.loc["v1", "views_per_hour"] == 100
+    assert state.loc["v1", "first_seen_at"] == DAY_1 and state.loc["v1", "first_views"] == 1000
+    assert state.loc["v1", "last_captured_at"] == DAY_2 and state.loc["v1", "last_views"] == 3400
+    assert state["days_trending"].tolist() == [2, 1, 1]
+
+
+def test_videos_not_trending_for_the_retention_are_removed(pipeline, velocity):
+    later = DAY_2 + pd.Timedelta(days=pipeline.VELOCITY_RETENTION_DAYS)
+
+    pipeline.update_video_velocity(captured(("v1", 1000), ("v2", 500)), DAY_1)
+    pipeline.update_video_velocity(captured(("v2", 900)), DAY_2)
+    pipeline.update_video_velocity(captured(("v3", 100)), later)
+
+    assert velocity().index.tolist() == ["v2", "v3"]
+
+
+def test_dry_run_leaves_the_tables_alone(pipeline, monkeypatch, tmp_path):
+    videos = captured(("v1", 1000))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pipeline, "get_top_daily_videos", lambda *args: (videos, videos.iloc[:0]))
+    monkeypatch.setattr(pipeline, "with_stats_rows", lambda df, stats_df: df)
+    monkeypatch.setattr(pipeline, "upload_snapshot", lambda *args: pytest.fail("uploaded in a dry run"))
+    monkeypatch.setattr(pipeline, "update_video_velocity", lambda *args: pytest.fail("merged in a dry run"))
+
+    pipeline.ingest_videos(pipeline.FULL_REFRESH, dry_run=True)
+
+    assert pd.read_csv(tmp_path / f"{pipeline.TABLE_DAILY_TOP_VIDEOS}.csv")["video_id"].tolist() == ["v1"]
@@ -0,0 +1,35 @@
+import types
+
+from yt_config.shards import WORKER_SECRET_HEADER
+
+
+def request(headers=None, task=None):
+    return types.SimpleNamespace(
+        headers=headers or {},
+        args={},
+        get_json=lambda silent=False: task,
+    )
+
+
+def test_task_with_the_shared_secret_is_authorized(pipeline, monkeypatch):
+    monkeypatch.setattr(pipeline, "WORKER_SECRET", "s3cret")
+
+    assert pipeline.is_authorized_task(request({WORKER_SECRET_HEADER: "s3cret"}))
+    assert not pipeline.is_authorized_task(request({WORKER_SECRET_HEADER: "guess"}))
+    assert not pipeline.is_authorized_task(request())
+
+
+def test_tasks_are_rejected_without_credentials_configured(pipeline, monkeypatch):
+    monkeypatch.setattr(pipeline, "WORKER_SECRET", None)
+    monkeypatch.setattr(pipeline, "TASKS_SERVICE_ACCOUNT", None)
+
+    assert not pipeline.is_authorized_task(request({WORKER_SECRET_HEADER: "", "Authorization": "Bearer x"}))
+
+
+def test_unauthorized_shard_task_is_rejected_before_running(pipeline, monkeypatch):
+    monkeypatch.setattr(pipeline, "WORKER_SECRET", "s3cret")
+    monkeypatch.setattr(pipeline, "run_worker", lambda task: 1 / 0)
+
+    body, status = pipeline.youtube_data_pipeline(request(task={"shard": 0, "channel_ids": ["UC1"]}))
+
+    assert status == 403
@@ -0,0 +1,162 @@
+import functions_framework
+
+import datetime
+import os
+import numpy as np
+
+from yt_common.clients import get_bigquery_client, get_credentials
+from yt_common.composer import fit_caption, format_views, to_hashtag
+from yt_common.growth import breakouts_on, growth_metrics, load_series
+from yt_common.instrumentation import BQ_QUERY, PARSE, instrumented, span
+from yt_common.locales import localized
+from yt_common.publishing import Post, publish
+
+# Load BigQuery configuration from environment variables
+PROJECT_ID = os.getenv('PROJECT_ID')
+DATASET_NAME = os.getenv('DATASET_NAME')
+TABLE_CHANNEL_INFO = os.getenv('TABLE_CHANNEL_INFO')
+
+# Days of channel history loaded for the analytics, the whole history when not set
+HISTORY_DAYS = int(os.getenv('GROWTH_HISTORY_DAYS')) if os.getenv('GROWTH_HISTORY_DAYS') else None
+
+NUM_OF_BREAKOUTS = 3
+
+# Metric -> key of the tweet header in the locale table
+BREAKOUT_HEADERS = {
+    'total_views': 'breakout_total_views_header',
+    'channel_subs': 'breakout_channel_subs_header',
+}
+
+# Use Application Default Credentials (ADC)
+credentials, project = get_credentials()
+CLIENT_BQ = get_bigquery_client(PROJECT_ID)
+
+
+def get_channel_history(run_date=None):
+    """
+    Retrieve the daily views and subscribers of the Polish channels, over the last HISTORY_DAYS days when set.
+
+    Args:
+        run_date (datetime.date): The last day of the history, defaults to today.
+
+    Returns:
+        pandas.DataFrame: One row per channel and day with the channel name, total views and subscribers.
+    """
+    run_date = (run_date or datetime.date.today()).strftime('%Y-%m-%d')
+    history_filter = (
+        f"AND DATE(updated_at) >= DATE_SUB(DATE('{run_date}'), INTERVAL {HISTORY_DAYS} DAY)" if HISTORY_DAYS else ""
+    )
+    query = f"""
+    SELECT
+        channel_id,
+        updated_at,
+        ANY_VALUE(channel_name) AS channel_name,
+        MAX(total_views) AS total_views,
+        MAX(channel_subs) AS channel_subs
+    FROM
+        `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}`
+    WHERE
+        DATE(updated_at) <= DATE('{run_date}')
+        {history_filter}
+        AND channel_market = 'PL'
+    GROUP BY
+        channel_id, updated_at;
+    """
+
+    with span(BQ_QUERY) as query_span:
+        history_query = CLIENT_BQ.query(query)
+        history_df = history_query.to_dataframe()
+        query_span.add(bytes=history_query.total_bytes_processed, rows=len(history_df))
+
+    return history_df
+
+
+def find_breakouts(history_df, run_date=None):
+    """
+    Find the breakout channels of the run date in the channel history.
+
+    Args:
+        history_df (pandas.DataFrame): The result of `get_channel_history`.
+        run_date (datetime.date): The day to look at, defaults to today.
+
+    Returns:
+        dict: Metric -> DataFrame of the flagged channels with their names, sorted by z-score.
+        Empty when the run date has not been captured.
+    """
+    run_date = run_date or datetime.date.today()
+    breakouts = {}
+    with span(PARSE, rows=len(history_df)):
+        ids, days, matrices = load_series(history_df, list(BREAKOUT_HEADERS))
+        if not len(days) or days[-1] != np.datetime64(run_date, 'D'):
+            return breakouts
+
+        latest = history_df.sort_values('updated_at').drop_duplicates('channel_id', keep='last')
+        names = latest.set_index('channel_id')['channel_name']
+        for metric, matrix in matrices.items():
+            flagged = breakouts_on(ids, growth_metrics(matrix))
+            breakouts[metric] = flagged.assign(channel_name=flagged['channel_id'].map(names))
+    return breakouts
+
+
+def compose_breakout_tweet(metric, df, locale):
+    """
+    Compose the tweet listing the top breakout channels of a metric.
+
+    Args:
+        metric (str): The metric, a key of BREAKOUT_HEADERS.
+        df (pandas.DataFrame): The flagged channels, sorted by z-score.
+        locale (str): The locale of the tweet.
+
+    Returns:
+        str: The tweet text, fitting into the weighted limit.
+    """
+    lines = [localized(locale, BREAKOUT_HEADERS[metric])]
+    for n, row in enumerate(df.head(NUM_OF_BREAKOUTS).itertuples(), start=1):
+        lines.append(localized(locale, 'breakout_line', n=n, channel=to_hashtag(str(row.channel_name)),
+                               gain=format_views(round(row.rolling_mean))))
+    lines.append(localized(locale, 'breakout_footer'))
+    return fit_caption("\n".join(lines))
+
+
+def run_breakouts(history_df=None, run_date=None, dry_run=False):
+    """
+    Tweet the breakout channels in views and in subscribers of the run date to every publishing target.
+
+    Args:
+        history_df (pandas.DataFrame): The channel history, queried when not provided.
+        run_date (datetime.date): The day of the run, defaults to today.
+        dry_run (bool): Write the tweets to the dry-run file instead of posting them.
+
+    Returns:
+        int: The number of posted tweets, over all targets.
+    """
+    if history_df is None:
+        history_df = get_channel_history(run_date)
+
+    breakouts = {metric: df for metric, df in find_breakouts(history_df, run_date).items() if len(df)}
+    if not breakouts:
+        return 0
+
+    def compose(locale):
+        return [Post(compose_breakout_tweet(metric, df, locale)) for metric, df in breakouts.items()]
+
+    return publish(compose, dry_run=dry_run)
+
+
+@functions_framework.http
+@instrumented("tweet_breakout_channels")
+def tweet_breakout_channels(request):
+    """
+    HTTP Cloud Function tweeting the channels whose views or subscribers grow much faster than usual.
+
+    Args:
+        request (flask.Request): The request object.
+
+    Returns:
+        Response with the number of posted tweets.
+    """
+    try:
+        posted = run_breakouts()
+        return f"Posted {posted} breakout tweets.", 200
+    except Exception as e:
+        return f"An error occurred: {str(e)}", 500
@@ -1,25 +1,17 @@
 import functions_framework
 
 import datetime
-import requests
 import os
-from requests_oauthlib import OAuth1
 
 from google.cloud import bigquery
-from google.auth import default
 
-POLISH_SYMBOLS = "ąćęłńóśźż"
-ENGLISH_EQUIVALENTS = "acelnoszz"
-UNBOLDED_SYMBOLS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
-BOLDED_SYMBOLS = "𝗔𝗕𝗖𝗗𝗘𝗙𝗚𝗛𝗜𝗝𝗞𝗟𝗠𝗡𝗢𝗣𝗤𝗥𝗦𝗧𝗨𝗩𝗪𝗫𝗬𝗭𝗮𝗯𝗰𝗱𝗲𝗳𝗴𝗵𝗶𝗷𝗸𝗹𝗺𝗻𝗼𝗽𝗾𝗿𝘀𝘁𝘂𝘃𝘄𝘅𝘆𝘇𝟬𝟭𝟮𝟯𝟰𝟱𝟲𝟳𝟴𝟵"
-
-API_URL = "https://api.twitter.com/2/tweets"
-
-# Load Twitter API configuration from environment variables
-API_KEY = os.getenv('API_KEY')
-API_KEY_SECRET = os.getenv('API_KEY_SECRET')
-ACCESS_TOKEN = os.getenv('ACCESS_TOKEN')
-ACCESS_TOKEN_SECRET = os.getenv('ACCESS_TOKEN_SECRET')
+from yt_common.categories import label_categories, load_category_names
+from yt_common.clients import get_bigquery_client, get_credentials
+from yt_common.composer import compose_daily_top_tweets
+from yt_common.instrumentation import BQ_QUERY, instrumented, span
+from yt_common.locales import localized
+from yt_common.publishing import Post, publish
+from yt_common.records import ALL, CATEGORY, VIDEO_VIEWS, load_records
 
 # Load BigQuery configuration from environment variables
 PROJECT_ID = os.getenv('PROJECT_ID')
@@ -27,86 +19,180 @@ DATASET_NAME = os.getenv('DATASET_NAME')
 TABLE_CHANNEL_INFO = os.getenv('TABLE_CHANNEL_INFO')
 TABLE_CATEGORIES_NAME = os.getenv('TABLE_CATEGORIES_NAME')
 TABLE_DAILY_TOP_VIDEOS = os.getenv('TABLE_DAILY_TOP_VIDEOS')
+TABLE_RECORDS = os.getenv('TABLE_RECORDS', f'{TABLE_DAILY_TOP_VIDEOS}_records')
 
 
+NUM_OF_TWEETS = 6
+
 # Use Application Default Credentials (ADC)
-credentials, project = default()
-CLIENT_BQ = bigquery.Client(credentials=credentials, project=PROJECT_ID)
+credentials, project = get_credentials()
+CLIENT_BQ = get_bigquery_client(PROJECT_ID)
 
 
-def format_views(x):
+def get_daily_top_videos(run_date=None):
     """
-    Custom formatter function for number of views.
+    Retrieve the most viewed Polish video of each category of the latest capture.
+
+    The tweeted day is the latest capture day up to the day of the run: the capture of the run day
+    once the ingestion ran, the one of the day before otherwise. It is the capture the `daily_dag`
+    orchestrator selects from memory with `select_daily_top` right after its ingestion.
 
-    Parameters:
-        x (float): The tick value.
+    The selection is done in BigQuery: every video is joined only with the latest snapshot of its
+    channel, and only the top NUM_OF_TWEETS rows (one per category, by views) are returned. The
+    categories missing from the in-process category map are left out before the limit, and the
+    category names are added from the map.
+
+    Args:
+        run_date (datetime.date): The day of the run, the latest capture up to it is used.
+            Defaults to today.
 
     Returns:
-        str: The formatted views.
+        pandas.DataFrame: The top video of each category, sorted by views.
+    """
+    run_date = (run_date or datetime.date.today()).strftime('%Y-%m-%d')
+    query = f"""
+    WITH capture AS (
+        SELECT MAX(DATE(video_captured_at)) AS day
+        FROM `{PROJECT_ID}.{DATASET_NAME}.{TABLE_DAILY_TOP_VIDEOS}`
+        WHERE DATE(video_captured_at) <= DATE('{run_date}')
+    ),
+    daily_videos AS (
+        SELECT video_id, channel_id, video_category_id, video_title, video_views
+        FROM `{PROJECT_ID}.{DATASET_NAME}.{TABLE_DAILY_TOP_VIDEOS}`
+        WHERE DATE(video_captured_at) = (SELECT day FROM capture)
+        AND default_audio_language = 'pl'
+        AND video_category_id IN UNNEST(@category_ids)
+    ),
+    latest_channels AS (
+        SELECT channel_id, channel_name
+        FROM `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}`
+        WHERE DATE(updated_at) <= (SELECT day FROM capture)
+        AND channel_id IN (SELECT channel_id FROM daily_videos)
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY channel_id ORDER BY updated_at DESC) = 1
+    )
+    SELECT
+        dv.video_id,
+        dv.video_title,
+        dv.video_views,
+        dv.video_category_id,
+        lc.channel_name
+    FROM daily_videos AS dv
+    JOIN latest_channels AS lc
+    ON lc.channel_id = dv.channel_id
+    -- QUALIFY needs a WHERE, GROUP BY or HAVING clause
+    WHERE TRUE
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY dv.video_category_id ORDER BY dv.video_views DESC) = 1
+    ORDER BY dv.video_views DESC
+    LIMIT {NUM_OF_TWEETS}
     """
-    suffixes = ['', ' k', ' M', ' B']  # Suffixes for thousands, millions, billions
-    suffix_idx = 0
-    while abs(x) >= 1000 and suffix_idx < len(suffixes) - 1:
-        x /= 1000.0
-        suffix_idx += 1
-    if x % 1 == 0:
-        return f'{int(x):.0f}{suffixes[suffix_idx]}'
-    else:
-        return f'{x:.1f}{suffixes[suffix_idx]}'
 
+    names = get_category_names()
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter("category_ids", "STRING", sorted(names))]
+    )
 
-@functions_framework.http
-def tweet_daily_top(request):
-    """
-    Retrieve daily top videos from the database, generate a tweet with the top video details, and post it on Twitter.
+    with span(BQ_QUERY) as query_span:
+        top_daily_query = CLIENT_BQ.query(query, job_config=job_config)
+        df_top_daily = top_daily_query.to_dataframe()
+        query_span.add(bytes=top_daily_query.total_bytes_processed, rows=len(df_top_daily))
 
-    This function retrieves the daily top videos from the database and creates a tweet with the top video details,
-    including the category name, video title, video ID, and number of views. The tweet is then posted on Twitter.
+    return label_categories(df_top_daily, names)
+
+
+def get_category_names():
+    """
+    Return the category id to name map, loaded once per process.
 
     Returns:
-        str: A message indicating success or failure.
+        dict: Category id (str) -> category name.
     """
-    query = f"""
-    SELECT * 
-    FROM `{PROJECT_ID}.{DATASET_NAME}.{TABLE_DAILY_TOP_VIDEOS}` AS dtv
-    LEFT JOIN
-    `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CATEGORIES_NAME}` AS cn
-    ON CAST(dtv.video_category_id AS STRING) = CAST(cn.category_id AS STRING)
-    LEFT JOIN
-    `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}` AS ci
-    ON CAST(ci.channel_id AS STRING) = CAST(dtv.channel_id AS STRING)
-    WHERE 
-    DATE(video_captured_at) = DATE('{(datetime.datetime.now() - datetime.timedelta(days=1)).strftime('%Y-%m-%d')}')
-    AND default_audio_language = 'pl'
+    return load_category_names(PROJECT_ID, DATASET_NAME, TABLE_CATEGORIES_NAME)
+
+
+def select_daily_top(top_daily_videos, channel_info):
     """
+    Select the top videos from DataFrames already in memory, e.g. the ones just uploaded by the ingestion.
 
-    top_daily_query = CLIENT_BQ.query(query)
-    df_top_daily = top_daily_query.to_dataframe()
+    Run right after the ingestion, this is the latest capture `get_daily_top_videos` reads back.
+
+    Args:
+        top_daily_videos (pandas.DataFrame): The captured top videos.
+        channel_info (pandas.DataFrame): The channel info captured on the same day.
+
+    Returns:
+        pandas.DataFrame: The top NUM_OF_TWEETS Polish videos, one per category, sorted by views.
+    """
+    videos = top_daily_videos[top_daily_videos['default_audio_language'] == 'pl']
+    # Like the join of `get_daily_top_videos`, a video without its channel is left out instead of naming it #nan
+    df_top_daily = label_categories(videos, get_category_names()).merge(
+        channel_info[['channel_id', 'channel_name']].dropna(), how='inner', on='channel_id'
+    )
 
-    # Drop duplicate rows based on 'category_name' column and keep the first occurrence (highest value)
-    df_top_daily = df_top_daily.drop_duplicates(subset='category_name', keep='first')
     df_top_daily = df_top_daily.sort_values('video_views', ascending=False)
+    return df_top_daily.drop_duplicates(subset='video_category_id', keep='first').head(NUM_OF_TWEETS)
+
+
+def record_badges(df_top_daily, records):
+    """
+    Find the videos holding the all-time views record, overall or of their category.
+
+    Args:
+        df_top_daily (pandas.DataFrame): The top videos.
+        records (yt_common.records.RecordsIndex): The records index.
 
-    n = 1
-    for index, row in df_top_daily.iterrows():
-        tweet_output = f"""
-#YT_DAILY_TOP w kategorii #{row['category_name'].replace(' ', '_').replace('&', 'and')}
-Film: {row['video_title'].translate(str.maketrans(POLISH_SYMBOLS, ENGLISH_EQUIVALENTS)).translate(str.maketrans(UNBOLDED_SYMBOLS, BOLDED_SYMBOLS))}
-Views: {format_views(row['video_views'])}
-#youtube #top #{row['channel_name'].replace(' ', '_')}
-https://www.youtube.com/watch?v={row['video_id']}
-        """
-
-        oauth = OAuth1(API_KEY, API_KEY_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
-        response = requests.post(API_URL, json={"text": tweet_output}, auth=oauth)
-
-        if response.status_code == 201:
-            print(f"{n}. tweet posted successfully!")
-            n += 1
+    Returns:
+        list: For every video the locale key of its badge line, or None.
+    """
+    badges = []
+    for video_id, category_id in zip(df_top_daily['video_id'], df_top_daily['video_category_id']):
+        if records.holds_record(VIDEO_VIEWS, video_id, ALL):
+            badges.append('daily_top_record_all')
+        elif records.holds_record(VIDEO_VIEWS, video_id, CATEGORY, str(category_id)):
+            badges.append('daily_top_record_category')
         else:
-            print('Failed to post tweet:', response.status_code, response.text)
+            badges.append(None)
+    return badges
+
+
+def post_daily_top(df_top_daily, dry_run=False, records=None):
+    """
+    Post a tweet for each of the top NUM_OF_TWEETS videos to every publishing target, in its locale.
+
+    The videos holding an all-time views record get a badge line above the tweet.
+
+    Args:
+        df_top_daily (pandas.DataFrame): The top videos with the category and channel names.
+        dry_run (bool): Write the tweets to the dry-run file instead of posting them.
+        records (yt_common.records.RecordsIndex): The records index, loaded when not provided.
+
+    Returns:
+        int: The number of posted tweets, over all targets.
+    """
+    df_top_daily = df_top_daily.head(NUM_OF_TWEETS)
+    if records is None:
+        records = load_records(PROJECT_ID, DATASET_NAME, TABLE_RECORDS)
+    badges = record_badges(df_top_daily, records)
+
+    def compose(locale):
+        headers = [localized(locale, badge) if badge else None for badge in badges]
+        return [Post(text) for text in compose_daily_top_tweets(df_top_daily, localized(locale, 'daily_top_template'),
+                                                                headers=headers)]
 
-        if n > 6:
-            break
+    return publish(compose, dry_run=dry_run)
+
+
+@functions_framework.http
+@instrumented("tweet_daily_top")
+def tweet_daily_top(request):
+    """
+    Retrieve daily top videos from the database, generate a tweet with the top video details, and post it on Twitter.
+
+    This function retrieves the daily top videos from the database and creates a tweet with the top video details,
+    including the category name, video title, video ID, and number of views. The tweet is then posted on Twitter.
+
+    Returns:
+        str: A message indicating success or failure.
+    """
+    post_daily_top(get_daily_top_videos())
 
-    return "Completed tweet posting.", 200
\ No newline at end of file
+    return "Completed tweet posting.", 200
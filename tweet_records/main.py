@@ -0,0 +1,116 @@
+import functions_framework
+
+import datetime
+import os
+
+from yt_common.categories import load_category_names
+from yt_common.clients import get_bigquery_client, get_credentials
+from yt_common.composer import YOUTUBE_VIDEO_URL, fit_caption, format_views, to_hashtag
+from yt_common.instrumentation import instrumented
+from yt_common.locales import localized
+from yt_common.publishing import Post, publish
+from yt_common.records import CATEGORY, VIDEO_METRICS, load_records
+
+# Load BigQuery configuration from environment variables
+PROJECT_ID = os.getenv('PROJECT_ID')
+DATASET_NAME = os.getenv('DATASET_NAME')
+TABLE_CATEGORIES_NAME = os.getenv('TABLE_CATEGORIES_NAME')
+TABLE_DAILY_TOP_VIDEOS = os.getenv('TABLE_DAILY_TOP_VIDEOS')
+TABLE_RECORDS = os.getenv('TABLE_RECORDS', f'{TABLE_DAILY_TOP_VIDEOS}_records')
+
+NUM_OF_RECORD_TWEETS = 3
+
+# Use Application Default Credentials (ADC)
+credentials, project = get_credentials()
+CLIENT_BQ = get_bigquery_client(PROJECT_ID)
+
+
+def get_broken_records(records=None, run_date=None):
+    """
+    Retrieve the records taken from another video or channel on the run date.
+
+    Args:
+        records (yt_common.records.RecordsIndex): The records index, loaded when not provided.
+        run_date (datetime.date): The day of the run, defaults to today.
+
+    Returns:
+        list: The `Record` of the new leaders, the overall records first, at most NUM_OF_RECORD_TWEETS.
+    """
+    if records is None:
+        records = load_records(PROJECT_ID, DATASET_NAME, TABLE_RECORDS)
+    return records.broken_on(run_date or datetime.date.today())[:NUM_OF_RECORD_TWEETS]
+
+
+def compose_record_tweet(record, locale, category_names):
+    """
+    Compose the tweet announcing a broken record.
+
+    Args:
+        record (yt_common.records.Record): The new leader of a leaderboard.
+        locale (str): The locale of the tweet.
+        category_names (dict): Category id -> category name.
+
+    Returns:
+        str: The tweet text, fitting into the weighted limit.
+    """
+    is_video = record.metric in VIDEO_METRICS
+    scope = localized(
+        locale, f'record_scope_{record.scope}', region=record.scope_value,
+        category=to_hashtag(category_names.get(record.scope_value, record.scope_value)),
+    )
+    holder = record.entity_name if is_video else f"#{to_hashtag(record.entity_name)}"
+    lines = [
+        localized(locale, 'record_header'),
+        localized(locale, f'record_{record.metric}') + scope,
+        localized(locale, 'record_line', holder=holder, value=format_views(record.value)),
+        localized(locale, 'record_previous', value=format_views(record.previous_value)),
+        localized(locale, 'record_footer'),
+    ]
+    if is_video:
+        lines.append(YOUTUBE_VIDEO_URL.format(video_id=record.entity_id))
+    return fit_caption("\n".join(lines))
+
+
+def run_records(records=None, run_date=None, dry_run=False):
+    """
+    Tweet the all-time records broken on the run date to every publishing target.
+
+    Args:
+        records (yt_common.records.RecordsIndex): The records index, loaded when not provided.
+        run_date (datetime.date): The day of the run, defaults to today.
+        dry_run (bool): Write the tweets to the dry-run file instead of posting them.
+
+    Returns:
+        int: The number of posted tweets, over all targets.
+    """
+    broken = get_broken_records(records, run_date)
+    if not broken:
+        return 0
+
+    category_names = {}
+    if any(record.scope == CATEGORY for record in broken):
+        category_names = load_category_names(PROJECT_ID, DATASET_NAME, TABLE_CATEGORIES_NAME)
+
+    def compose(locale):
+        return [Post(compose_record_tweet(record, locale, category_names)) for record in broken]
+
+    return publish(compose, dry_run=dry_run)
+
+
+@functions_framework.http
+@instrumented("tweet_records")
+def tweet_records(request):
+    """
+    HTTP Cloud Function tweeting the all-time records broken by today's ingestion.
+
+    Args:
+        request (flask.Request): The request object.
+
+    Returns:
+        Response with the number of posted tweets.
+    """
+    try:
+        posted = run_records()
+        return f"Posted {posted} record tweets.", 200
+    except Exception as e:
+        return f"An error occurred: {str(e)}", 500
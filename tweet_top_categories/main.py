@@ -1,27 +1,19 @@
 import functions_framework
 
+import datetime
+import io
 import os
-import re
-import requests
 
-import tweepy
-from requests_oauthlib import OAuth1
-
-
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from wordcloud import WordCloud
 
-from google.cloud import bigquery
-from google.auth import default
-
-
-# Load Twitter API configuration from environment variables
-API_KEY = os.getenv('API_KEY')
-API_KEY_SECRET = os.getenv('API_KEY_SECRET')
-ACCESS_TOKEN = os.getenv('ACCESS_TOKEN')
-ACCESS_TOKEN_SECRET = os.getenv('ACCESS_TOKEN_SECRET')
-
-API_URL = "https://api.twitter.com/2/tweets"
+from yt_common.categories import label_categories, load_category_names
+from yt_common.clients import get_bigquery_client, get_credentials
+from yt_common.composer import fit_caption
+from yt_common.instrumentation import BQ_QUERY, RENDER, instrumented, span
+from yt_common.locales import localized
+from yt_common.overlays import add_title
+from yt_common.publishing import Post, publish
 
 # Load BigQuery configuration from environment variables
 PROJECT_ID = os.getenv('PROJECT_ID')
@@ -32,50 +24,56 @@ TABLE_DAILY_TOP_VIDEOS = os.getenv('TABLE_DAILY_TOP_VIDEOS')
 
 
 # Use Application Default Credentials (ADC)
-credentials, project = default()
-CLIENT_BQ = bigquery.Client(credentials=credentials, project=PROJECT_ID)
+credentials, project = get_credentials()
+CLIENT_BQ = get_bigquery_client(PROJECT_ID)
 
 
-def get_top_categories_weekly():
+def get_top_categories_weekly(run_date=None):
     """
     Retrieve the top categories based on their occurrences in the daily top videos dataset.
 
+    Args:
+        run_date (datetime.date): The day of the run, the 7 days before it are counted. Defaults to today.
+
     Returns:
         pandas.DataFrame: A DataFrame containing the top categories and their corresponding occurrences.
     """
+    run_date = run_date or datetime.date.today()
     query = f"""
     SELECT
-        cn.category_name, count(*) as occurrences
+        video_category_id, count(*) as occurrences
     FROM
-        `{PROJECT_ID}.{DATASET_NAME}.{TABLE_DAILY_TOP_VIDEOS}` as dtv
-    LEFT JOIN
-        `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CATEGORIES_NAME}` AS cn
-    ON
-        CAST(dtv.video_category_id AS STRING) = CAST(cn.category_id AS STRING)
+        `{PROJECT_ID}.{DATASET_NAME}.{TABLE_DAILY_TOP_VIDEOS}`
     WHERE
-        DATE(video_captured_at) BETWEEN DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY) AND DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)
+        DATE(video_captured_at) BETWEEN DATE_SUB(DATE('{run_date.strftime('%Y-%m-%d')}'), INTERVAL 7 DAY) AND DATE_SUB(DATE('{run_date.strftime('%Y-%m-%d')}'), INTERVAL 1 DAY)
     GROUP BY
-        cn.category_name;
+        video_category_id;
     """
 
-    top_categories = CLIENT_BQ.query(query)
+    with span(BQ_QUERY) as query_span:
+        top_categories = CLIENT_BQ.query(query)
 
-    top_categories_df = top_categories.to_dataframe()
+        top_categories_df = top_categories.to_dataframe()
+        query_span.add(bytes=top_categories.total_bytes_processed, rows=len(top_categories_df))
 
-    top_categories_df = top_categories_df.sort_values('occurrences', ascending=False)
+    names = load_category_names(PROJECT_ID, DATASET_NAME, TABLE_CATEGORIES_NAME)
+    top_categories_df = label_categories(top_categories_df, names)
 
-    return top_categories_df.dropna(subset=['category_name'])
+    return top_categories_df.sort_values('occurrences', ascending=False)
 
 
 def generate_categories_wordcloud(df):
     """
-    Generate and save a word cloud of the categories based on their occurrences and add a title to the plot.
+    Generate a word cloud of the categories based on their occurrences.
+
+    The figure is created without pyplot and rendered to memory, so concurrent requests never share
+    a figure or a file. It has no title: the localized title is added per locale with `add_title`.
 
     Args:
         df (pandas.DataFrame): DataFrame containing the category name and occurrences.
 
     Returns:
-        None
+        bytes: The PNG image.
     """
     # Create a dictionary of word frequencies
     category_frequencies = dict(zip([category.replace('_', ' ') for category in df.category_name], df.occurrences))
@@ -89,55 +87,52 @@ def generate_categories_wordcloud(df):
     ).generate_from_frequencies(frequencies=category_frequencies)
 
     # Create a figure with a background color
-    fig, ax = plt.subplots(figsize=(8, 6), facecolor='#007ea7')
+    fig = Figure(figsize=(8, 6), facecolor='#007ea7')
+    ax = fig.subplots()
 
     # Display the word cloud without axis and with adjusted spacing
     ax.imshow(wordcloud, interpolation='bilinear')
     ax.axis('off')
-    plt.tight_layout()
-
-    # Add the title to the word cloud with larger font size
-    plt.title("Najpopularniejsze kategorie w tym tygodniu",
-              fontsize=30,  # Larger font size
-              color='#ccdbdc',
-              fontweight='bold')  # Use default font for title
-
-    # Save the word cloud as an image with the specified background color
-    plt.savefig('categories_wordcloud.png', dpi=300, facecolor='#007ea7', bbox_inches='tight')
+    fig.tight_layout()
 
-    # Show the plot
-    plt.show()
+    # Render the word cloud as an image with the specified background color
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=300, facecolor='#007ea7', bbox_inches='tight')
+    return buffer.getvalue()
 
 
-def tweet_image(image_path, caption):
+def run_top_categories(df=None, run_date=None, dry_run=False):
     """
-    Uploads an image to Twitter and posts a tweet with the uploaded image and a caption.
+    Generate the word cloud of the top categories once and tweet it to every publishing target, in its locale.
 
     Args:
-        image_path (str): The file path of the image to upload.
-        caption (str): The text to include in the tweet.
+        df (pandas.DataFrame): Category names and occurrences, queried when not provided.
+        run_date (datetime.date): The day of the run, defaults to today.
+        dry_run (bool): Write the tweet to the dry-run file instead of posting it.
 
     Returns:
-        None
+        int: The number of posted tweets, over all targets.
     """
-    tweepy_auth = tweepy.OAuth1UserHandler(
-        API_KEY, API_KEY_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET
-    )
-    tweepy_api = tweepy.API(tweepy_auth)
-    post = tweepy_api.simple_upload(image_path)
-    text = str(post)
-    media_id = re.search("media_id=(.+?),", text).group(1)
-    payload = {
-        "media": {"media_ids": [media_id]},
-        "text": caption
-    }
+    # Get top categories from BigQuery
+    if df is None:
+        df = get_top_categories_weekly(run_date)
 
-    oauth = OAuth1(API_KEY, API_KEY_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
-    response = requests.post(API_URL, json=payload, auth=oauth)
+    # Generate the word cloud
+    with span(RENDER, rows=len(df)):
+        image = generate_categories_wordcloud(df)
 
+    # Tweet the generated word cloud image with a localized title and caption
+    def compose(locale):
+        titled = add_title(image, localized(locale, 'categories_title'),
+                           fontsize=30,  # Larger font size
+                           color='#ccdbdc', background='#007ea7')
+        return [Post(fit_caption(localized(locale, 'categories_caption')), titled, "categories_wordcloud.png")]
+
+    return publish(compose, dry_run=dry_run)
 
 
 @functions_framework.http
+@instrumented("tweet_top_categories")
 def hello_http(request):
     """
     HTTP Cloud Function to generate a word cloud of top YouTube categories and tweet it.
@@ -149,14 +144,7 @@ def hello_http(request):
         flask.Response: A response confirming the success of the function.
     """
     try:
-        # Get top categories from BigQuery
-        df = get_top_categories_weekly()
-
-        # Generate and save the word cloud
-        generate_categories_wordcloud(df)
-
-        # Tweet the generated word cloud image with a caption
-        tweet_image("categories_wordcloud.png", "Najpopularniejsze kategorie na Polskim YT w tym tygodniu")
+        run_top_categories()
 
         # Return a success message as an HTTP response
         return "Word cloud generated and tweeted successfully", 200
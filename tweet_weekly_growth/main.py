@@ -1,35 +1,28 @@
+import io
 import os
-import re
 import time
 import datetime
 import ssl
 import requests
 
-import tweepy
-from requests_oauthlib import OAuth1
-
 import seaborn as sns
 import numpy as np
+import pandas as pd
 
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
 from matplotlib.ticker import FuncFormatter
 
 from PIL import Image, ImageDraw
 
-from google.cloud import bigquery
-from google.auth import default
-
 import functions_framework
 
-
-# Load Twitter API configuration from environment variables
-API_KEY = os.getenv('API_KEY')
-API_KEY_SECRET = os.getenv('API_KEY_SECRET')
-ACCESS_TOKEN = os.getenv('ACCESS_TOKEN')
-ACCESS_TOKEN_SECRET = os.getenv('ACCESS_TOKEN_SECRET')
-
-API_URL = "https://api.twitter.com/2/tweets"
+from yt_common.clients import get_bigquery_client, get_credentials
+from yt_common.composer import fit_caption
+from yt_common.instrumentation import BQ_QUERY, IMAGE_DOWNLOAD, RENDER, instrumented, span
+from yt_common.locales import localized
+from yt_common.overlays import add_title
+from yt_common.publishing import Post, publish
 
 # Load BigQuery configuration from environment variables
 PROJECT_ID = os.getenv('PROJECT_ID')
@@ -38,9 +31,11 @@ TABLE_CHANNEL_INFO = os.getenv('TABLE_CHANNEL_INFO')
 TABLE_CATEGORIES_NAME = os.getenv('TABLE_CATEGORIES_NAME')
 TABLE_DAILY_TOP_VIDEOS = os.getenv('TABLE_DAILY_TOP_VIDEOS')
 
+NUM_OF_TOP_CHANNELS = 5
+
 # Use Application Default Credentials (ADC)
-credentials, project = default()
-CLIENT_BQ = bigquery.Client(credentials=credentials, project=PROJECT_ID)
+credentials, project = get_credentials()
+CLIENT_BQ = get_bigquery_client(PROJECT_ID)
 
 
 def format_tick_labels(x, pos):
@@ -65,38 +60,49 @@ def format_tick_labels(x, pos):
         return f'{x:.2f}{suffixes[suffix_idx]}'
 
 
-def download_image(url, channel_name):
+def download_image(url):
     """
-    Downloads an image from the specified URL and saves it locally with the channel name.
+    Downloads an image from the specified URL.
 
     Args:
         url (str): The URL of the image to download.
-        channel_name (str): The name of the channel to use as the file name for the downloaded image.
 
     Returns:
-        None: The image is saved to disk with the filename format '{channel_name}.jpg'.
+        bytes: The content of the image.
     """
     ctx = ssl.create_default_context()
     ctx.check_hostname = False
     ctx.verify_mode = ssl.CERT_NONE
 
-    response = requests.get(url, verify=False)
-    with open(f'{channel_name}.jpg', 'wb') as f:
-        f.write(response.content)
+    with span(IMAGE_DOWNLOAD, api_calls=1) as download_span:
+        response = requests.get(url, verify=False)
+        download_span.add(bytes=len(response.content))
+    return response.content
+
+def download_channel_logos(df):
+    """
+    Downloads the logos of all channels in the DataFrame.
+
+    Args:
+        df (pandas.DataFrame): The DataFrame containing the channel names and logo URLs.
+
+    Returns:
+        dict: Channel name -> content of its logo, kept in memory so concurrent requests never share files.
+    """
+    return {row['channel_name']: download_image(row['channel_logo_url']) for index, row in df.iterrows()}
+
 
-def get_image(channel_name):
+def get_image(content):
     """
-    Loads an image from the local file system based on the channel name.
+    Decodes a downloaded image.
 
     Args:
-        channel_name (str): The name of the channel used to locate the image file (expects '{channel_name}.jpg').
+        content (bytes): The content of the image file.
 
     Returns:
         np.ndarray: The image as a NumPy array.
     """
-    path = f"{channel_name}.jpg"
-    im = plt.imread(path)
-    return im
+    return np.asarray(Image.open(io.BytesIO(content)).convert('RGB'))
 
 def create_inscribed_circle_image(image):
     """
@@ -133,20 +139,20 @@ def create_inscribed_circle_image(image):
 
     return circle_image
 
-def offset_image(coord, channel_name, width_of_bar, ax):
+def offset_image(coord, logo, width_of_bar, ax):
     """
     Places an image next to a bar on a bar plot at a specific coordinate.
 
     Args:
         coord (float): The y-coordinate of the bar (e.g., index or position on the y-axis).
-        channel_name (str): The name of the channel used to locate and load the image.
+        logo (bytes): The content of the channel logo.
         width_of_bar (float): The width or position of the bar to determine where the image will be placed.
         ax (matplotlib.axes.Axes): The matplotlib axes object to which the image will be added.
 
     Returns:
         None: The image is added to the plot next to the bar.
     """
-    img = get_image(channel_name)
+    img = get_image(logo)
     img = create_inscribed_circle_image(img)
     im = OffsetImage(img, zoom=0.15)
     im.image.axes = ax
@@ -157,14 +163,18 @@ def offset_image(coord, channel_name, width_of_bar, ax):
     ax.add_artist(ab)
 
 
-def get_top_views_increase():
+def get_top_views_increase(run_date=None):
     """
     Retrieve the top channels with the highest views increase in the current day compared to the previous day.
 
+    Args:
+        run_date (datetime.date): The day of the run, defaults to today.
+
     Returns:
         pandas.core.frame.DataFrame: A DataFrame containing the top channels with their channel ID, name,
         logo URL, and views difference between the current day and the previous day.
     """
+    run_date = run_date or datetime.date.today()
     query = f"""
     SELECT
       channel_id,
@@ -174,12 +184,12 @@ def get_top_views_increase():
         SELECT MAX(total_views)
         FROM `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}`
         WHERE channel_id = t.channel_id
-          AND DATE(updated_at) = DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)
+          AND DATE(updated_at) = DATE_SUB(DATE('{run_date.strftime('%Y-%m-%d')}'), INTERVAL 1 DAY)
       ) - (
         SELECT MAX(total_views)
         FROM `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}`
         WHERE channel_id = t.channel_id
-          AND DATE(updated_at) = DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
+          AND DATE(updated_at) = DATE_SUB(DATE('{run_date.strftime('%Y-%m-%d')}'), INTERVAL 7 DAY)
       ) AS views_difference
     FROM
       `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}` AS t
@@ -189,24 +199,30 @@ def get_top_views_increase():
       channel_id, channel_name, channel_logo_url;
     """
 
-    week_views_increase_query = CLIENT_BQ.query(query)
-    week_views_increase_df = week_views_increase_query.to_dataframe()
+    with span(BQ_QUERY) as query_span:
+        week_views_increase_query = CLIENT_BQ.query(query)
+        week_views_increase_df = week_views_increase_query.to_dataframe()
+        query_span.add(bytes=week_views_increase_query.total_bytes_processed, rows=len(week_views_increase_df))
 
     week_views_increase_df = week_views_increase_df.sort_values('views_difference', ascending=False)
-    week_views_increase_df = week_views_increase_df[:5]
+    week_views_increase_df = week_views_increase_df[:NUM_OF_TOP_CHANNELS]
 
     return week_views_increase_df
 
 
-def get_top_subs_increase():
+def get_top_subs_increase(run_date=None):
     """
     Retrieve the top channels with the highest increase in subscriber count over the past 7 days.
 
+    Args:
+        run_date (datetime.date): The day of the run, defaults to today.
+
     Returns:
         pandas.core.frame.DataFrame: A DataFrame containing the top channels with their channel ID, name,
         logo URL, subscriber count difference between the current day and 7 days ago, and the percentage increase
         in subscribers.
     """
+    run_date = run_date or datetime.date.today()
     query = f"""
     SELECT
         channel_id,
@@ -216,12 +232,12 @@ def get_top_subs_increase():
             SELECT MAX(channel_subs)
             FROM `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}`
             WHERE channel_id = t.channel_id
-            AND DATE(updated_at) = DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)
+            AND DATE(updated_at) = DATE_SUB(DATE('{run_date.strftime('%Y-%m-%d')}'), INTERVAL 1 DAY)
         ) - (
             SELECT MAX(channel_subs)
             FROM `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}`
             WHERE channel_id = t.channel_id
-            AND DATE(updated_at) = DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
+            AND DATE(updated_at) = DATE_SUB(DATE('{run_date.strftime('%Y-%m-%d')}'), INTERVAL 7 DAY)
         ) AS subs_difference
     FROM
         `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}` AS t
@@ -231,44 +247,47 @@ def get_top_subs_increase():
         channel_id, channel_name, channel_logo_url;
     """
 
-    week_subs_increase_query = CLIENT_BQ.query(query)
-    week_subs_increase_df = week_subs_increase_query.to_dataframe()
+    with span(BQ_QUERY) as query_span:
+        week_subs_increase_query = CLIENT_BQ.query(query)
+        week_subs_increase_df = week_subs_increase_query.to_dataframe()
+        query_span.add(bytes=week_subs_increase_query.total_bytes_processed, rows=len(week_subs_increase_df))
 
     week_subs_increase_df = week_subs_increase_df.sort_values('subs_difference', ascending=False)
-    week_subs_increase_df = week_subs_increase_df[:5]
+    week_subs_increase_df = week_subs_increase_df[:NUM_OF_TOP_CHANNELS]
 
     return week_subs_increase_df
 
 
-def generate_views_barplot(df):
+def generate_barplot(df, value_column):
     """
-    Generate a bar plot showing the highest weekly increase in views for each channel.
+    Generate a bar plot of a value per channel, with the channel logos pinned to the bars.
+
+    The figure is created without pyplot and styled through its own artists instead of the
+    global rcParams and seaborn style, so concurrent requests can render at the same time.
+    It has no title: the localized title is added per locale with `add_title_overlay`.
 
     Args:
-        df (pandas.DataFrame): The DataFrame containing channel information with views difference.
+        df (pandas.DataFrame): The DataFrame containing the channel names and the values.
+        value_column (str): The column of the values.
 
     Returns:
-        None
+        bytes: The PNG image.
     """
-    # Create images for youtube channels
-    for index, row in df.iterrows():
-        download_image(row['channel_logo_url'], row['channel_name'])
-
     # Background and color palette
     background_color = "#007ea7"  # Kolor tła
-    sns.set_style("darkgrid", {"axes.facecolor": background_color})
+    text_color = '#ccdbdc'
     color_palette = sns.color_palette(["#003249"])
 
-    # Font parameters
-    plt.rcParams['font.family'] = 'monospace'
-    plt.rcParams['font.size'] = 10
-    plt.rcParams['text.color'] = '#ccdbdc'
-
     # Background color
-    fig, ax = plt.subplots(figsize=(8, 6), facecolor=background_color)
+    fig = Figure(figsize=(8, 6), facecolor=background_color)
+    ax = fig.subplots()
+    ax.set_facecolor(background_color)
+    ax.set_axisbelow(True)
+    ax.yaxis.grid(True, color="white")
+    ax.tick_params(length=0)
 
     # Create bar plot
-    ax = sns.barplot(x='views_difference', y='channel_name', data=df, palette=color_palette)
+    sns.barplot(x=value_column, y='channel_name', data=df, palette=color_palette, ax=ax)
 
     # Set y ticks
     ax.set_yticks(ax.get_yticks())
@@ -282,7 +301,7 @@ def generate_views_barplot(df):
         new_labels.append(new_label)
 
     # Set new label for y
-    ax.set_yticklabels(new_labels, fontsize=8, fontweight='bold', color='#ccdbdc')
+    ax.set_yticklabels(new_labels, fontsize=8, fontweight='bold', color=text_color, fontfamily='monospace')
 
     # Set padding on y
     ax.tick_params(axis='y', which='major', pad=0)
@@ -294,10 +313,11 @@ def generate_views_barplot(df):
     ax.set_xlabel('')
 
     # X axis lim
-    plt.xlim(0, max(list(df.views_difference)) * 1.15)
+    ax.set_xlim(0, max(list(df[value_column])) * 1.15)
 
     # Add bolding to xlabel
-    ax.set_xticklabels(ax.get_xticklabels(), fontsize=10, fontweight='bold', color='#ccdbdc')
+    ax.set_xticks(ax.get_xticks())
+    ax.set_xticklabels(ax.get_xticklabels(), fontsize=10, fontweight='bold', color=text_color, fontfamily='monospace')
 
     formatter = FuncFormatter(format_tick_labels)
     ax.xaxis.set_major_formatter(formatter)
@@ -314,141 +334,107 @@ def generate_views_barplot(df):
         patch.set_edgecolor("#124559")
         patch.set_linewidth(1.2)
 
-
-    # Set chart background color
-    fig.patch.set_facecolor(background_color)
-
-
     # Pin youtube channel logo
-    for i, (c, v) in enumerate(zip(list(df.channel_name), list(df.views_difference))):
-        offset_image(i, c, v, ax)
-
+    for i, (logo, v) in enumerate(zip(list(df.logo), list(df[value_column]))):
+        offset_image(i, logo, v, ax)
 
+    # Render chart
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
+    return buffer.getvalue()
 
-    # Set chart title
-    plt.title("Najwyższy tygodniowy wzrost wyświetleń", fontsize=16, fontweight='bold', color='#ccdbdc')
 
-    # Save chart
-    plt.savefig('barplot_views.png', dpi=300, bbox_inches='tight')
+def generate_views_barplot(df, logos):
+    """
+    Generate a bar plot showing the highest weekly increase in views for each channel.
 
-    # Close
-    plt.close('all')
+    Args:
+        df (pandas.DataFrame): The DataFrame containing channel information with views difference.
+        logos (dict): Channel name -> logo, from `download_channel_logos`.
 
+    Returns:
+        bytes: The PNG image.
+    """
+    return generate_barplot(df.assign(logo=df['channel_name'].map(logos)), 'views_difference')
 
 
-def generate_subs_barplot(df):
+def generate_subs_barplot(df, logos):
     """
     Generate a bar plot showing the highest weekly increase in subscribers for each channel.
 
     Args:
         df (pandas.DataFrame): The DataFrame containing channel information with subscriber difference.
+        logos (dict): Channel name -> logo, from `download_channel_logos`.
 
     Returns:
-        None
+        bytes: The PNG image.
     """
-    # Create images for youtube channels
-    for index, row in df.iterrows():
-        download_image(row['channel_logo_url'], row['channel_name'])
-
-    # Background and color palette
-    background_color = "#007ea7"  # Kolor tła
-    sns.set_style("darkgrid", {"axes.facecolor": background_color})
-    color_palette = sns.color_palette(["#003249"])
-
-    # Font parameters
-    plt.rcParams['font.family'] = 'monospace'
-    plt.rcParams['font.size'] = 10
-    plt.rcParams['text.color'] = '#ccdbdc'
-
-    # Background color
-    fig, ax = plt.subplots(figsize=(8, 6), facecolor=background_color)
-
-    # Create bar plot
-    ax = sns.barplot(x='subs_difference', y='channel_name', data=df, palette=color_palette)
-
-    # Set y ticks
-    ax.set_yticks(ax.get_yticks())
-
-    # Separate channel names
-    labels = ax.get_yticklabels()
-    new_labels = []
-    for label in labels:
-        words = label.get_text().split()
-        new_label = '\n'.join(words)
-        new_labels.append(new_label)
-
-    # Set new label for y
-    ax.set_yticklabels(new_labels, fontsize=8, fontweight='bold', color='#ccdbdc')
-
-    # Set padding on y
-    ax.tick_params(axis='y', which='major', pad=0)
-
-    # Hide y axis name
-    ax.set_ylabel('')
-
-    # Hide x axis name
-    ax.set_xlabel('')
-
-    # X axis lim
-    plt.xlim(0, max(list(df.subs_difference)) * 1.15)
+    return generate_barplot(df.assign(logo=df['channel_name'].map(logos)), 'subs_difference')
 
-    # Add bolding to xlabel
-    ax.set_xticklabels(ax.get_xticklabels(), fontsize=10, fontweight='bold', color='#ccdbdc')
 
-    formatter = FuncFormatter(format_tick_labels)
-    ax.xaxis.set_major_formatter(formatter)
-
-    # Delete chart frame
-    for spine in ax.spines.values():
-        spine.set_visible(False)
-
-    # Set grid color
-    ax.xaxis.grid(True, color="#1a659e")
-
-    # Set bar patches
-    for patch in ax.patches:
-        patch.set_edgecolor("#124559")
-        patch.set_linewidth(1.2)
+def add_title_overlay(image, title):
+    """
+    Add a title to a bar plot, in the style of its labels.
 
+    Args:
+        image (bytes): The PNG image of the bar plot.
+        title (str): The localized title.
 
-    # Set chart background color
-    fig.patch.set_facecolor(background_color)
+    Returns:
+        bytes: The PNG image with the title.
+    """
+    return add_title(image, title, fontsize=16, color='#ccdbdc', background='#007ea7', fontfamily='monospace')
 
 
-    # Pin youtube channel logo
-    for i, (c, v) in enumerate(zip(list(df.channel_name), list(df.subs_difference))):
-        offset_image(i, c, v, ax)
+def run_weekly_growth(views_df=None, subs_df=None, run_date=None, dry_run=False):
+    """
+    Generate the weekly growth bar plots once and tweet them to every publishing target, in its locale.
 
+    Args:
+        views_df (pandas.DataFrame): Top channels by views increase, queried when not provided.
+        subs_df (pandas.DataFrame): Top channels by subscribers increase, queried when not provided.
+        run_date (datetime.date): The day of the run, defaults to today.
+        dry_run (bool): Write the tweets to the dry-run file instead of posting them.
 
+    Returns:
+        int: The number of posted tweets, over all targets.
+    """
+    # Get top channels with the highest increase in views and subscribers
+    run_date = run_date or datetime.date.today()
+    df = get_top_views_increase(run_date) if views_df is None else views_df
+    df1 = get_top_subs_increase(run_date) if subs_df is None else subs_df
 
-    # Set chart title
-    plt.title("Najwyższy tygodniowy wzrost subskrybentów", fontsize=16, fontweight='bold', color='#ccdbdc')
+    # Download the logos of the youtube channels
+    logos = download_channel_logos(pd.concat([df, df1]).drop_duplicates('channel_name'))
 
-    # Save chart
-    plt.savefig('barplot_subs.png', dpi=300, bbox_inches='tight')
+    # Generate the bar plots for views and subscribers growth
+    with span(RENDER, rows=len(df)):
+        views_image = generate_views_barplot(df, logos)
+    with span(RENDER, rows=len(df1)):
+        subs_image = generate_subs_barplot(df1, logos)
 
-    # Close
-    plt.close('all')
+    # Define date range for the tweet caption
+    today = run_date
 
+    week_before = today - datetime.timedelta(days=7)
 
-def tweet_image(image_path, caption):
-    tweepy_auth = tweepy.OAuth1UserHandler(
-        API_KEY, API_KEY_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET
-    )
-    tweepy_api = tweepy.API(tweepy_auth)
-    post = tweepy_api.simple_upload(image_path)
-    text = str(post)
-    media_id = re.search("media_id=(.+?),", text).group(1)
-    payload = {
-        "media": {"media_ids": [media_id]},
-        "text": caption
-    }
+    def compose(locale):
+        date_format = localized(locale, 'date_format')
+        _date_range = f"{week_before.strftime(date_format)} - {today.strftime(date_format)}"
+        return [
+            # Tweet the generated bar plot for top views increase
+            Post(fit_caption(localized(locale, 'weekly_views_caption', date_range=_date_range)),
+                 add_title_overlay(views_image, localized(locale, 'weekly_views_title')), "barplot_views.png"),
+            # Tweet the generated bar plot for top subscribers increase
+            Post(fit_caption(localized(locale, 'weekly_subs_caption', date_range=_date_range)),
+                 add_title_overlay(subs_image, localized(locale, 'weekly_subs_title')), "barplot_subs.png"),
+        ]
 
-    oauth = OAuth1(API_KEY, API_KEY_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
-    response = requests.post(API_URL, json=payload, auth=oauth)
+    return publish(compose, dry_run=dry_run)
 
 
 @functions_framework.http
+@instrumented("tweet_weekly_growth")
 def hello_http(request):
     """
     HTTP Cloud Function to generate bar plots for the highest weekly growth in YouTube views and subscribers,
@@ -461,28 +447,7 @@ def hello_http(request):
         flask.Response: A response confirming the success of the function.
     """
     try:
-        # Get top channels with the highest increase in views and subscribers
-        df = get_top_views_increase()
-        df1 = get_top_subs_increase()
-
-        # Generate and save bar plots for views and subscribers growth
-        generate_views_barplot(df)
-        generate_subs_barplot(df1)
-
-        # Define date range for the tweet caption (replace _date_range with your actual logic)
-        today = datetime.date.today()
-
-        week_before = today - datetime.timedelta(days=7)
-
-        date_format = "%d.%m.%Y"
-        _date_range = f"{week_before.strftime(date_format)} - {today.strftime(date_format)}"
-
-
-        # Tweet the generated bar plot for top views increase
-        tweet_image("barplot_views.png", f"Najwyższy tygodniowy wzrost wyświetleń na Polskim YT ({_date_range})")
-
-        # Tweet the generated bar plot for top subscribers increase
-        tweet_image("barplot_subs.png", f"Najwyższy tygodniowy wzrost subskrybentów na Polskim YT ({_date_range})")
+        run_weekly_growth()
 
         # Return a success message as an HTTP response
         return "Bar plots generated and tweeted successfully", 200
@@ -490,9 +455,3 @@ def hello_http(request):
     except Exception as e:
         # Return an error message and status code 500 for server errors
         return f"An error occurred: {str(e)}", 500
-
-        return "Word cloud generated and tweeted successfully", 200
-
-    except Exception as e:
-        # Return an error message and status code 500 for server errors
-        return f"An error occurred: {str(e)}", 500
\ No newline at end of file
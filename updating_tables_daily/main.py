@@ -1,147 +1,483 @@
 import functions_framework
+import hmac
+import json
 import os
-import time
 import pandas as pd
 import pandas_gbq
+import uuid
+import zlib
 from datetime import datetime
 from dateutil import parser
 
+from google.auth.transport import requests as google_requests
 from google.cloud import bigquery
-from googleapiclient.discovery import build
-from google.auth import default
+from google.oauth2 import id_token
+from googleapiclient.errors import HttpError
 
 # Import your schema and method from your package
 from yt_config.schemas import (
+    CATEGORIES_NAME_SCHEMA,
     CHANNEL_INFO_SCHEMA,
-    CHANNEL_INFO_CLUSTERING,
+    CHANNEL_METADATA_SCHEMA,
+    CHANNEL_METADATA_CLUSTERING,
+    CHANNEL_SNAPSHOTS_SCHEMA,
+    CHANNEL_SNAPSHOTS_CLUSTERING,
     DAILY_TOP_VIDEOS_SCHEMA,
-    DAILY_TOP_VIDEOS_CLUSTERING,
+    RECORDS_SCHEMA,
+    SHARD_STATUS_SCHEMA,
+    SHARD_STATUS_CLUSTERING,
+    VIDEO_METADATA_SCHEMA,
+    VIDEO_METADATA_CLUSTERING,
+    VIDEO_SNAPSHOTS_SCHEMA,
+    VIDEO_SNAPSHOTS_CLUSTERING,
+    VIDEO_VELOCITY_SCHEMA,
+    VIDEO_VELOCITY_CLUSTERING,
+    VIDEO_VELOCITY_STAGING_SCHEMA,
 )
+from yt_config.frames import DESCRIPTION_COLUMNS, build_frame, without_descriptions
 from yt_config.methods import convert_duration_to_seconds
+from yt_config.records import record_candidates, update_leaderboards
+from yt_config.shards import (
+    DISPATCHED,
+    DONE,
+    FAILED,
+    WORKER_SECRET_HEADER,
+    CloudTasksQueue,
+    HttpQueue,
+    InProcessQueue,
+    split_shards,
+)
+from yt_config.snapshots import migration_query, split_snapshot, wide_view_query
+from yt_common.categories import load_category_names
+from yt_common.clients import get_bigquery_client, get_credentials, get_youtube_client
+from yt_common.records import RECORDS_TOP_K, WEEKLY_GAIN_DAYS, get_records
+from yt_common.instrumentation import (
+    API_FETCH,
+    PARSE,
+    BQ_QUERY,
+    BQ_UPLOAD,
+    YT_LIST_QUOTA_UNITS,
+    current_run,
+    instrumented,
+    span,
+)
 
 # Load configuration from environment variables
 PROJECT_ID = os.getenv('PROJECT_ID')
 DATASET_NAME = os.getenv('DATASET_NAME')
 TABLE_CHANNEL_INFO = os.getenv('TABLE_CHANNEL_INFO')
+TABLE_CATEGORIES_NAME = os.getenv('TABLE_CATEGORIES_NAME')
 TABLE_DAILY_TOP_VIDEOS = os.getenv('TABLE_DAILY_TOP_VIDEOS')
+# TABLE_CHANNEL_INFO and TABLE_DAILY_TOP_VIDEOS are views over the snapshot and metadata tables
+TABLE_CHANNEL_SNAPSHOTS = os.getenv('TABLE_CHANNEL_SNAPSHOTS', f'{TABLE_CHANNEL_INFO}_snapshots')
+TABLE_CHANNEL_METADATA = os.getenv('TABLE_CHANNEL_METADATA', f'{TABLE_CHANNEL_INFO}_metadata')
+TABLE_VIDEO_SNAPSHOTS = os.getenv('TABLE_VIDEO_SNAPSHOTS', f'{TABLE_DAILY_TOP_VIDEOS}_snapshots')
+TABLE_VIDEO_METADATA = os.getenv('TABLE_VIDEO_METADATA', f'{TABLE_DAILY_TOP_VIDEOS}_metadata')
+TABLE_VIDEO_VELOCITY = os.getenv('TABLE_VIDEO_VELOCITY', f'{TABLE_DAILY_TOP_VIDEOS}_velocity')
+TABLE_VIDEO_VELOCITY_STAGING = f'{TABLE_VIDEO_VELOCITY}_staging'
+TABLE_SHARD_STATUS = os.getenv('TABLE_SHARD_STATUS', f'{TABLE_CHANNEL_INFO}_shards')
+TABLE_RECORDS = os.getenv('TABLE_RECORDS', f'{TABLE_DAILY_TOP_VIDEOS}_records')
 
 # Define constants
 REGION_CODE = 'PL'
 NUM_OF_TOP_VIDEOS_TO_RECEIVE = 100
 
+# Videos that stopped trending are dropped from the velocity table after this many days
+VELOCITY_RETENTION_DAYS = int(os.getenv('VELOCITY_RETENTION_DAYS', '30'))
+
+# Refresh modes: "full" fetches the snippet of every channel and video, "stats" only the counters
+# of the stored ones, with their snippet refetched every SNIPPET_REFRESH_DAYS days
+FULL_REFRESH = 'full'
+STATS_REFRESH = 'stats'
+REFRESH_MODES = (FULL_REFRESH, STATS_REFRESH)
+REFRESH_MODE = os.getenv('REFRESH_MODE', FULL_REFRESH)
+SNIPPET_REFRESH_DAYS = int(os.getenv('SNIPPET_REFRESH_DAYS', '7'))
+
+# "single" refreshes the channels in this invocation, "coordinator" fans them out to workers
+COORDINATOR = 'coordinator'
+PIPELINE_ROLE = os.getenv('PIPELINE_ROLE', 'single')
+CHANNEL_SHARDS = int(os.getenv('CHANNEL_SHARDS', '8'))
+# Queue backend of the shards: "inprocess", "http" (to WORKER_URL) or "cloud_tasks" (CLOUD_TASKS_QUEUE)
+SHARD_QUEUE = os.getenv('SHARD_QUEUE', 'inprocess')
+WORKER_URL = os.getenv('WORKER_URL')
+CLOUD_TASKS_QUEUE = os.getenv('CLOUD_TASKS_QUEUE')
+TASKS_SERVICE_ACCOUNT = os.getenv('TASKS_SERVICE_ACCOUNT')
+# Shared secret of the workers, a shard task without it or a valid OIDC token is rejected
+WORKER_SECRET = os.getenv('WORKER_SECRET')
+# A shard not reported done within the timeout is dispatched again, at most SHARD_MAX_ATTEMPTS times
+SHARD_TIMEOUT_SECONDS = int(os.getenv('SHARD_TIMEOUT_SECONDS', '600'))
+SHARD_MAX_ATTEMPTS = int(os.getenv('SHARD_MAX_ATTEMPTS', '3'))
+# Delay of the check tasks reading the shard statuses
+SHARD_POLL_SECONDS = int(os.getenv('SHARD_POLL_SECONDS', '60'))
+
+# Maximum number of ids of a channels.list / videos.list call
+MAX_IDS_PER_CALL = 50
+
+# Partial responses, only the fields stored in the tables
+VIDEO_PARTS = "snippet,contentDetails,statistics"
+VIDEO_FIELDS = (
+    "items(id,kind,snippet(channelId,categoryId,title,description,defaultLanguage,defaultAudioLanguage,"
+    "publishedAt,liveBroadcastContent),contentDetails/duration,statistics(viewCount,likeCount,commentCount))"
+)
+VIDEO_STATISTICS_FIELDS = "items(id,snippet(channelId,categoryId),statistics(viewCount,likeCount,commentCount))"
+CHANNEL_FIELDS = (
+    "items(id,kind,snippet(title,description,publishedAt,country,thumbnails/medium/url),"
+    "statistics(viewCount,subscriberCount,videoCount))"
+)
+CHANNEL_STATISTICS_FIELDS = "items(id,statistics(viewCount,subscriberCount,videoCount))"
+
+# Regions whose video categories are kept in the categories table, e.g. "PL,DE,US"
+REGION_CODES = [code.strip() for code in os.getenv('REGION_CODES', REGION_CODE).split(',') if code.strip()]
+
 # Use Application Default Credentials (ADC)
-credentials, project = default()
+credentials, project = get_credentials()
 
-CLIENT_BQ = bigquery.Client(credentials=credentials, project=PROJECT_ID)
-CLIENT_YT = build("youtube", "v3", credentials=credentials)
+CLIENT_BQ = get_bigquery_client(PROJECT_ID)
+CLIENT_YT = get_youtube_client()
 
 
 # Function to fetch categories
-def get_categories(region: str) -> pd.DataFrame:
-    categories_response = CLIENT_YT.videoCategories().list(
+def get_categories(region: str, etag: str = None):
+    """
+    Fetch the video categories assignable in a region.
+
+    Args:
+        region (str): The region code.
+        etag (str): ETag of the stored response. When the categories did not change since,
+            the API answers 304 Not Modified and no categories are returned.
+
+    Returns:
+        pd.DataFrame: The categories shaped like CATEGORIES_NAME_SCHEMA, or None when not modified.
+    """
+    request = CLIENT_YT.videoCategories().list(
         part='snippet',
         regionCode=region
-    ).execute()
+    )
+    if etag:
+        request.headers['If-None-Match'] = etag
+    with span(API_FETCH, api_calls=1, quota_units=YT_LIST_QUOTA_UNITS) as fetch_span:
+        try:
+            categories_response = request.execute()
+        except HttpError as e:
+            if e.resp.status == 304:
+                return None
+            raise
+        fetch_span.add(bytes=len(json.dumps(categories_response)))
 
     categories_lst = []
     for category in categories_response['items']:
-        category_id = category['id']
-        category_name = category['snippet']['title']
-        categories_lst.append((category_id, category_name))
-    return pd.DataFrame(categories_lst, columns=['category_id', 'category_name'])
+        categories_lst.append({
+            "category_id": category['id'],
+            "category_name": category['snippet']['title'],
+            "region_code": region,
+            "etag": categories_response['etag'],
+            "updated_at": pd.Timestamp.now().date(),
+        })
+    return build_frame(categories_lst, CATEGORIES_NAME_SCHEMA)
 
 
-# Function to get top daily videos
-def get_top_daily_videos(num_of_videos: int, region: str) -> pd.DataFrame:
-    request = CLIENT_YT.videos().list(
-        part="snippet,contentDetails,statistics",
-        chart="mostPopular",
-        regionCode=region,
-        maxResults=num_of_videos
+# Function to get the ETags of the stored categories
+def get_category_etags() -> dict:
+    table = CLIENT_BQ.get_table(f"{PROJECT_ID}.{DATASET_NAME}.{TABLE_CATEGORIES_NAME}")
+    if 'etag' not in {field.name for field in table.schema}:
+        # Hand-maintained table of the previous layout, rebuilt on the first refresh
+        return {}
+
+    query = f"""
+        SELECT
+            region_code, ANY_VALUE(etag) AS etag
+        FROM
+            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CATEGORIES_NAME}`
+        GROUP BY
+            region_code
+        ;
+        """
+    with span(BQ_QUERY) as query_span:
+        etags_query = CLIENT_BQ.query(query)
+        etags = {row['region_code']: row['etag'] for row in etags_query}
+        query_span.add(bytes=etags_query.total_bytes_processed, rows=len(etags))
+    return etags
+
+
+# Function to refresh the categories dimension
+def refresh_categories(regions: list, dry_run: bool = False):
+    """
+    Refresh the categories table from `videoCategories.list` for the given regions.
+
+    The stored ETag of every region is sent along, so on most days every request is answered
+    with 304 Not Modified and nothing is written. When any region changed (or a region was
+    added or removed), the table is replaced with the categories of all regions.
+
+    Args:
+        regions (list): The region codes.
+        dry_run (bool): Fetch without ETags and save the categories as a CSV file instead of uploading them.
+
+    Returns:
+        pd.DataFrame: The new categories, or None when the stored ones are up to date.
+    """
+    etags = {} if dry_run else get_category_etags()
+    fetched = {region: get_categories(region, etags.get(region)) for region in regions}
+    if set(etags) == set(regions) and all(df is None for df in fetched.values()):
+        return None
+
+    categories = pd.concat(
+        [df if df is not None else get_categories(region) for region, df in fetched.items()],
+        ignore_index=True,
     )
-    response = request.execute()
-    items = response["items"]
+    if dry_run:
+        categories.to_csv(f"{TABLE_CATEGORIES_NAME}.csv", index=False)
+    else:
+        upload_dataframe(categories, DATASET_NAME, TABLE_CATEGORIES_NAME, "replace", CATEGORIES_NAME_SCHEMA)
+        # Jobs running in the same process pick up the new names
+        load_category_names.cache_clear()
+    return categories
+
+
+# Function to parse the video items
+def parse_videos(items: list, captured_on) -> pd.DataFrame:
     video_data = []
-    for item in items:
-        video_id = item["id"]
-        kind = item["kind"]
-        live_broadcast = item["snippet"]["liveBroadcastContent"]
-        channel_id = item["snippet"]["channelId"]
-        video_category_id = item["snippet"]["categoryId"]
-        video_title = item["snippet"]["title"]
-        video_description = item["snippet"]["description"]
-        default_language = item["snippet"].get("defaultLanguage", "")
-        default_audio_language = item["snippet"].get("defaultAudioLanguage", "")
-        video_published = datetime.fromisoformat(item["snippet"]["publishedAt"][:-1])
-        video_duration = convert_duration_to_seconds(item["contentDetails"]["duration"])
-        video_views = int(item["statistics"]["viewCount"])
-        video_likes = int(item["statistics"].get("likeCount", 0))
-        video_comments = int(item["statistics"].get("commentCount", 0))
-
-        video_data.append({
-            "video_id": video_id,
-            "kind": kind,
-            "live_broadcast": live_broadcast,
-            "channel_id": channel_id,
-            "video_category_id": video_category_id,
-            "video_title": video_title,
-            "video_description": video_description,
-            "default_language": default_language,
-            "default_audio_language": default_audio_language,
-            "video_published": video_published,
-            "video_duration": video_duration,
-            "video_views": video_views,
-            "video_likes": video_likes,
-            "video_comments": video_comments,
-            "video_captured_at": pd.Timestamp.now().date(),
-        })
+    with span(PARSE, rows=len(items)):
+        for item in items:
+            video_id = item["id"]
+            kind = item["kind"]
+            live_broadcast = item["snippet"]["liveBroadcastContent"]
+            channel_id = item["snippet"]["channelId"]
+            video_category_id = item["snippet"]["categoryId"]
+            video_title = item["snippet"]["title"]
+            video_description = item["snippet"]["description"]
+            default_language = item["snippet"].get("defaultLanguage", "")
+            default_audio_language = item["snippet"].get("defaultAudioLanguage", "")
+            video_published = datetime.fromisoformat(item["snippet"]["publishedAt"][:-1])
+            video_duration = convert_duration_to_seconds(item["contentDetails"]["duration"])
+            video_views = int(item["statistics"]["viewCount"])
+            video_likes = int(item["statistics"].get("likeCount", 0))
+            video_comments = int(item["statistics"].get("commentCount", 0))
 
-    return pd.DataFrame(video_data)
+            video_data.append({
+                "video_id": video_id,
+                "kind": kind,
+                "live_broadcast": live_broadcast,
+                "channel_id": channel_id,
+                "video_category_id": video_category_id,
+                "video_title": video_title,
+                "video_description": video_description,
+                "default_language": default_language,
+                "default_audio_language": default_audio_language,
+                "video_published": video_published,
+                "video_duration": video_duration,
+                "video_views": video_views,
+                "video_likes": video_likes,
+                "video_comments": video_comments,
+                "video_captured_at": captured_on,
+            })
 
+        videos_df = build_frame(video_data, DAILY_TOP_VIDEOS_SCHEMA)
+    return videos_df
 
-# Function to get channel info
-def get_channel_info(today_channel_ids: set):
+
+# Function to get top daily videos
+def get_top_daily_videos(num_of_videos: int, region: str, refresh_mode: str = FULL_REFRESH) -> tuple:
+    """
+    Fetch today's top videos.
+
+    In the full mode every video is fetched with its snippet and content details. In the stats mode
+    the chart is fetched with the counters and the channel and category ids only, and the snippet
+    is fetched (by id, in batches) just for the videos not stored yet and the ones due today.
+
+    Args:
+        num_of_videos (int): Number of videos to fetch.
+        region (str): The region code of the chart.
+        refresh_mode (str): FULL_REFRESH or STATS_REFRESH.
+
+    Returns:
+        tuple: The videos fetched with their snippet, shaped like DAILY_TOP_VIDEOS_SCHEMA, and the
+        stats-only videos completed with their latest stored metadata and its content hash.
+    """
+    stats_only = refresh_mode == STATS_REFRESH
+    with span(API_FETCH, api_calls=1, quota_units=YT_LIST_QUOTA_UNITS) as fetch_span:
+        request = CLIENT_YT.videos().list(
+            part="snippet,statistics" if stats_only else VIDEO_PARTS,
+            chart="mostPopular",
+            regionCode=region,
+            maxResults=num_of_videos,
+            fields=VIDEO_STATISTICS_FIELDS if stats_only else VIDEO_FIELDS,
+        )
+        response = request.execute()
+        fetch_span.add(bytes=len(json.dumps(response)))
+    items = response["items"]
+    captured_on = pd.Timestamp.now().date()
+    if not stats_only:
+        return parse_videos(items, captured_on), pd.DataFrame()
+
+    video_ids = [item["id"] for item in items]
+    known = get_latest_metadata(TABLE_VIDEO_METADATA, VIDEO_METADATA_SCHEMA, "video_id", video_ids)
+    snippet_ids = refresh_snippet_ids(video_ids, set(known["video_id"]), captured_on)
+    videos_df = parse_videos(fetch_items(CLIENT_YT.videos(), snippet_ids, VIDEO_PARTS, VIDEO_FIELDS), captured_on)
+
+    stats_data = []
+    with span(PARSE, rows=len(items) - len(snippet_ids)):
+        for item in items:
+            if item["id"] in snippet_ids:
+                continue
+            stats_data.append({
+                "video_id": item["id"],
+                "channel_id": item["snippet"]["channelId"],
+                "video_category_id": item["snippet"]["categoryId"],
+                "video_views": int(item["statistics"]["viewCount"]),
+                "video_likes": int(item["statistics"].get("likeCount", 0)),
+                "video_comments": int(item["statistics"].get("commentCount", 0)),
+                "video_captured_at": captured_on,
+            })
+        stats_fields = [field for field in VIDEO_SNAPSHOTS_SCHEMA if field["name"] != "content_hash"]
+        stats_df = build_frame(stats_data, stats_fields).merge(known, on="video_id")
+    return videos_df, stats_df
+
+
+# Function to pick the ids whose snippet is fetched
+def refresh_snippet_ids(ids, known_ids: set, day) -> set:
+    """
+    Select the ids fetched with their snippet in the stats mode: the ones without stored metadata,
+    and every SNIPPET_REFRESH_DAYS days each known one. The known ids are spread over the days by
+    a hash of the id, so every run refreshes about the same share of them.
+
+    Args:
+        ids: The ids refreshed by the run.
+        known_ids (set): The ids with stored metadata.
+        day (datetime.date): The day of the run.
+
+    Returns:
+        set: The ids to fetch with their snippet.
+    """
+    slot = day.toordinal() % SNIPPET_REFRESH_DAYS
+    return {
+        id for id in ids
+        if id not in known_ids or zlib.crc32(id.encode("utf-8")) % SNIPPET_REFRESH_DAYS == slot
+    }
+
+
+# Function to fetch resources by id, MAX_IDS_PER_CALL ids per call
+def fetch_items(resource, ids, part: str, fields: str) -> list:
+    ids = sorted(ids)
+    items = []
+    with span(API_FETCH) as fetch_span:
+        for start in range(0, len(ids), MAX_IDS_PER_CALL):
+            request = resource.list(part=part, id=",".join(ids[start:start + MAX_IDS_PER_CALL]), fields=fields)
+            response = request.execute()
+            items.extend(response.get("items", []))
+            fetch_span.add(bytes=len(json.dumps(response)), api_calls=1, quota_units=YT_LIST_QUOTA_UNITS)
+    return items
+
+
+# Function to get the latest stored metadata of every id
+def get_latest_metadata(table_name: str, metadata_schema: list, id_column: str, ids: list = None) -> pd.DataFrame:
+    """
+    Retrieve the latest metadata version of the stored ids, without the description columns.
+
+    The latest version is the one with the most recent `valid_from`. An id whose content went back
+    to an older version keeps the newer one until its next snippet refresh stores the older again.
+
+    Args:
+        table_name (str): Name of the metadata table.
+        metadata_schema (list): Schema of the metadata table.
+        id_column (str): The id of the video or the channel.
+        ids (list): The ids to look up, all the stored ids when not provided.
+
+    Returns:
+        pd.DataFrame: One row per stored id, with the content hash.
+    """
+    columns = [field["name"] for field in metadata_schema
+               if field["name"] not in DESCRIPTION_COLUMNS and field["name"] != "valid_from"]
+    if ids is not None and not len(ids):
+        return pd.DataFrame(columns=columns)
+    id_filter = "TRUE" if ids is None else f"{id_column} IN UNNEST(@ids)"
+    job_config = None if ids is None else bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter("ids", "STRING", [str(id) for id in ids])]
+    )
     query = f"""
-        SELECT DISTINCT
-            channel_id
-        FROM 
-            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}`
+        SELECT
+            {', '.join(columns)}
+        FROM
+            `{PROJECT_ID}.{DATASET_NAME}.{table_name}`
+        WHERE
+            {id_filter}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY {id_column} ORDER BY valid_from DESC) = 1
         ;
         """
-    channel_ids_from_bq = CLIENT_BQ.query(query)
-    channel_id_set = set(row['channel_id'] for row in channel_ids_from_bq)
-    channels_id = today_channel_ids.union(channel_id_set)
+    with span(BQ_QUERY) as query_span:
+        metadata_query = CLIENT_BQ.query(query, job_config=job_config)
+        metadata_df = metadata_query.to_dataframe()
+        query_span.add(bytes=metadata_query.total_bytes_processed, rows=len(metadata_df))
+    return metadata_df
+
+
+# Function to get channel info
+def get_channel_info(channels_id: set, known: pd.DataFrame, refresh_mode: str = FULL_REFRESH) -> tuple:
+    """
+    Fetch the given channels, MAX_IDS_PER_CALL per call.
 
+    In the full mode every channel is fetched with its snippet. In the stats mode only the counters
+    are fetched, except for the channels not stored yet and the ones due today (see `refresh_snippet_ids`).
+
+    Args:
+        channels_id (set): The channels to fetch.
+        known (pd.DataFrame): The latest stored metadata of the channels, from `get_latest_metadata`.
+        refresh_mode (str): FULL_REFRESH or STATS_REFRESH.
+
+    Returns:
+        tuple: The channels fetched with their snippet, shaped like CHANNEL_INFO_SCHEMA, and the
+        stats-only channels completed with their latest stored metadata and its content hash.
+    """
+    known_ids = set(known["channel_id"])
+    updated_at = pd.Timestamp.now().date()
+    if refresh_mode == STATS_REFRESH:
+        snippet_ids = refresh_snippet_ids(channels_id, known_ids, updated_at)
+    else:
+        snippet_ids = channels_id
+
+    items = fetch_items(CLIENT_YT.channels(), snippet_ids, "snippet,statistics", CHANNEL_FIELDS)
     channels_data = []
-    for id in channels_id:
-        request = CLIENT_YT.channels().list(part="snippet,statistics", id=id)
-        response = request.execute()
-        channel_info = response["items"][0]
-        channel_name = channel_info['snippet']['title']
-        channel_id = channel_info['id']
-        kind = channel_info['kind']
-        channel_published = parser.isoparse(channel_info['snippet']['publishedAt'])
-        channel_logo_url = channel_info['snippet']['thumbnails']['medium']['url']
-        total_views = int(channel_info['statistics']['viewCount'])
-        channel_market = channel_info['snippet'].get("country", 'None')
-        channel_subs = int(channel_info['statistics']['subscriberCount'])
-        channel_videos = int(channel_info['statistics']['videoCount'])
-        channel_description = channel_info['snippet']['description']
-
-        channels_data.append({
-            "channel_id": channel_id,
-            "channel_name": channel_name,
-            "kind": kind,
-            "channel_published": channel_published,
-            "channel_logo_url": channel_logo_url,
-            "total_views": total_views,
-            "channel_market": channel_market,
-            "channel_subs": channel_subs,
-            "channel_videos": channel_videos,
-            "channel_description": channel_description,
-            "updated_at": pd.Timestamp.now().date()
-        })
-    return pd.DataFrame(channels_data)
+    with span(PARSE, rows=len(items)):
+        for channel_info in items:
+            channel_name = channel_info['snippet']['title']
+            channel_id = channel_info['id']
+            kind = channel_info['kind']
+            channel_published = parser.isoparse(channel_info['snippet']['publishedAt'])
+            channel_logo_url = channel_info['snippet']['thumbnails']['medium']['url']
+            total_views = int(channel_info['statistics']['viewCount'])
+            channel_market = channel_info['snippet'].get("country", 'None')
+            channel_subs = int(channel_info['statistics']['subscriberCount'])
+            channel_videos = int(channel_info['statistics']['videoCount'])
+            channel_description = channel_info['snippet']['description']
+
+            channels_data.append({
+                "channel_id": channel_id,
+                "channel_name": channel_name,
+                "kind": kind,
+                "channel_published": channel_published,
+                "channel_logo_url": channel_logo_url,
+                "total_views": total_views,
+                "channel_market": channel_market,
+                "channel_subs": channel_subs,
+                "channel_videos": channel_videos,
+                "channel_description": channel_description,
+                "updated_at": updated_at
+            })
+        channels_df = build_frame(channels_data, CHANNEL_INFO_SCHEMA)
+
+    items = fetch_items(CLIENT_YT.channels(), channels_id - snippet_ids, "statistics", CHANNEL_STATISTICS_FIELDS)
+    stats_data = []
+    with span(PARSE, rows=len(items)):
+        for channel_info in items:
+            stats_data.append({
+                "channel_id": channel_info['id'],
+                "total_views": int(channel_info['statistics']['viewCount']),
+                "channel_subs": int(channel_info['statistics']['subscriberCount']),
+                "channel_videos": int(channel_info['statistics']['videoCount']),
+                "updated_at": updated_at
+            })
+        stats_fields = [field for field in CHANNEL_SNAPSHOTS_SCHEMA if field["name"] != "content_hash"]
+        stats_df = build_frame(stats_data, stats_fields).merge(known, on="channel_id")
+    return channels_df, stats_df
 
 
 # Function to create BQ table if not exists
@@ -150,47 +486,681 @@ def create_bq_table(dataset_name: str, table_name: str, schema: list, clustering
         CLIENT_BQ.get_table(f"{PROJECT_ID}.{dataset_name}.{table_name}")
     except:
         table = bigquery.Table(f"{PROJECT_ID}.{dataset_name}.{table_name}", schema=schema)
-        table = CLIENT_BQ.create_table(table)
-        table.clustering_fields = clustering
+        table.clustering_fields = clustering or None
+        CLIENT_BQ.create_table(table)
+
+
+# Function to create BQ view if not exists, or to update its query
+def create_bq_view(dataset_name: str, view_name: str, view_query: str, migration_query: str):
+    view_ref = f"{PROJECT_ID}.{dataset_name}.{view_name}"
+    try:
+        table = CLIENT_BQ.get_table(view_ref)
+    except Exception:
+        table = None
+    if table is not None and table.table_type != "VIEW":
+        # Still the original wide table, move its rows to the snapshot tables before taking its name
+        print(f"Migrating {view_ref} to the snapshot tables, the table is kept as {view_name}_wide.")
+        with span(BQ_QUERY) as query_span:
+            migration = CLIENT_BQ.query(migration_query)
+            migration.result()
+            query_span.add(bytes=migration.total_bytes_processed)
+        table = None
+    if table is None:
+        view = bigquery.Table(view_ref)
+        view.view_query = view_query
+        CLIENT_BQ.create_table(view)
+    elif table.view_query != view_query:
+        table.view_query = view_query
+        CLIENT_BQ.update_table(table, ["view_query"])
+
+
+# Function to create the snapshot and metadata tables and the views joining them
+def create_snapshot_tables(dataset_name: str):
+    create_bq_table(dataset_name, TABLE_VIDEO_SNAPSHOTS, VIDEO_SNAPSHOTS_SCHEMA, VIDEO_SNAPSHOTS_CLUSTERING)
+    create_bq_table(dataset_name, TABLE_VIDEO_METADATA, VIDEO_METADATA_SCHEMA, VIDEO_METADATA_CLUSTERING)
+    create_bq_table(dataset_name, TABLE_CHANNEL_SNAPSHOTS, CHANNEL_SNAPSHOTS_SCHEMA, CHANNEL_SNAPSHOTS_CLUSTERING)
+    create_bq_table(dataset_name, TABLE_CHANNEL_METADATA, CHANNEL_METADATA_SCHEMA, CHANNEL_METADATA_CLUSTERING)
+
+    views = [
+        (TABLE_DAILY_TOP_VIDEOS, DAILY_TOP_VIDEOS_SCHEMA, VIDEO_SNAPSHOTS_SCHEMA, VIDEO_METADATA_SCHEMA,
+         TABLE_VIDEO_SNAPSHOTS, TABLE_VIDEO_METADATA, "video_id", "video_captured_at"),
+        (TABLE_CHANNEL_INFO, CHANNEL_INFO_SCHEMA, CHANNEL_SNAPSHOTS_SCHEMA, CHANNEL_METADATA_SCHEMA,
+         TABLE_CHANNEL_SNAPSHOTS, TABLE_CHANNEL_METADATA, "channel_id", "updated_at"),
+    ]
+    for view_name, wide_schema, snapshot_schema, metadata_schema, snapshots, metadata, id_column, date_column in views:
+        view_ref = f"{PROJECT_ID}.{dataset_name}.{view_name}"
+        snapshots_ref = f"{PROJECT_ID}.{dataset_name}.{snapshots}"
+        metadata_ref = f"{PROJECT_ID}.{dataset_name}.{metadata}"
+        create_bq_view(
+            dataset_name,
+            view_name,
+            wide_view_query(wide_schema, snapshot_schema, snapshots_ref, metadata_ref, id_column),
+            migration_query(snapshot_schema, metadata_schema, view_ref, snapshots_ref, metadata_ref,
+                            id_column, date_column),
+        )
 
 
 # Function to upload DataFrame to BQ
-def upload_dataframe(df: pd.DataFrame, dataset_name: str, table_name: str, operation_type: str) -> None:
-    pandas_gbq.to_gbq(
-        df,
-        f'{dataset_name}.{table_name}',
-        project_id=PROJECT_ID,
-        if_exists=operation_type,
-        credentials=credentials,
+def upload_dataframe(df: pd.DataFrame, dataset_name: str, table_name: str, operation_type: str,
+                     schema: list = None) -> None:
+    with span(BQ_UPLOAD, rows=len(df), bytes=df.memory_usage(deep=True).sum()):
+        pandas_gbq.to_gbq(
+            df,
+            f'{dataset_name}.{table_name}',
+            project_id=PROJECT_ID,
+            if_exists=operation_type,
+            table_schema=schema,
+            credentials=credentials,
+        )
+
+
+# Function to get the stored versions of the metadata
+def get_known_hashes(table_name: str, id_column: str) -> set:
+    query = f"""
+        SELECT
+            {id_column}, content_hash
+        FROM
+            `{PROJECT_ID}.{DATASET_NAME}.{table_name}`
+        ;
+        """
+    with span(BQ_QUERY) as query_span:
+        hashes_query = CLIENT_BQ.query(query)
+        known_hashes = set((row[id_column], row['content_hash']) for row in hashes_query)
+        query_span.add(bytes=hashes_query.total_bytes_processed, rows=len(known_hashes))
+    return known_hashes
+
+
+# Function to upload a wide DataFrame as snapshot and metadata rows
+def upload_snapshot(df: pd.DataFrame, snapshot_table: str, metadata_table: str, snapshot_schema: list,
+                    metadata_schema: list, id_column: str, date_column: str, stats_df: pd.DataFrame = None) -> None:
+    """
+    Append the metrics of the rows to the snapshot table and their metadata to the metadata table,
+    when the same content of the same id is not stored yet.
+
+    Args:
+        df (pd.DataFrame): Rows shaped like the wide table.
+        snapshot_table (str): Name of the snapshot table.
+        metadata_table (str): Name of the metadata table.
+        snapshot_schema (list): Schema of the snapshot table.
+        metadata_schema (list): Schema of the metadata table.
+        id_column (str): The id of the video or the channel.
+        date_column (str): The capture date of the rows.
+        stats_df (pd.DataFrame): Stats-only rows with the content hash of their stored metadata,
+            appended to the snapshot table as they are.
+    """
+    known_hashes = get_known_hashes(metadata_table, id_column)
+    snapshots, new_metadata = split_snapshot(
+        df, snapshot_schema, metadata_schema, id_column, date_column, known_hashes
     )
+    if stats_df is not None and len(stats_df):
+        snapshot_columns = [field['name'] for field in snapshot_schema]
+        snapshots = pd.concat([snapshots, stats_df[snapshot_columns]], ignore_index=True)
+    # The metadata goes first, so the views never see a snapshot without its metadata
+    if len(new_metadata):
+        upload_dataframe(new_metadata, DATASET_NAME, metadata_table, "append", metadata_schema)
+    upload_dataframe(snapshots, DATASET_NAME, snapshot_table, "append", snapshot_schema)
+
+
+# Function to merge today's videos into the velocity table
+def update_video_velocity(top_daily_videos: pd.DataFrame, captured_at: pd.Timestamp) -> None:
+    """
+    Update the per-video state of the velocity table with the videos captured by this run.
+
+    Only today's rows are uploaded (to a staging table) and merged, so the cost of an update
+    depends on the number of trending videos, not on the length of the history. For every video
+    the state keeps the first capture, the last views, the number of days it trended and its
+    velocity in views per hour: between the last two captures, or since the publication for a
+    video seen for the first time. Videos not trending for VELOCITY_RETENTION_DAYS days are removed.
+
+    Args:
+        top_daily_videos (pd.DataFrame): The videos captured by this run.
+        captured_at (pd.Timestamp): The time of the capture (UTC).
+    """
+    staging_columns = [field['name'] for field in VIDEO_VELOCITY_STAGING_SCHEMA]
+    staging = top_daily_videos.assign(captured_at=captured_at)[staging_columns]
+    upload_dataframe(staging, DATASET_NAME, TABLE_VIDEO_VELOCITY_STAGING, "replace", VIDEO_VELOCITY_STAGING_SCHEMA)
+
+    query = f"""
+        MERGE
+            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_VIDEO_VELOCITY}` AS s
+        USING
+            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_VIDEO_VELOCITY_STAGING}` AS t
+        ON
+            s.video_id = t.video_id
+        WHEN MATCHED AND t.captured_at > s.last_captured_at THEN UPDATE SET
+            video_title = t.video_title,
+            views_per_hour = SAFE_DIVIDE(
+                t.video_views - s.last_views,
+                TIMESTAMP_DIFF(t.captured_at, s.last_captured_at, SECOND) / 3600
+            ),
+            days_trending = s.days_trending + IF(DATE(t.captured_at) > DATE(s.last_captured_at), 1, 0),
+            last_views = t.video_views,
+            last_captured_at = t.captured_at
+        WHEN NOT MATCHED BY TARGET THEN INSERT (
+            video_id, channel_id, video_title, first_seen_at, first_views,
+            last_captured_at, last_views, days_trending, views_per_hour
+        ) VALUES (
+            t.video_id, t.channel_id, t.video_title, t.captured_at, t.video_views,
+            t.captured_at, t.video_views, 1,
+            SAFE_DIVIDE(t.video_views, TIMESTAMP_DIFF(t.captured_at, t.video_published, SECOND) / 3600)
+        )
+        WHEN NOT MATCHED BY SOURCE
+            AND s.last_captured_at < TIMESTAMP_SUB(@captured_at, INTERVAL @retention_days DAY)
+        THEN DELETE
+        ;
+        """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("captured_at", "TIMESTAMP", captured_at.to_pydatetime()),
+        bigquery.ScalarQueryParameter("retention_days", "INT64", VELOCITY_RETENTION_DAYS),
+    ])
+    with span(BQ_QUERY, rows=len(staging)) as query_span:
+        merge_job = CLIENT_BQ.query(query, job_config=job_config)
+        merge_job.result()
+        query_span.add(bytes=merge_job.total_bytes_processed)
+
+
+# Function to get the counters of the channels captured on a day
+def get_channel_counters_on(day) -> pd.DataFrame:
+    query = f"""
+        SELECT
+            channel_id, MAX(total_views) AS total_views, MAX(channel_subs) AS channel_subs
+        FROM
+            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_SNAPSHOTS}`
+        WHERE
+            updated_at = DATE('{day.strftime('%Y-%m-%d')}')
+        GROUP BY
+            channel_id
+        ;
+        """
+    with span(BQ_QUERY) as query_span:
+        counters_query = CLIENT_BQ.query(query)
+        counters_df = counters_query.to_dataframe()
+        query_span.add(bytes=counters_query.total_bytes_processed, rows=len(counters_df))
+    return counters_df
+
 
+# Function to merge today's videos and channels into the records index
+def update_records(all_videos: pd.DataFrame, channel_info: pd.DataFrame, dry_run: bool = False) -> pd.DataFrame:
+    """
+    Update the all-time records index with the videos and channels captured by this run.
+
+    The index is read whole (it holds at most RECORDS_TOP_K entries per metric and scope), merged
+    with the entries of this run and written back, so the update costs the rows of the run and
+    the size of the index, not the history. The weekly gains of the channels only need the
+    snapshots of the day WEEKLY_GAIN_DAYS days ago, a single clustered day of the snapshot table.
+
+    Args:
+        all_videos (pd.DataFrame): The videos captured by this run.
+        channel_info (pd.DataFrame): The channels captured by this run.
+        dry_run (bool): Save the new index as a CSV file instead of uploading it.
+
+    Returns:
+        pd.DataFrame: The new index.
+    """
+    today = pd.Timestamp.now().date()
+    week_ago = get_channel_counters_on(today - pd.Timedelta(days=WEEKLY_GAIN_DAYS))
+    with span(PARSE, rows=len(all_videos) + len(channel_info)):
+        candidates = record_candidates(all_videos, channel_info, week_ago, REGION_CODE, today)
+        records = update_leaderboards(get_records(PROJECT_ID, DATASET_NAME, TABLE_RECORDS), candidates,
+                                      RECORDS_TOP_K, today)
+    if dry_run:
+        records.to_csv(f"{TABLE_RECORDS}.csv", index=False)
+    else:
+        upload_dataframe(records, DATASET_NAME, TABLE_RECORDS, "replace", RECORDS_SCHEMA)
+    return records
+
+
+# Function to join the rows fetched with their snippet and the stats-only rows
+def with_stats_rows(df: pd.DataFrame, stats_df: pd.DataFrame) -> pd.DataFrame:
+    df = without_descriptions(df)
+    if not len(stats_df):
+        return df
+    return pd.concat([df, stats_df[list(df.columns)]], ignore_index=True)
+
+
+# Function to create the tables of the ingestion
+def create_pipeline_tables(dataset_name: str):
+    create_snapshot_tables(dataset_name)
+    create_bq_table(dataset_name, TABLE_VIDEO_VELOCITY, VIDEO_VELOCITY_SCHEMA, VIDEO_VELOCITY_CLUSTERING)
+    create_bq_table(dataset_name, TABLE_CATEGORIES_NAME, CATEGORIES_NAME_SCHEMA, [])
+    create_bq_table(dataset_name, TABLE_SHARD_STATUS, SHARD_STATUS_SCHEMA, SHARD_STATUS_CLUSTERING)
+    create_bq_table(dataset_name, TABLE_RECORDS, RECORDS_SCHEMA, [])
+
+
+# Function to ingest today's top videos
+def ingest_videos(refresh_mode: str, dry_run: bool = False) -> pd.DataFrame:
+    captured_at = pd.Timestamp.now(tz='UTC')
+    top_daily_videos, video_stats = get_top_daily_videos(NUM_OF_TOP_VIDEOS_TO_RECEIVE, REGION_CODE, refresh_mode)
+    all_videos = with_stats_rows(top_daily_videos, video_stats)
+    if dry_run:
+        top_daily_videos.to_csv(f"{TABLE_DAILY_TOP_VIDEOS}.csv", index=False)
+        if len(video_stats):
+            video_stats.to_csv(f"{TABLE_VIDEO_SNAPSHOTS}.csv", index=False)
+    else:
+        upload_snapshot(top_daily_videos, TABLE_VIDEO_SNAPSHOTS, TABLE_VIDEO_METADATA, VIDEO_SNAPSHOTS_SCHEMA,
+                        VIDEO_METADATA_SCHEMA, "video_id", "video_captured_at", video_stats)
+        update_video_velocity(all_videos, captured_at)
+    return all_videos
+
+
+# Function to ingest the given channels
+def ingest_channels(channels_id: set, known: pd.DataFrame, refresh_mode: str, dry_run: bool = False) -> pd.DataFrame:
+    channel_info, channel_stats = get_channel_info(channels_id, known, refresh_mode)
+    if dry_run:
+        channel_info.to_csv(f"{TABLE_CHANNEL_INFO}.csv", index=False)
+        if len(channel_stats):
+            channel_stats.to_csv(f"{TABLE_CHANNEL_SNAPSHOTS}.csv", index=False)
+    else:
+        upload_snapshot(channel_info, TABLE_CHANNEL_SNAPSHOTS, TABLE_CHANNEL_METADATA, CHANNEL_SNAPSHOTS_SCHEMA,
+                        CHANNEL_METADATA_SCHEMA, "channel_id", "updated_at", channel_stats)
+    return with_stats_rows(channel_info, channel_stats)
+
+
+# Function to run the steps before the channel refresh
+def start_ingestion(refresh_mode: str, dry_run: bool = False) -> tuple:
+    """
+    Create the tables, refresh the categories and ingest today's top videos.
+
+    Args:
+        refresh_mode (str): FULL_REFRESH or STATS_REFRESH.
+        dry_run (bool): Save the DataFrames as CSV files instead of uploading them.
+
+    Returns:
+        tuple: Today's videos without the description columns, the channels to refresh (today's
+        channels and the stored ones) and the latest stored metadata of the channels.
+    """
+    if refresh_mode not in REFRESH_MODES:
+        raise ValueError(f"Unknown refresh mode {refresh_mode!r}, expected {FULL_REFRESH!r} or {STATS_REFRESH!r}")
+
+    if not dry_run:
+        # Create or ensure the BigQuery tables and views exist
+        create_pipeline_tables(DATASET_NAME)
+
+    refresh_categories(REGION_CODES, dry_run)
+    all_videos = ingest_videos(refresh_mode, dry_run)
+
+    known = get_latest_metadata(TABLE_CHANNEL_METADATA, CHANNEL_METADATA_SCHEMA, "channel_id")
+    channels_id = set(all_videos.channel_id).union(known["channel_id"])
+    return all_videos, channels_id, known
+
+
+# Function to run the ingestion
+def run_pipeline(dry_run: bool = False, refresh_mode: str = REFRESH_MODE) -> dict:
+    """
+    Refresh the categories, fetch today's top videos and the channel info and append them to BigQuery,
+    then merge the videos into the velocity table and both into the records index.
+
+    The rows are stored as daily snapshots of the metrics plus the metadata versions not stored yet,
+    the TABLE_DAILY_TOP_VIDEOS and TABLE_CHANNEL_INFO views join both back into the wide shape.
+    In the stats mode the stored channels and videos are refreshed with their counters only,
+    which is cheap enough to sample them several times a day.
+
+    Args:
+        dry_run (bool): Save the DataFrames as CSV files in the working directory instead of uploading them.
+        refresh_mode (str): FULL_REFRESH or STATS_REFRESH, defaults to the REFRESH_MODE environment variable.
+
+    Returns:
+        dict: The fetched DataFrames, without the description columns, under the keys 'top_daily_videos'
+        and 'channel_info', so that downstream jobs running in the same process can reuse them.
+    """
+    all_videos, channels_id, known = start_ingestion(refresh_mode, dry_run)
+    channel_info = ingest_channels(channels_id, known, refresh_mode, dry_run)
+    update_records(all_videos, channel_info, dry_run)
+
+    # The descriptions are only needed for the upload
+    return {
+        "top_daily_videos": all_videos,
+        "channel_info": channel_info,
+    }
+
+
+# Function to append status changes of shards
+def record_shard_status(run_id: str, statuses: list) -> None:
+    updated_at = pd.Timestamp.now(tz='UTC')
+    rows = [dict(status, run_id=run_id, updated_at=updated_at) for status in statuses]
+    upload_dataframe(build_frame(rows, SHARD_STATUS_SCHEMA), DATASET_NAME, TABLE_SHARD_STATUS, "append",
+                     SHARD_STATUS_SCHEMA)
+
+
+# Function to get the latest status of every shard attempt
+def get_shard_statuses(run_id: str) -> dict:
+    query = f"""
+        SELECT
+            shard, attempt, status, error,
+            MIN(IF(status = '{DISPATCHED}', updated_at, NULL)) OVER (PARTITION BY shard, attempt) AS dispatched_at
+        FROM
+            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_SHARD_STATUS}`
+        WHERE
+            run_id = @run_id
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY shard, attempt ORDER BY updated_at DESC, IF(status = '{DISPATCHED}', 1, 0)
+        ) = 1
+        ;
+        """
+    job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter("run_id", "STRING", run_id)])
+    with span(BQ_QUERY) as query_span:
+        status_query = CLIENT_BQ.query(query, job_config=job_config)
+        statuses = {
+            (row['shard'], row['attempt']): (row['status'], row['error'], row['dispatched_at'])
+            for row in status_query
+        }
+        query_span.add(bytes=status_query.total_bytes_processed, rows=len(statuses))
+    return statuses
+
+
+# Function to get the channel ids of shards from their first dispatch
+def get_shard_channel_ids(run_id: str, shards: list) -> dict:
+    query = f"""
+        SELECT
+            shard, channel_ids
+        FROM
+            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_SHARD_STATUS}`
+        WHERE
+            run_id = @run_id
+            AND attempt = 1
+            AND status = '{DISPATCHED}'
+            AND shard IN UNNEST(@shards)
+        ;
+        """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("run_id", "STRING", run_id),
+        bigquery.ArrayQueryParameter("shards", "INT64", list(shards)),
+    ])
+    with span(BQ_QUERY) as query_span:
+        ids_query = CLIENT_BQ.query(query, job_config=job_config)
+        channel_ids = {row['shard']: row['channel_ids'].split(',') for row in ids_query}
+        query_span.add(bytes=ids_query.total_bytes_processed, rows=len(channel_ids))
+    return channel_ids
+
+# Function to check that a shard task comes from the coordinator
+def is_authorized_task(request) -> bool:
+    """
+    Check that a shard task request carries the shared secret or the OIDC token of the tasks.
+
+    A task is accepted when WORKER_SECRET is set and the request has it in WORKER_SECRET_HEADER, or
+    when TASKS_SERVICE_ACCOUNT is set and the request has an OIDC token of that service account
+    issued for WORKER_URL, as sent by Cloud Tasks. Without either, every task is rejected.
+
+    Args:
+        request (flask.Request): The request of the task.
+
+    Returns:
+        bool: True when the task may run.
+    """
+    secret = request.headers.get(WORKER_SECRET_HEADER)
+    if WORKER_SECRET and secret:
+        return hmac.compare_digest(secret.encode('utf-8'), WORKER_SECRET.encode('utf-8'))
+
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if not (TASKS_SERVICE_ACCOUNT and WORKER_URL and scheme.lower() == 'bearer' and token):
+        return False
+    try:
+        claims = id_token.verify_oauth2_token(token, google_requests.Request(), audience=WORKER_URL)
+    except ValueError:
+        return False
+    return claims.get('email') == TASKS_SERVICE_ACCOUNT and claims.get('email_verified', False)
+
+
+# Function to refresh the channels of a shard, called by the workers
+def run_worker(task: dict) -> int:
+    """
+    Refresh the channels of a shard task and record the outcome in the shard status table.
+
+    Args:
+        task (dict): The task dispatched by `dispatch_shards`, with the 'run_id', 'shard', 'attempt',
+            'refresh_mode' and 'channel_ids'.
+
+    Returns:
+        int: The number of refreshed channels.
+    """
+    channels_id = set(task['channel_ids'])
+    status = {"shard": task['shard'], "attempt": task['attempt'], "channels": len(channels_id), "channel_ids": None}
+    try:
+        if task['refresh_mode'] not in REFRESH_MODES:
+            raise ValueError(
+                f"Unknown refresh mode {task['refresh_mode']!r}, expected {FULL_REFRESH!r} or {STATS_REFRESH!r}"
+            )
+        known = get_latest_metadata(TABLE_CHANNEL_METADATA, CHANNEL_METADATA_SCHEMA, "channel_id",
+                                    sorted(channels_id))
+        ingest_channels(channels_id, known, task['refresh_mode'])
+    except Exception as e:
+        record_shard_status(task['run_id'], [dict(status, status=FAILED, error=f"{type(e).__name__}: {e}")])
+        raise
+    record_shard_status(task['run_id'], [dict(status, status=DONE, error=None)])
+    return len(channels_id)
+
+
+# Function to send shard attempts to the workers
+def dispatch_shards(run_id: str, attempts: dict, refresh_mode: str, queue) -> None:
+    """
+    Record the attempts as dispatched, then send them to the workers.
+
+    Args:
+        run_id (str): The id of the coordinator run.
+        attempts (dict): Shard number -> (attempt number, channel ids).
+        refresh_mode (str): FULL_REFRESH or STATS_REFRESH.
+        queue: The queue backend, see `yt_config/shards.py`.
+    """
+    record_shard_status(run_id, [
+        {"shard": shard, "attempt": attempt, "status": DISPATCHED, "channels": len(ids),
+         "channel_ids": ",".join(ids) if attempt == 1 else None, "error": None}
+        for shard, (attempt, ids) in attempts.items()
+    ])
+    for shard, (attempt, ids) in attempts.items():
+        queue.dispatch({
+            "run_id": run_id,
+            "shard": shard,
+            "attempt": attempt,
+            "refresh_mode": refresh_mode,
+            "channel_ids": ids,
+        })
+
+
+# Function to find the shards still to refresh and the ones to dispatch again
+def pending_shards(run_id: str, statuses: dict, now: pd.Timestamp) -> tuple:
+    """
+    Find the shards not done yet and, among them, the ones whose last attempt failed or did not
+    report back within SHARD_TIMEOUT_SECONDS.
+
+    A shard is done when any of its attempts is done, so a slow attempt finishing after its shard
+    was re-dispatched is not waited for again.
+
+    Args:
+        run_id (str): The id of the coordinator run.
+        statuses (dict): The result of `get_shard_statuses`.
+        now (pd.Timestamp): The current time, in UTC.
+
+    Returns:
+        tuple: The sorted numbers of the pending shards, and the shard number -> next attempt number
+        of the shards to dispatch again.
+
+    Raises:
+        RuntimeError: When a shard to dispatch again already had SHARD_MAX_ATTEMPTS attempts.
+    """
+    last_attempts = {}
+    for shard, attempt in statuses:
+        last_attempts[shard] = max(last_attempts.get(shard, 0), attempt)
+    done = {shard for (shard, _), (status, _, _) in statuses.items() if status == DONE}
+
+    pending = sorted(set(last_attempts) - done)
+    retry = {}
+    for shard in pending:
+        attempt = last_attempts[shard]
+        status, error, dispatched_at = statuses[(shard, attempt)]
+        timed_out = now - pd.Timestamp(dispatched_at) > pd.Timedelta(seconds=SHARD_TIMEOUT_SECONDS)
+        if status == FAILED or timed_out:
+            if attempt >= SHARD_MAX_ATTEMPTS:
+                raise RuntimeError(
+                    f"Shard {shard} of run {run_id} not refreshed after {attempt} attempts: {error or 'timed out'}"
+                )
+            retry[shard] = attempt + 1
+    return pending, retry
+
+
+# Function to check the shards of a coordinator run, called by the check tasks
+def run_check(task: dict, queue=None) -> int:
+    """
+    Check the shards of a coordinator run once: dispatch again the failed or lost ones and schedule the
+    next check in SHARD_POLL_SECONDS, or merge the run into the records index when all of them are done.
+
+    Args:
+        task (dict): The check task scheduled by `run_coordinator`, with the 'run_id', 'day' and
+            'refresh_mode' of the run.
+        queue: The queue backend of the shards, defaults to the one configured by SHARD_QUEUE.
+
+    Returns:
+        int: The number of shards still pending, 0 once the run is finished.
+    """
+    if task['refresh_mode'] not in REFRESH_MODES:
+        raise ValueError(f"Unknown refresh mode {task['refresh_mode']!r}, expected {FULL_REFRESH!r} or {STATS_REFRESH!r}")
+    run_id = task['run_id']
+    pending, retry = pending_shards(run_id, get_shard_statuses(run_id), pd.Timestamp.now(tz='UTC'))
+    if not pending:
+        finish_coordinator(datetime.strptime(task['day'], '%Y-%m-%d').date())
+        return 0
+
+    queue = queue or make_queue()
+    if retry:
+        channel_ids = get_shard_channel_ids(run_id, sorted(retry))
+        dispatch_shards(run_id, {shard: (attempt, channel_ids[shard]) for shard, attempt in retry.items()},
+                        task['refresh_mode'], queue)
+    queue.schedule(task, SHARD_POLL_SECONDS)
+    return len(pending)
+
+
+# Function to get the videos stored by the coordinator
+def get_ingested_videos(day) -> pd.DataFrame:
+    columns = [field['name'] for field in DAILY_TOP_VIDEOS_SCHEMA if field['name'] not in DESCRIPTION_COLUMNS]
+    query = f"""
+        SELECT
+            {', '.join(columns)}
+        FROM
+            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_DAILY_TOP_VIDEOS}`
+        WHERE
+            DATE(video_captured_at) = DATE('{day.strftime('%Y-%m-%d')}')
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY video_id ORDER BY video_views DESC) = 1
+        ;
+        """
+    with span(BQ_QUERY) as query_span:
+        videos_query = CLIENT_BQ.query(query)
+        videos_df = videos_query.to_dataframe()
+        query_span.add(bytes=videos_query.total_bytes_processed, rows=len(videos_df))
+    return videos_df
+
+# Function to get the channels stored by the workers
+def get_ingested_channels(day) -> pd.DataFrame:
+    columns = [field['name'] for field in CHANNEL_INFO_SCHEMA if field['name'] not in DESCRIPTION_COLUMNS]
+    query = f"""
+        SELECT
+            {', '.join(columns)}
+        FROM
+            `{PROJECT_ID}.{DATASET_NAME}.{TABLE_CHANNEL_INFO}`
+        WHERE
+            updated_at = DATE('{day.strftime('%Y-%m-%d')}')
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY channel_id ORDER BY total_views DESC) = 1
+        ;
+        """
+    with span(BQ_QUERY) as query_span:
+        channels_query = CLIENT_BQ.query(query)
+        channels_df = channels_query.to_dataframe()
+        query_span.add(bytes=channels_query.total_bytes_processed, rows=len(channels_df))
+    return channels_df
+
+
+# Function to merge a finished coordinator run into the records index
+def finish_coordinator(day) -> None:
+    # Once for all shards, the index is rewritten as a whole
+    update_records(get_ingested_videos(day), get_ingested_channels(day))
+
+
+# Function to create the queue backend of the shards
+def make_queue():
+    if SHARD_QUEUE == "inprocess":
+        return InProcessQueue(run_task)
+    if SHARD_QUEUE == "http":
+        return HttpQueue(WORKER_URL, secret=WORKER_SECRET)
+    if SHARD_QUEUE == "cloud_tasks":
+        return CloudTasksQueue(CLOUD_TASKS_QUEUE, WORKER_URL, TASKS_SERVICE_ACCOUNT, secret=WORKER_SECRET)
+    raise ValueError(f"Unknown shard queue {SHARD_QUEUE!r}, expected 'inprocess', 'http' or 'cloud_tasks'")
+
+
+# Function to run a shard task or a check task
+def run_task(task: dict) -> str:
+    if 'shard' in task:
+        channels = run_worker(task)
+        return f"Shard {task['shard']} refreshed {channels} channels"
+    pending = run_check(task)
+    return f"Run {task['run_id']} has {pending} pending shards" if pending else f"Run {task['run_id']} finished"
+
+
+# Function to run the ingestion with the channel refresh fanned out to workers
+def run_coordinator(refresh_mode: str = REFRESH_MODE, queue=None) -> str:
+    """
+    Run the ingestion like `run_pipeline`, except that the channels are split into CHANNEL_SHARDS shards
+    by a hash of their id and every shard is refreshed by a worker invocation (see `run_worker`).
+
+    The coordinator does not wait for the workers: it schedules a check task (see `run_check`), which
+    re-dispatches the failed or lost shards and merges the run into the records index once all of them
+    are done. So neither the refresh nor its retries are bound by the timeout of a single instance.
+    A shard whose earlier attempt had already uploaded its rows stores the day twice, which the readers
+    tolerate as they take the daily maximum, and the views keep one metadata row per content.
+
+    Args:
+        refresh_mode (str): FULL_REFRESH or STATS_REFRESH, defaults to the REFRESH_MODE environment variable.
+        queue: The queue backend of the shards, defaults to the one configured by SHARD_QUEUE.
+
+    Returns:
+        str: The id of the run.
+    """
+    all_videos, channels_id, _ = start_ingestion(refresh_mode)
+    now = pd.Timestamp.now(tz='UTC')
+    run_id = f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    queue = queue or make_queue()
+    shards = split_shards(channels_id, CHANNEL_SHARDS)
+    dispatch_shards(run_id, {shard: (1, ids) for shard, ids in shards.items()}, refresh_mode, queue)
+    queue.schedule({"check": True, "run_id": run_id, "day": f"{pd.Timestamp.now():%Y-%m-%d}", "refresh_mode": refresh_mode},
+                   SHARD_POLL_SECONDS)
+    return run_id
 
 # Cloud Function entry point for HTTP requests
 @functions_framework.http
+@instrumented("youtube_data_pipeline")
 def youtube_data_pipeline(request):
     """
     HTTP Cloud Function for executing the YouTube data pipeline.
 
+    A POST with a shard task or a check task as JSON body refreshes the channels of the shard (worker) or
+    checks the shards of a coordinator run, once authorized by `is_authorized_task`. Otherwise the whole
+    ingestion runs in this invocation, or with PIPELINE_ROLE=coordinator (or `?role=coordinator`) the
+    channel refresh is fanned out to workers.
+
     Args:
-        request (flask.Request): The request object.
+        request (flask.Request): The request object. Pass `?timing=1` to get the per-stage breakdown
+            and `?mode=full` or `?mode=stats` to override REFRESH_MODE.
 
     Returns:
         Response with execution time.
     """
-    start_time = time.time()
-
     try:
-        # Create or ensure the BigQuery tables exist
-        create_bq_table(DATASET_NAME, TABLE_DAILY_TOP_VIDEOS, DAILY_TOP_VIDEOS_SCHEMA, DAILY_TOP_VIDEOS_CLUSTERING)
-        top_daily_videos = get_top_daily_videos(NUM_OF_TOP_VIDEOS_TO_RECEIVE, REGION_CODE)
-        upload_dataframe(top_daily_videos, DATASET_NAME, TABLE_DAILY_TOP_VIDEOS, "append")
+        task = request.get_json(silent=True)
+        if task and ('shard' in task or 'check' in task):
+            if not is_authorized_task(request):
+                return "Task rejected: missing or invalid credentials.", 403
+            outcome = run_task(task)
+            elapsed_time = current_run().elapsed_so_far()
+            return f"{outcome} in {elapsed_time:.2f} seconds.", 200
 
-        create_bq_table(DATASET_NAME, TABLE_CHANNEL_INFO, CHANNEL_INFO_SCHEMA, CHANNEL_INFO_CLUSTERING)
-        channel_info = get_channel_info(set(top_daily_videos.channel_id))
-        upload_dataframe(channel_info, DATASET_NAME, TABLE_CHANNEL_INFO, "append")
+        refresh_mode = request.args.get('mode') or REFRESH_MODE
+        if refresh_mode not in REFRESH_MODES:
+            return f"Unknown refresh mode {refresh_mode!r}, expected {FULL_REFRESH!r} or {STATS_REFRESH!r}.", 400
+        if (request.args.get('role') or PIPELINE_ROLE) == COORDINATOR:
+            run_id = run_coordinator(refresh_mode)
+            elapsed_time = current_run().elapsed_so_far()
+            return f"Run {run_id} dispatched its shards in {elapsed_time:.2f} seconds.", 200
+        else:
+            run_pipeline(refresh_mode=refresh_mode)
 
-        end_time = time.time()
-        elapsed_time = end_time - start_time
+        elapsed_time = current_run().elapsed_so_far()
         return f"Data pipeline executed successfully in {elapsed_time:.2f} seconds.", 200
     except Exception as e:
         return f"Error during execution: {str(e)}", 500
@@ -0,0 +1,95 @@
+"""
+This file builds compact, typed DataFrames from the schema definitions in `schemas.py`.
+
+The dtypes are derived from the BigQuery type of each field:
+- STRING columns are Arrow-backed strings, or categoricals for the columns with a
+  handful of distinct values (kinds, languages, markets, regions and category ids),
+  so a repeated value is stored once per frame instead of once per row.
+- INTEGER columns are int64, or int32 for the columns whose values fit into 32 bits.
+- FLOAT columns are float64.
+- TIMESTAMP columns are datetime64 in UTC and DATE columns are datetime64 at midnight.
+
+The long description columns are only needed for the upload, they can be left out of
+the frames handed to the jobs that never read them.
+"""
+import pandas as pd
+
+STRING_DTYPE = "string[pyarrow]"
+
+# STRING columns with few distinct values
+CATEGORICAL_COLUMNS = {
+    "kind",
+    "live_broadcast",
+    "default_language",
+    "default_audio_language",
+    "channel_market",
+    "video_category_id",
+    "category_id",
+    "region_code",
+}
+
+# INTEGER columns whose values fit into 32 bits
+INT32_COLUMNS = {"video_duration", "channel_videos"}
+
+# Free-text columns only needed for the upload
+DESCRIPTION_COLUMNS = ("video_description", "channel_description")
+
+
+def column_dtype(field: dict):
+    """
+    Return the pandas dtype of a schema field.
+
+    Args:
+        field (dict): A field of a schema from `schemas.py`.
+
+    Returns:
+        The dtype, usable with `pandas.Series.astype`.
+    """
+    name, bq_type = field["name"], field["type"]
+    required = field.get("mode") == "REQUIRED"
+    if bq_type == "STRING":
+        return "category" if name in CATEGORICAL_COLUMNS else STRING_DTYPE
+    if bq_type == "INTEGER":
+        if name in INT32_COLUMNS:
+            return "int32" if required else "Int32"
+        return "int64" if required else "Int64"
+    if bq_type == "FLOAT":
+        return "float64"
+    if bq_type == "TIMESTAMP":
+        return "datetime64[ns, UTC]"
+    if bq_type == "DATE":
+        return "datetime64[ns]"
+    raise ValueError(f"Unsupported type {bq_type} of the field {name}")
+
+
+def _build_column(values: list, field: dict) -> pd.Series:
+    if field["type"] == "TIMESTAMP":
+        return pd.Series(pd.to_datetime(values, utc=True))
+    if field["type"] == "DATE":
+        return pd.Series(pd.to_datetime(values)).dt.normalize()
+    return pd.Series(values, dtype=column_dtype(field))
+
+
+def build_frame(rows: list, schema: list, exclude: tuple = ()) -> pd.DataFrame:
+    """
+    Build a typed DataFrame from rows shaped like a schema.
+
+    Args:
+        rows (list): Dictionaries with a value for every field of the schema.
+        schema (list): The schema from `schemas.py`.
+        exclude (tuple): Names of the fields to leave out, e.g. DESCRIPTION_COLUMNS.
+
+    Returns:
+        pd.DataFrame: The columns of the schema, in its order, with the dtypes of `column_dtype`.
+    """
+    return pd.DataFrame({
+        field["name"]: _build_column([row[field["name"]] for row in rows], field)
+        for field in schema
+        if field["name"] not in exclude
+    })
+
+
+def without_descriptions(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the frame without the description columns."""
+    return df.drop(columns=[column for column in DESCRIPTION_COLUMNS if column in df.columns])
+
@@ -0,0 +1,125 @@
+"""
+This file updates the all-time records index from the rows of one run.
+
+The index keeps, for every metric and scope (overall, per category, per region), the top
+entries with one entry per video or channel at its best value. A run turns its videos
+and channels into candidate entries. These are merged with the stored entries and
+every leaderboard is cut back to its top entries. The work depends on the rows of the
+run and the size of the index, never on the length of the history.
+
+The leader of every leaderboard also keeps the record it took over: the previous holder,
+its value and the day it was broken. A holder improving its own record keeps them, so
+only a change of holder counts as a broken record.
+"""
+import pandas as pd
+
+from yt_common.records import ALL, CATEGORY, CHANNEL_METRICS, REGION, RECORD_COLUMNS, VIDEO_METRICS
+
+from yt_config.frames import column_dtype
+from yt_config.schemas import RECORDS_SCHEMA
+
+KEY_COLUMNS = ["metric", "scope", "scope_value"]
+ENTRY_COLUMNS = KEY_COLUMNS + ["entity_id", "entity_name", "value", "achieved_on"]
+LEADER_COLUMNS = ["previous_entity_id", "previous_value", "broken_on"]
+MISSING_MARKETS = ["", "None", "nan"]
+
+
+def _entries(df: pd.DataFrame, metric: str, id_column: str, name_column: str, value_column: str,
+             scopes: dict, achieved_on) -> list:
+    entries = []
+    for scope, scope_values in scopes.items():
+        entries.append(pd.DataFrame({
+            "metric": metric,
+            "scope": scope,
+            "scope_value": scope_values,
+            "entity_id": df[id_column].astype(str).to_numpy(),
+            "entity_name": df[name_column].astype(str).to_numpy(),
+            "value": df[value_column].to_numpy(),
+            "achieved_on": pd.Timestamp(achieved_on),
+        }))
+    return entries
+
+
+def record_candidates(videos: pd.DataFrame, channels: pd.DataFrame, week_ago: pd.DataFrame, region: str,
+                      achieved_on) -> pd.DataFrame:
+    """
+    Turn the rows of a run into entries of the leaderboards.
+
+    Args:
+        videos (pd.DataFrame): The trending videos of the run, with their title and counters.
+        channels (pd.DataFrame): The channels of the run, with their name, market and counters.
+        week_ago (pd.DataFrame): The counters of the channels WEEKLY_GAIN_DAYS days earlier.
+        region (str): The region of the trending chart the videos come from.
+        achieved_on (datetime.date): The day of the capture.
+
+    Returns:
+        pd.DataFrame: One entry per metric, scope and video or channel, shaped like ENTRY_COLUMNS.
+    """
+    entries = []
+    if len(videos):
+        video_scopes = {
+            ALL: "",
+            CATEGORY: videos["video_category_id"].astype(str).to_numpy(),
+            REGION: region,
+        }
+        for metric in VIDEO_METRICS:
+            entries += _entries(videos, metric, "video_id", "video_title", metric, video_scopes, achieved_on)
+
+    # Channels captured for the first time this week have no gain
+    channels = channels.merge(week_ago, on="channel_id", suffixes=("", "_week_ago"))
+    # Channels without a country are ranked overall only, `get_channel_info` stores it as 'None'
+    markets = channels["channel_market"].astype(str)
+    has_market = (channels["channel_market"].notna() & ~markets.isin(MISSING_MARKETS)).to_numpy()
+    for metric, counter in CHANNEL_METRICS.items():
+        gains = channels.assign(gain=channels[counter] - channels[f"{counter}_week_ago"])
+        entries += _entries(gains, metric, "channel_id", "channel_name", "gain", {ALL: ""}, achieved_on)
+        entries += _entries(gains[has_market], metric, "channel_id", "channel_name", "gain",
+                            {REGION: gains["channel_market"][has_market].astype(str).to_numpy()}, achieved_on)
+
+    if not entries:
+        return pd.DataFrame(columns=ENTRY_COLUMNS)
+    return pd.concat(entries, ignore_index=True)
+
+
+def update_leaderboards(index: pd.DataFrame, candidates: pd.DataFrame, top_k: int, day) -> pd.DataFrame:
+    """
+    Merge the entries of a run into the records index.
+
+    Args:
+        index (pd.DataFrame): The stored index, shaped like RECORD_COLUMNS.
+        candidates (pd.DataFrame): The entries of the run, from `record_candidates`.
+        top_k (int): The number of entries kept per leaderboard.
+        day (datetime.date): The day of the run, the day of the records broken by it.
+
+    Returns:
+        pd.DataFrame: The new index, shaped like RECORD_COLUMNS. Only the leaderboards of the
+        run change.
+    """
+    entries = pd.concat([index[ENTRY_COLUMNS], candidates[ENTRY_COLUMNS]], ignore_index=True)
+    entries = entries.dropna(subset=["value"]).astype({"value": "int64", "scope_value": str})
+    entries["achieved_on"] = pd.to_datetime(entries["achieved_on"])
+
+    # Every video or channel once at its best value, an earlier day first on a tie
+    entries = entries.sort_values(["value", "achieved_on"], ascending=[False, True], kind="stable")
+    entries = entries.drop_duplicates(KEY_COLUMNS + ["entity_id"], keep="first")
+    entries = entries.assign(rank=entries.groupby(KEY_COLUMNS, sort=False).cumcount() + 1)
+    entries = entries[entries["rank"] <= top_k].reset_index(drop=True)
+
+    old_leaders = index[index["rank"] == 1][KEY_COLUMNS + ["entity_id", "value"] + LEADER_COLUMNS]
+    old_leaders = old_leaders.astype({"scope_value": str}).rename(
+        columns={"entity_id": "old_entity_id", "value": "old_value"}
+    )
+    entries = entries.merge(old_leaders, on=KEY_COLUMNS, how="left")
+
+    # A leader either kept its record, took it from the old leader, or leads a new leaderboard
+    is_leader = entries["rank"] == 1
+    kept = is_leader & (entries["entity_id"] == entries["old_entity_id"])
+    taken = is_leader & entries["old_entity_id"].notna() & ~kept
+    entries = entries.assign(
+        previous_entity_id=entries["previous_entity_id"].where(kept, entries["old_entity_id"].where(taken)),
+        previous_value=entries["previous_value"].where(kept, entries["old_value"].where(taken)),
+        broken_on=pd.to_datetime(entries["broken_on"]).where(kept, pd.Timestamp(day)).where(kept | taken),
+    )
+
+    entries = entries[RECORD_COLUMNS].sort_values(KEY_COLUMNS + ["rank"], ignore_index=True)
+    return entries.astype({field["name"]: column_dtype(field) for field in RECORDS_SCHEMA})
@@ -6,6 +6,14 @@ It defines the schema structures for the following tables:
 - CATEGORIES_NAME_SCHEMA: Schema for the category name table.
 - CHANNEL_CATEGORIES_SCHEMA: Schema for the channel categories table.
 - DAILY_TOP_VIDEOS_SCHEMA: Schema for the daily top videos table.
+- CHANNEL_SNAPSHOTS_SCHEMA / CHANNEL_METADATA_SCHEMA: Schemas for the daily channel metrics
+  and the deduplicated channel metadata, joined back into CHANNEL_INFO_SCHEMA by a view.
+- VIDEO_SNAPSHOTS_SCHEMA / VIDEO_METADATA_SCHEMA: Schemas for the daily video metrics
+  and the deduplicated video metadata, joined back into DAILY_TOP_VIDEOS_SCHEMA by a view.
+- VIDEO_VELOCITY_SCHEMA: Schema for the per-video state of the trending videos, merged with
+  the rows of VIDEO_VELOCITY_STAGING_SCHEMA after each run.
+- RECORDS_SCHEMA: Schema for the all-time records index, the top entries of every metric
+  overall, per category and per region, rewritten from the rows of each run.
 
 Each schema is defined as a list of dictionaries, where each dictionary represents
 a field in the table with properties such as name, type, and mode. The file also includes
@@ -37,6 +45,9 @@ CHANNEL_INFO_CLUSTERING = ["updated_at", ]
 CATEGORIES_NAME_SCHEMA = [
     {"name": "category_id", "type": "STRING", "mode": "REQUIRED"},
     {"name": "category_name", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "region_code", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "etag", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "updated_at", "type": "DATE", "mode": "REQUIRED"},
 ]
 
 CHANNEL_CATEGORIES_SCHEMA = [
@@ -62,4 +73,108 @@ DAILY_TOP_VIDEOS_SCHEMA = [
     {"name": "video_comments", "type": "INTEGER", "mode": "REQUIRED"},
     {"name": "video_captured_at", "type": "DATE", "mode": "REQUIRED"},
 ]
-DAILY_TOP_VIDEOS_CLUSTERING = ["channel_id", "video_category_id", "video_captured_at"]
\ No newline at end of file
+DAILY_TOP_VIDEOS_CLUSTERING = ["channel_id", "video_category_id", "video_captured_at"]
+
+# Daily snapshots keep the ids and the metrics. The text and the other rarely changing fields
+# are stored once per version in the metadata tables, keyed by the id and the hash of the content.
+CHANNEL_SNAPSHOTS_SCHEMA = [
+    {"name": "channel_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "total_views", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "channel_subs", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "channel_videos", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "content_hash", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "updated_at", "type": "DATE", "mode": "REQUIRED"},
+]
+CHANNEL_SNAPSHOTS_CLUSTERING = ["updated_at", "channel_id"]
+
+CHANNEL_METADATA_SCHEMA = [
+    {"name": "channel_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "content_hash", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "channel_name", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "kind", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "channel_published", "type": "TIMESTAMP", "mode": "REQUIRED"},
+    {"name": "channel_logo_url", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "channel_market", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "channel_description", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "valid_from", "type": "DATE", "mode": "REQUIRED"},
+]
+CHANNEL_METADATA_CLUSTERING = ["channel_id", ]
+
+VIDEO_SNAPSHOTS_SCHEMA = [
+    {"name": "video_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "channel_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_category_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_views", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "video_likes", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "video_comments", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "content_hash", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_captured_at", "type": "DATE", "mode": "REQUIRED"},
+]
+VIDEO_SNAPSHOTS_CLUSTERING = ["channel_id", "video_category_id", "video_captured_at"]
+
+VIDEO_METADATA_SCHEMA = [
+    {"name": "video_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "content_hash", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "kind", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "live_broadcast", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_title", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_description", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "default_language", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "default_audio_language", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_published", "type": "TIMESTAMP", "mode": "REQUIRED"},
+    {"name": "video_duration", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "valid_from", "type": "DATE", "mode": "REQUIRED"},
+]
+VIDEO_METADATA_CLUSTERING = ["video_id", ]
+
+# One row per trending video, updated in place from the rows captured by each run
+VIDEO_VELOCITY_SCHEMA = [
+    {"name": "video_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "channel_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_title", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "first_seen_at", "type": "TIMESTAMP", "mode": "REQUIRED"},
+    {"name": "first_views", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "last_captured_at", "type": "TIMESTAMP", "mode": "REQUIRED"},
+    {"name": "last_views", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "days_trending", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "views_per_hour", "type": "FLOAT", "mode": "NULLABLE"},
+]
+VIDEO_VELOCITY_CLUSTERING = ["video_id", ]
+
+VIDEO_VELOCITY_STAGING_SCHEMA = [
+    {"name": "video_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "channel_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_title", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "video_published", "type": "TIMESTAMP", "mode": "REQUIRED"},
+    {"name": "video_views", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "captured_at", "type": "TIMESTAMP", "mode": "REQUIRED"},
+]
+
+# Appended by the coordinator and the workers of a sharded channel refresh, one row per status change.
+# The dispatched rows keep the comma-separated channel ids of the shard, for the re-dispatches
+SHARD_STATUS_SCHEMA = [
+    {"name": "run_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "shard", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "attempt", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "status", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "channels", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "channel_ids", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "error", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "updated_at", "type": "TIMESTAMP", "mode": "REQUIRED"},
+]
+SHARD_STATUS_CLUSTERING = ["run_id", ]
+
+# Top RECORDS_TOP_K entries per metric and scope, the leader (rank 1) rows keep the record it broke
+RECORDS_SCHEMA = [
+    {"name": "metric", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "scope", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "scope_value", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "rank", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "entity_id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "entity_name", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "value", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "achieved_on", "type": "DATE", "mode": "REQUIRED"},
+    {"name": "previous_entity_id", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "previous_value", "type": "INTEGER", "mode": "NULLABLE"},
+    {"name": "broken_on", "type": "DATE", "mode": "NULLABLE"},
+]
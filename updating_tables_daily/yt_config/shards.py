@@ -0,0 +1,173 @@
+"""
+This file splits the channel refresh into shards and dispatches them to worker invocations.
+
+The channels are assigned to a shard by a hash of their id, so a channel stays in the same
+shard from one run to the next whatever the other ids. Every shard is sent as a task through
+a queue backend:
+- `InProcessQueue` runs the task right away in the current process, for tests and local runs,
+- `HttpQueue` POSTs the task to a worker URL, e.g. a local `functions-framework` server,
+- `CloudTasksQueue` creates a Cloud Tasks HTTP task targeting the deployed worker.
+
+The backends only deliver the tasks: the workers report the outcome of every shard in the
+shard status table. The coordinator does not wait for them. It schedules a check task, which
+reads the table, re-dispatches the failed or lost shards and schedules the next check, so no
+invocation lives longer than its own step.
+
+The worker is the public entry point of the function, so the HTTP backends authenticate their
+tasks: with the shared secret in WORKER_SECRET_HEADER, and for Cloud Tasks also with the OIDC
+token of the service account.
+"""
+import datetime
+import json
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Statuses of a shard attempt in the shard status table
+DISPATCHED = "dispatched"
+DONE = "done"
+FAILED = "failed"
+
+# Header carrying the shared secret of the workers
+WORKER_SECRET_HEADER = "X-Worker-Secret"
+
+
+def task_headers(secret: str = None) -> dict:
+    """Return the headers of a task request, with the shared secret when there is one."""
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers[WORKER_SECRET_HEADER] = secret
+    return headers
+
+
+def describe_task(task: dict) -> str:
+    """Name a shard task or a check task in the messages."""
+    if "shard" in task:
+        return f"Shard {task['shard']}"
+    return f"Check of run {task['run_id']}"
+
+
+def shard_of(id: str, num_of_shards: int) -> int:
+    """Return the shard of an id."""
+    return zlib.crc32(id.encode("utf-8")) % num_of_shards
+
+
+def split_shards(ids, num_of_shards: int) -> dict:
+    """
+    Split ids into shards.
+
+    Args:
+        ids: The ids to split.
+        num_of_shards (int): The number of shards.
+
+    Returns:
+        dict: Shard number -> sorted list of its ids, without the empty shards.
+    """
+    shards = {}
+    for id in ids:
+        shards.setdefault(shard_of(id, num_of_shards), []).append(id)
+    return {shard: sorted(shards[shard]) for shard in sorted(shards)}
+
+
+class InProcessQueue:
+    """
+    Runs every task synchronously with the given handler.
+
+    Args:
+        handler (callable): Called with the task. The errors of the shard tasks are printed, the
+            worker is expected to record them in the shard status table. The errors of the check
+            tasks are raised to the caller.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def dispatch(self, task: dict) -> None:
+        try:
+            self.handler(task)
+        except Exception as e:
+            print(f"{describe_task(task)} failed:", e)
+
+    def schedule(self, task: dict, delay_seconds: float) -> None:
+        """Run the task right away, the shards dispatched in process are already done."""
+        self.handler(task)
+
+
+class HttpQueue:
+    """
+    POSTs every task as JSON to a worker URL, from a pool of background threads.
+
+    Args:
+        url (str): URL of the worker.
+        max_workers (int): Maximum number of requests in flight.
+        timeout (float): Timeout of a request in seconds.
+        secret (str): The shared secret of the workers.
+    """
+
+    def __init__(self, url: str, max_workers: int = 8, timeout: float = 600, secret: str = None):
+        self.url = url
+        self.timeout = timeout
+        self.secret = secret
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def dispatch(self, task: dict) -> None:
+        self._executor.submit(self._post, task)
+
+    def schedule(self, task: dict, delay_seconds: float) -> None:
+        """POST the task after a delay."""
+        timer = threading.Timer(delay_seconds, self.dispatch, [task])
+        timer.daemon = True
+        timer.start()
+
+    def _post(self, task: dict) -> None:
+        try:
+            response = requests.post(self.url, json=task, headers=task_headers(self.secret), timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"{describe_task(task)} was not delivered:", e)
+            return
+        if not response.ok:
+            print(f"{describe_task(task)} failed:", response.status_code, response.text)
+
+
+class CloudTasksQueue:
+    """
+    Creates a Cloud Tasks HTTP task per task, POSTing it as JSON to the worker.
+
+    Args:
+        queue_path (str): The queue, `projects/PROJECT/locations/LOCATION/queues/QUEUE`.
+        url (str): URL of the worker.
+        service_account (str): Email of the service account the OIDC token of the requests
+            is issued for.
+        secret (str): The shared secret of the workers.
+    """
+
+    def __init__(self, queue_path: str, url: str, service_account: str = None, secret: str = None):
+        from google.cloud import tasks_v2
+
+        self.queue_path = queue_path
+        self.url = url
+        self.service_account = service_account
+        self.secret = secret
+        self._tasks = tasks_v2
+        self._client = tasks_v2.CloudTasksClient()
+
+    def dispatch(self, task: dict) -> None:
+        self._create_task(task)
+
+    def schedule(self, task: dict, delay_seconds: float) -> None:
+        """Create the task to be delivered after a delay."""
+        schedule_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=delay_seconds)
+        self._create_task(task, schedule_time=schedule_time)
+
+    def _create_task(self, task: dict, **fields) -> None:
+        http_request = {
+            "http_method": self._tasks.HttpMethod.POST,
+            "url": self.url,
+            "headers": task_headers(self.secret),
+            "body": json.dumps(task).encode("utf-8"),
+        }
+        if self.service_account:
+            http_request["oidc_token"] = {"service_account_email": self.service_account, "audience": self.url}
+        self._client.create_task(parent=self.queue_path, task={"http_request": http_request, **fields})
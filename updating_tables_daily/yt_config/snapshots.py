@@ -0,0 +1,153 @@
+"""
+This file splits the wide daily frames into snapshot rows and metadata rows.
+
+The snapshot tables get one row per id and day with the metrics and the hash of the
+metadata columns. The metadata tables get one row per id and distinct content, so the
+descriptions, titles and URLs are only written again when they change. The views built
+by `wide_view_query` join both back into the shape of the original tables, and
+`migration_query` moves the history of an original table into both.
+"""
+import hashlib
+
+import pandas as pd
+
+# Separates the values of the hashed columns, does not occur in the texts
+HASH_SEPARATOR = "\x1f"
+
+# Columns of the metadata tables that are not part of the content
+METADATA_KEY_COLUMNS = ("content_hash", "valid_from")
+
+
+def _names(schema: list) -> list:
+    return [field["name"] for field in schema]
+
+
+def content_columns(metadata_schema: list, id_column: str) -> list:
+    """Return the metadata columns the content hash is computed from."""
+    return [name for name in _names(metadata_schema) if name != id_column and name not in METADATA_KEY_COLUMNS]
+
+
+def content_hash(df: pd.DataFrame, columns: list) -> pd.Series:
+    """
+    Compute the SHA-1 hash of the given columns of every row.
+
+    Args:
+        df (pd.DataFrame): The rows.
+        columns (list): The hashed columns.
+
+    Returns:
+        pd.Series: The hex digests, aligned with the rows.
+    """
+    values = [df[column].astype(str) for column in columns]
+    joined = values[0].str.cat(values[1:], sep=HASH_SEPARATOR)
+    return joined.map(lambda text: hashlib.sha1(text.encode("utf-8")).hexdigest())
+
+
+def split_snapshot(df: pd.DataFrame, snapshot_schema: list, metadata_schema: list, id_column: str,
+                   date_column: str, known_hashes: set) -> tuple:
+    """
+    Split a wide frame into the snapshot rows and the metadata rows not stored yet.
+
+    Args:
+        df (pd.DataFrame): Rows shaped like the wide schema.
+        snapshot_schema (list): Schema of the snapshot table.
+        metadata_schema (list): Schema of the metadata table.
+        id_column (str): The id of the video or the channel.
+        date_column (str): The capture date, used as the start of validity of new metadata.
+        known_hashes (set): The (id, content hash) pairs already in the metadata table.
+
+    Returns:
+        tuple: The snapshot rows and the new metadata rows.
+    """
+    df = df.assign(content_hash=content_hash(df, content_columns(metadata_schema, id_column)))
+    snapshots = df[_names(snapshot_schema)]
+
+    metadata = df.drop_duplicates([id_column, "content_hash"])
+    is_new = [(row_id, row_hash) not in known_hashes
+              for row_id, row_hash in zip(metadata[id_column], metadata["content_hash"])]
+    metadata = metadata.loc[is_new]
+    new_metadata = metadata.assign(valid_from=metadata[date_column])[_names(metadata_schema)]
+    return snapshots, new_metadata
+
+
+def wide_view_query(wide_schema: list, snapshot_schema: list, snapshots_ref: str, metadata_ref: str,
+                    id_column: str) -> str:
+    """
+    Build the query of the view joining the snapshots with their metadata.
+
+    A content stored twice, e.g. by a shard dispatched again while its first attempt was
+    still running, is joined once, from its earliest row.
+
+    Args:
+        wide_schema (list): Schema of the original wide table, the columns of the view.
+        snapshot_schema (list): Schema of the snapshot table.
+        snapshots_ref (str): Full name of the snapshot table.
+        metadata_ref (str): Full name of the metadata table.
+        id_column (str): The id of the video or the channel.
+
+    Returns:
+        str: The SQL of the view.
+    """
+    snapshot_columns = set(_names(snapshot_schema))
+    columns = ",\n    ".join(
+        f"s.{name}" if name in snapshot_columns else f"m.{name}" for name in _names(wide_schema)
+    )
+    return f"""
+SELECT
+    {columns}
+FROM `{snapshots_ref}` AS s
+JOIN (
+    SELECT *
+    FROM `{metadata_ref}`
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY {id_column}, content_hash ORDER BY valid_from) = 1
+) AS m
+ON m.{id_column} = s.{id_column} AND m.content_hash = s.content_hash
+"""
+
+
+def migration_query(snapshot_schema: list, metadata_schema: list, wide_ref: str, snapshots_ref: str,
+                    metadata_ref: str, id_column: str, date_column: str) -> str:
+    """
+    Build the script moving the rows of an original wide table into the snapshot and metadata tables.
+
+    The rows are copied in one transaction, then the wide table is renamed with the `_wide`
+    suffix, which frees its name for the view and keeps it until the copy has been checked.
+    The content hashes are computed in SQL and differ from the ones of the pipeline, so the
+    first run after the migration stores one more metadata version of the ids it sees.
+
+    Args:
+        snapshot_schema (list): Schema of the snapshot table.
+        metadata_schema (list): Schema of the metadata table.
+        wide_ref (str): Full name of the wide table.
+        snapshots_ref (str): Full name of the snapshot table.
+        metadata_ref (str): Full name of the metadata table.
+        id_column (str): The id of the video or the channel.
+        date_column (str): The capture date, the start of validity of the metadata.
+
+    Returns:
+        str: The SQL of the script.
+    """
+    content = content_columns(metadata_schema, id_column)
+    hashed = f"TO_HEX(SHA1(TO_JSON_STRING(STRUCT({', '.join(content)}))))"
+    snapshot_columns = _names(snapshot_schema)
+    snapshot_values = ", ".join(hashed if name == "content_hash" else name for name in snapshot_columns)
+    metadata_columns = _names(metadata_schema)
+    metadata_values = ", ".join(
+        name if name in (id_column, "content_hash")
+        else f"MIN({date_column})" if name == "valid_from"
+        else f"ANY_VALUE({name})"
+        for name in metadata_columns
+    )
+    wide_name = wide_ref.split(".")[-1]
+    return f"""
+BEGIN TRANSACTION;
+INSERT INTO `{snapshots_ref}` ({', '.join(snapshot_columns)})
+SELECT {snapshot_values}
+FROM `{wide_ref}`;
+INSERT INTO `{metadata_ref}` ({', '.join(metadata_columns)})
+SELECT {metadata_values}
+FROM (SELECT *, {hashed} AS content_hash FROM `{wide_ref}`)
+GROUP BY {id_column}, content_hash;
+COMMIT TRANSACTION;
+ALTER TABLE `{wide_ref}` RENAME TO `{wide_name}_wide`;
+"""
@@ -0,0 +1,54 @@
+"""
+In-process map of the video category ids to their names.
+
+The categories table is refreshed by the ingestion from `videoCategories.list` and changes
+rarely, so the map is loaded once per process and reused by every invocation a warm instance
+serves. The tweet functions label their rows with it instead of joining the table in SQL.
+"""
+import functools
+
+from yt_common.clients import get_bigquery_client
+from yt_common.instrumentation import BQ_QUERY, span
+
+
+@functools.lru_cache(maxsize=None)
+def load_category_names(project_id: str, dataset_name: str, table_name: str) -> dict:
+    """
+    Load the category names, once per process.
+
+    Args:
+        project_id (str): The Google Cloud project.
+        dataset_name (str): The BigQuery dataset.
+        table_name (str): The categories table.
+
+    Returns:
+        dict: Category id (str) -> category name. The ids are shared by all regions.
+    """
+    query = f"""
+    SELECT category_id, ANY_VALUE(category_name) AS category_name
+    FROM `{project_id}.{dataset_name}.{table_name}`
+    GROUP BY category_id
+    """
+
+    with span(BQ_QUERY) as query_span:
+        categories_query = get_bigquery_client(project_id).query(query)
+        names = {row['category_id']: row['category_name'] for row in categories_query}
+        query_span.add(bytes=categories_query.total_bytes_processed, rows=len(names))
+
+    return names
+
+
+def label_categories(df, names: dict, id_column: str = 'video_category_id'):
+    """
+    Add the 'category_name' column to the rows, dropping the rows of unknown categories.
+
+    Args:
+        df (pandas.DataFrame): Rows with a category id column.
+        names (dict): The map returned by `load_category_names`.
+        id_column (str): Name of the category id column.
+
+    Returns:
+        pandas.DataFrame: The labelled rows.
+    """
+    labelled = df.assign(category_name=df[id_column].astype(str).map(names))
+    return labelled.dropna(subset=['category_name'])
@@ -0,0 +1,38 @@
+"""
+Google API clients shared by the functions.
+
+Credentials and clients are created once per process and cached, so when several
+jobs run in the same process (see `orchestrator`) they authenticate and build
+their clients only once.
+"""
+import functools
+
+import google.auth
+from google.cloud import bigquery
+
+
+@functools.lru_cache(maxsize=None)
+def get_credentials():
+    """
+    Load the Application Default Credentials (ADC).
+
+    Returns:
+        tuple: The credentials and the project they belong to.
+    """
+    return google.auth.default()
+
+
+@functools.lru_cache(maxsize=None)
+def get_bigquery_client(project_id: str) -> bigquery.Client:
+    """Return the BigQuery client of the project."""
+    credentials, _ = get_credentials()
+    return bigquery.Client(credentials=credentials, project=project_id)
+
+
+@functools.lru_cache(maxsize=None)
+def get_youtube_client():
+    """Return the YouTube Data API v3 client."""
+    from googleapiclient.discovery import build
+
+    credentials, _ = get_credentials()
+    return build("youtube", "v3", credentials=credentials)
@@ -0,0 +1,183 @@
+"""
+Composition of the tweet texts shared by the tweet jobs.
+
+The translation tables are built once at import. Texts are validated against
+Twitter's weighted length: code points from the Latin and general punctuation
+ranges count as 1, every other code point (including the Mathematical Bold glyphs
+used to highlight titles, and emoji) counts as 2, and every URL counts as 23.
+Titles are truncated so that the whole tweet fits into MAX_TWEET_WEIGHT. When the hashtags
+leave less than MIN_TITLE_WEIGHT to the title, the channel and then the category hashtags are
+shortened first.
+"""
+import re
+
+from yt_common.locales import DEFAULT_LOCALE, localized
+
+MAX_TWEET_WEIGHT = 280
+URL_WEIGHT = 23
+ELLIPSIS = "…"
+# Weight left to the title before the hashtags are shortened
+MIN_TITLE_WEIGHT = 40
+
+POLISH_SYMBOLS = "ąćęłńóśźżĄĆĘŁŃÓŚŹŻ"
+ENGLISH_EQUIVALENTS = "acelnoszzACELNOSZZ"
+UNBOLDED_SYMBOLS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+BOLDED_SYMBOLS = "𝗔𝗕𝗖𝗗𝗘𝗙𝗚𝗛𝗜𝗝𝗞𝗟𝗠𝗡𝗢𝗣𝗤𝗥𝗦𝗧𝗨𝗩𝗪𝗫𝗬𝗭𝗮𝗯𝗰𝗱𝗲𝗳𝗴𝗵𝗶𝗷𝗸𝗹𝗺𝗻𝗼𝗽𝗾𝗿𝘀𝘁𝘂𝘃𝘄𝘅𝘆𝘇𝟬𝟭𝟮𝟯𝟰𝟱𝟲𝟳𝟴𝟵"
+
+ASCII_TABLE = str.maketrans(POLISH_SYMBOLS, ENGLISH_EQUIVALENTS)
+BOLD_TABLE = str.maketrans(UNBOLDED_SYMBOLS, BOLDED_SYMBOLS)
+HASHTAG_TABLE = str.maketrans({" ": "_", "&": "and", "-": "_", "'": None, ".": None, ",": None})
+
+# Code point ranges counted with weight 1 (twitter-text v3 configuration)
+_LIGHT_RANGES = ((0, 4351), (8192, 8205), (8208, 8223), (8242, 8247))
+_URL_PATTERN = re.compile(r"https?://\S+")
+
+YOUTUBE_VIDEO_URL = "https://www.youtube.com/watch?v={video_id}"
+
+
+def format_views(x):
+    """
+    Custom formatter function for number of views.
+
+    Parameters:
+        x (float): The tick value.
+
+    Returns:
+        str: The formatted views.
+    """
+    suffixes = ['', ' k', ' M', ' B']  # Suffixes for thousands, millions, billions
+    suffix_idx = 0
+    while abs(x) >= 1000 and suffix_idx < len(suffixes) - 1:
+        x /= 1000.0
+        suffix_idx += 1
+    if x % 1 == 0:
+        return f'{int(x):.0f}{suffixes[suffix_idx]}'
+    else:
+        return f'{x:.1f}{suffixes[suffix_idx]}'
+
+
+def _char_weight(char: str) -> int:
+    code_point = ord(char)
+    for low, high in _LIGHT_RANGES:
+        if low <= code_point <= high:
+            return 1
+    return 2
+
+
+def _plain_weight(text: str) -> int:
+    return sum(_char_weight(char) for char in text)
+
+
+def weighted_length(text: str) -> int:
+    """
+    Compute the length of the text as counted by Twitter.
+
+    Args:
+        text (str): The tweet text.
+
+    Returns:
+        int: The weighted length, to be compared with MAX_TWEET_WEIGHT.
+    """
+    urls = _URL_PATTERN.findall(text)
+    return _plain_weight(_URL_PATTERN.sub("", text)) + URL_WEIGHT * len(urls)
+
+
+def truncate_to_weight(text: str, budget: int) -> str:
+    """
+    Truncate the text with an ellipsis so that its weighted length fits into the budget.
+
+    Args:
+        text (str): The text to truncate, without URLs.
+        budget (int): The maximum weighted length.
+
+    Returns:
+        str: The text, unchanged when it already fits, empty when not even the ellipsis fits.
+    """
+    if _plain_weight(text) <= budget:
+        return text
+    if budget < _plain_weight(ELLIPSIS):
+        return ""
+    budget -= _plain_weight(ELLIPSIS)
+    weight = 0
+    for end, char in enumerate(text):
+        weight += _char_weight(char)
+        if weight > budget:
+            return text[:end].rstrip() + ELLIPSIS
+    return text
+
+
+def to_hashtag(text: str) -> str:
+    """Turn a name into a hashtag body, e.g. 'Film & Animation' -> 'Film_and_Animation'."""
+    return text.translate(HASHTAG_TABLE)
+
+
+def to_bold(text: str) -> str:
+    """Replace the Polish letters with ASCII and render the result in Mathematical Bold."""
+    return text.translate(ASCII_TABLE).translate(BOLD_TABLE)
+
+
+def fit_caption(caption: str, max_weight: int = MAX_TWEET_WEIGHT) -> str:
+    """
+    Truncate an image caption to the weighted tweet limit.
+
+    Args:
+        caption (str): The caption, without URLs.
+        max_weight (int): The weighted limit.
+
+    Returns:
+        str: The caption that fits into the limit.
+    """
+    return truncate_to_weight(caption, max_weight)
+
+
+DAILY_TOP_TEMPLATE = localized(DEFAULT_LOCALE, "daily_top_template")
+
+
+def compose_daily_top_tweets(df, template: str = DAILY_TOP_TEMPLATE, max_weight: int = MAX_TWEET_WEIGHT,
+                             headers: list = None) -> list:
+    """
+    Build the daily top tweets for all rows of a DataFrame in one pass.
+
+    The titles are converted in bulk with the precompiled tables and truncated so
+    that every tweet fits into the weighted limit. Long channel and category hashtags
+    are shortened to leave MIN_TITLE_WEIGHT to the title.
+
+    Args:
+        df (pandas.DataFrame): Rows with the 'category_name', 'video_title', 'video_views',
+            'channel_name' and 'video_id' columns.
+        template (str): The tweet template with the {category}, {title}, {views}, {channel} and {url} fields.
+        max_weight (int): The weighted limit.
+        headers (list): A line put above the template for every row, or None for no line.
+
+    Returns:
+        list: The tweet texts, in the order of the rows.
+
+    Raises:
+        ValueError: If a tweet exceeds the limit even with an empty title and hashtags.
+    """
+    titles = df['video_title'].astype(str).str.translate(ASCII_TABLE).str.translate(BOLD_TABLE)
+    categories = df['category_name'].astype(str).str.translate(HASHTAG_TABLE)
+    channels = df['channel_name'].astype(str).str.translate(HASHTAG_TABLE)
+
+    tweets = []
+    headers = headers or [None] * len(df)
+    for title, category, channel, views, video_id, header in zip(titles, categories, channels, df['video_views'],
+                                                                  df['video_id'], headers):
+        row_template = f"{header}\n{template}" if header else template
+        fields = {
+            "category": category,
+            "views": format_views(views),
+            "channel": channel,
+            "url": YOUTUBE_VIDEO_URL.format(video_id=video_id),
+        }
+        budget = max_weight - weighted_length(row_template.format(title="", **fields))
+        for hashtag in ("channel", "category"):
+            if budget >= MIN_TITLE_WEIGHT:
+                break
+            hashtag_budget = max(_plain_weight(fields[hashtag]) - (MIN_TITLE_WEIGHT - budget), 0)
+            fields[hashtag] = truncate_to_weight(fields[hashtag], hashtag_budget)
+            budget = max_weight - weighted_length(row_template.format(title="", **fields))
+        if budget < 0:
+            raise ValueError(f"The daily top tweet of video {video_id} exceeds {max_weight} without its title")
+        tweets.append(row_template.format(title=truncate_to_weight(title, budget), **fields))
+    return tweets
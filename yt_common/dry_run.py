@@ -0,0 +1,33 @@
+"""
+Dry-run output of the tweet jobs.
+
+In dry-run mode the jobs still query the data and render the images, but instead of
+posting, every tweet is appended to `tweets.jsonl` in the working directory together
+with the path of its image and the publishing target.
+"""
+import json
+import os
+import threading
+
+DRY_RUN_FILE = "tweets.jsonl"
+
+# The targets of a job are published concurrently
+_WRITE_LOCK = threading.Lock()
+
+
+def record_tweet(text: str, image_path: str = None, target: str = None) -> None:
+    """
+    Append a tweet that would have been posted to the dry-run file.
+
+    Args:
+        text (str): The text of the tweet.
+        image_path (str): Path of the attached image, if any.
+        target (str): Name of the publishing target, if any.
+    """
+    entry = {"text": text}
+    if image_path is not None:
+        entry["image"] = os.path.abspath(image_path)
+    if target is not None:
+        entry["target"] = target
+    with _WRITE_LOCK, open(DRY_RUN_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
@@ -0,0 +1,156 @@
+"""
+Growth analytics over the daily channel metrics.
+
+The snapshots are loaded once into dense channels x days matrices (NaN where a channel
+was not captured). All statistics are computed for every channel and day at once with
+cumulative sums along the day axis, so the cost is a handful of passes over the matrix
+whatever the window sizes.
+
+For a metric such as total views:
+- the daily gain is the difference between consecutive days,
+- the rolling mean is the average daily gain over the last WINDOW_DAYS days,
+- the z-score compares the rolling mean with the mean and the standard error of the
+  daily gains over the BASELINE_DAYS days before the window,
+- the acceleration is the change of the rolling mean against the previous window,
+- a breakout is a z-score of at least Z_THRESHOLD with a positive acceleration.
+"""
+import numpy as np
+import pandas as pd
+
+WINDOW_DAYS = 7
+BASELINE_DAYS = 28
+Z_THRESHOLD = 3.0
+
+
+def load_series(df: pd.DataFrame, value_columns: list, id_column: str = 'channel_id',
+                date_column: str = 'updated_at') -> tuple:
+    """
+    Pivot long snapshot rows into dense channels x days matrices.
+
+    Args:
+        df (pd.DataFrame): One row per channel and day.
+        value_columns (list): The metrics to pivot, e.g. ['total_views', 'channel_subs'].
+        id_column (str): The channel id column.
+        date_column (str): The capture date column.
+
+    Returns:
+        tuple: The channel ids (array), the days (datetime64[D] array) and a dict
+        metric -> float matrix of shape (channels, days).
+    """
+    codes, ids = pd.factorize(df[id_column])
+    days = pd.to_datetime(df[date_column]).to_numpy().astype('datetime64[D]')
+    if not len(days):
+        return np.asarray(ids), days, {column: np.empty((0, 0)) for column in value_columns}
+
+    first_day = days.min()
+    day_idx = (days - first_day).astype(np.int64)
+    num_of_days = int(day_idx.max()) + 1
+
+    matrices = {}
+    for column in value_columns:
+        matrix = np.full((len(ids), num_of_days), np.nan)
+        matrix[codes, day_idx] = df[column].to_numpy(dtype=float, na_value=np.nan)
+        matrices[column] = matrix
+    return np.asarray(ids), first_day + np.arange(num_of_days), matrices
+
+
+def _shift(matrix: np.ndarray, days: int) -> np.ndarray:
+    shifted = np.full_like(matrix, np.nan)
+    if days < matrix.shape[1]:
+        shifted[:, days:] = matrix[:, :matrix.shape[1] - days]
+    return shifted
+
+
+def _window_sums(matrix: np.ndarray, window: int) -> tuple:
+    valid = ~np.isnan(matrix)
+    values = np.where(valid, matrix, 0.0)
+    sums = np.cumsum(values, axis=1)
+    squares = np.cumsum(values * values, axis=1)
+    counts = np.cumsum(valid, axis=1)
+    for cumulative in (sums, squares, counts):
+        cumulative[:, window:] = cumulative[:, window:] - cumulative[:, :-window]
+    return sums, squares, counts
+
+
+def rolling_stats(matrix: np.ndarray, window: int, min_periods: int = None) -> tuple:
+    """
+    Compute the rolling mean and standard deviation of every row, ignoring the missing days.
+
+    Args:
+        matrix (np.ndarray): The channels x days matrix.
+        window (int): The window length in days, ending on (and including) each day.
+        min_periods (int): Minimum number of captured days in a window, defaults to more than half the window.
+
+    Returns:
+        tuple: The mean and the sample standard deviation, NaN where the window has too few days.
+    """
+    min_periods = min_periods or max(2, window // 2 + 1)
+    sums, squares, counts = _window_sums(matrix, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+        variance = (squares - sums * mean) / (counts - 1)
+    std = np.sqrt(np.clip(variance, 0.0, None))
+    too_short = counts < min_periods
+    mean[too_short] = np.nan
+    std[too_short] = np.nan
+    return mean, std
+
+
+def growth_metrics(matrix: np.ndarray, window: int = WINDOW_DAYS, baseline: int = BASELINE_DAYS,
+                   z_threshold: float = Z_THRESHOLD) -> dict:
+    """
+    Compute the growth statistics of every channel on every day.
+
+    Args:
+        matrix (np.ndarray): The channels x days matrix of a cumulative metric.
+        window (int): The length of the rolling window in days.
+        baseline (int): The length of the baseline before the window in days.
+        z_threshold (float): The minimum z-score of a breakout.
+
+    Returns:
+        dict: Matrices of the same shape under the keys 'gain', 'rolling_mean', 'zscore',
+        'acceleration' and 'breakout' (bool).
+    """
+    gain = np.diff(matrix, axis=1, prepend=np.nan)
+    rolling_mean, _ = rolling_stats(gain, window)
+    baseline_mean, baseline_std = rolling_stats(gain, baseline)
+    baseline_mean = _shift(baseline_mean, window)
+    baseline_error = _shift(baseline_std, window) / np.sqrt(window)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zscore = (rolling_mean - baseline_mean) / baseline_error
+    zscore[~np.isfinite(zscore)] = np.nan
+    acceleration = rolling_mean - _shift(rolling_mean, window)
+
+    with np.errstate(invalid='ignore'):
+        breakout = (zscore >= z_threshold) & (acceleration > 0)
+    return {
+        'gain': gain,
+        'rolling_mean': rolling_mean,
+        'zscore': zscore,
+        'acceleration': acceleration,
+        'breakout': breakout,
+    }
+
+
+def breakouts_on(ids: np.ndarray, metrics: dict, day: int = -1) -> pd.DataFrame:
+    """
+    List the channels flagged as breakouts on a day.
+
+    Args:
+        ids (np.ndarray): The channel ids, the rows of the matrices.
+        metrics (dict): The result of `growth_metrics`.
+        day (int): Column of the day, defaults to the last one.
+
+    Returns:
+        pd.DataFrame: The 'channel_id', 'rolling_mean', 'zscore' and 'acceleration' of the
+        flagged channels, sorted by z-score.
+    """
+    flagged = metrics['breakout'][:, day]
+    df = pd.DataFrame({
+        'channel_id': ids[flagged],
+        'rolling_mean': metrics['rolling_mean'][flagged, day],
+        'zscore': metrics['zscore'][flagged, day],
+        'acceleration': metrics['acceleration'][flagged, day],
+    })
+    return df.sort_values('zscore', ascending=False).reset_index(drop=True)
@@ -0,0 +1,283 @@
+"""
+Timing instrumentation shared by all Cloud Functions in the project.
+
+Every entry point is wrapped with `instrumented`, which opens a run for the
+duration of the request. Inside the run each stage of the job is measured with
+the `span` context manager:
+
+    with span(API_FETCH, api_calls=1, quota_units=1) as s:
+        response = request.execute()
+        s.add(bytes=len(json.dumps(response)))
+
+Each finished span is emitted as a single-line JSON log entry, which Cloud
+Logging parses into a structured `jsonPayload`. When the caller asks for it
+(`?timing=1` or the `X-Timing: 1` header) the HTTP response is returned as JSON
+with the per-stage breakdown attached.
+
+Spans opened outside a run are measured but not recorded, so the helper
+functions keep working when called from a notebook or a script.
+"""
+import contextvars
+import functools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+from yt_common.profiling import profiled, profiling_requested
+
+# Stage names
+API_FETCH = "api_fetch"
+PARSE = "parse"
+BQ_QUERY = "bq_query"
+BQ_UPLOAD = "bq_upload"
+IMAGE_DOWNLOAD = "image_download"
+RENDER = "render"
+TWEET = "tweet"
+
+# YouTube Data API quota cost of the list methods used in the project
+YT_LIST_QUOTA_UNITS = 1
+
+COUNTERS = ("bytes", "rows", "api_calls", "quota_units")
+
+_current_run = contextvars.ContextVar("yt_current_run", default=None)
+_span_listeners = []
+
+
+class Span:
+    """
+    A single measured stage of a run.
+
+    Attributes:
+        stage (str): Name of the stage, one of the stage constants.
+        duration (float): Wall time of the stage in seconds.
+        bytes (int): Bytes transferred or processed by the stage.
+        rows (int): Number of rows produced or consumed by the stage.
+        api_calls (int): Number of external API calls made by the stage.
+        quota_units (int): YouTube Data API quota units spent by the stage.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.duration = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.api_calls = 0
+        self.quota_units = 0
+
+    def add(self, bytes: int = 0, rows: int = 0, api_calls: int = 0, quota_units: int = 0) -> None:
+        """Increase the counters of the span."""
+        self.bytes += int(bytes or 0)
+        self.rows += int(rows or 0)
+        self.api_calls += int(api_calls or 0)
+        self.quota_units += int(quota_units or 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.stage,
+            "duration": round(self.duration, 4),
+            **{counter: getattr(self, counter) for counter in COUNTERS},
+        }
+
+
+class Run:
+    """
+    Collects the spans of a single function invocation.
+
+    Args:
+        function_name (str): Name of the Cloud Function entry point.
+        run_id (str): Identifier of the run, generated when not provided.
+    """
+
+    def __init__(self, function_name: str, run_id: str = None):
+        self.function_name = function_name
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.spans = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+        log_event("span", run=self, **span.to_dict())
+        for listener in _span_listeners:
+            listener(self, span)
+
+    def elapsed_so_far(self) -> float:
+        """Return the seconds elapsed since the run was opened."""
+        return time.perf_counter() - self.started
+
+    def finish(self) -> None:
+        self.elapsed = self.elapsed_so_far()
+
+    def stage_totals(self) -> dict:
+        """
+        Aggregate the recorded spans per stage.
+
+        Returns:
+            dict: Mapping of stage name to its summed duration and counters.
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = totals.setdefault(span.stage, {"duration": 0.0, "count": 0, **dict.fromkeys(COUNTERS, 0)})
+            stage["duration"] += span.duration
+            stage["count"] += 1
+            for counter in COUNTERS:
+                stage[counter] += getattr(span, counter)
+        for stage in totals.values():
+            stage["duration"] = round(stage["duration"], 4)
+        return totals
+
+    def summary(self) -> dict:
+        return {
+            "function": self.function_name,
+            "run_id": self.run_id,
+            "elapsed": round(self.elapsed, 4),
+            "stages": self.stage_totals(),
+        }
+
+
+def log_event(event: str, run: Run = None, **fields) -> None:
+    """
+    Print a structured (single-line JSON) log entry.
+
+    Args:
+        event (str): Name of the event, e.g. 'span' or 'run_finished'.
+        run (Run): Run the event belongs to, defaults to the current run.
+        **fields: Additional fields of the log entry.
+    """
+    run = run or _current_run.get()
+    entry = {"severity": "INFO", "event": event}
+    if run is not None:
+        entry["function"] = run.function_name
+        entry["run_id"] = run.run_id
+    entry.update(fields)
+    print(json.dumps(entry, default=str), flush=True)
+
+
+def add_span_listener(listener) -> None:
+    """
+    Register a callable invoked with `(run, span)` for every recorded span.
+
+    Used by the benchmark harness to attach memory readings to the stages.
+    """
+    _span_listeners.append(listener)
+
+
+def remove_span_listener(listener) -> None:
+    """Unregister a callable added with `add_span_listener`."""
+    if listener in _span_listeners:
+        _span_listeners.remove(listener)
+
+
+def current_run() -> Run:
+    """Return the run of the current request or None outside of a run."""
+    return _current_run.get()
+
+
+@contextmanager
+def start_run(function_name: str, run_id: str = None):
+    """
+    Open a run and make it current for the enclosed block.
+
+    Args:
+        function_name (str): Name of the Cloud Function entry point.
+        run_id (str): Optional identifier of the run.
+
+    Yields:
+        Run: The opened run.
+    """
+    run = Run(function_name, run_id)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        run.finish()
+        _current_run.reset(token)
+        log_event("run_finished", run=run, **run.summary())
+
+
+@contextmanager
+def span(stage: str, **counters):
+    """
+    Measure a stage of the current run.
+
+    Args:
+        stage (str): Name of the stage.
+        **counters: Initial values of the span counters (bytes, rows, api_calls, quota_units).
+
+    Yields:
+        Span: The span, whose counters can be increased inside the block.
+    """
+    measured = Span(stage)
+    measured.add(**counters)
+    started = time.perf_counter()
+    try:
+        yield measured
+    finally:
+        measured.duration = time.perf_counter() - started
+        run = _current_run.get()
+        if run is not None:
+            run.record(measured)
+
+
+def timing_requested(request) -> bool:
+    """
+    Check whether the caller asked for the timing breakdown in the response.
+
+    Args:
+        request (flask.Request): The request object, may be None.
+
+    Returns:
+        bool: True if `?timing=1` or the `X-Timing: 1` header was sent.
+    """
+    if request is None:
+        return False
+    flag = request.args.get("timing") or request.headers.get("X-Timing") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+def instrumented(function_name: str):
+    """
+    Decorator opening a run around an HTTP entry point.
+
+    The entry point keeps returning `(message, status)`; when the caller asked for
+    timing the message is replaced by a JSON body with the run summary. When
+    profiling was requested (see `yt_common.profiling`) the entry point runs under
+    the profiler and the saved profile locations are logged and returned with the timing. A profile
+    that could not be saved is logged as `profile_failed`, even when the entry point raised. A request
+    asking for a profile while another one is profiled runs unprofiled, which is logged.
+
+    Args:
+        function_name (str): Name of the Cloud Function entry point.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(request, *args, **kwargs):
+            profile = None
+            with start_run(function_name) as run:
+                requested = profiling_requested(request)
+                profiling = profiled(function_name, run.run_id) if requested else nullcontext()
+                try:
+                    with profiling as profile:
+                        body, status = handler(request, *args, **kwargs)
+                finally:
+                    if profile is not None and profile.error:
+                        log_event("profile_failed", severity="ERROR", error=profile.error,
+                                  locations=profile.locations)
+                    elif profile is not None:
+                        log_event("profile_saved", locations=profile.locations, traced_peak=profile.traced_peak)
+                    elif requested:
+                        log_event("profile_skipped", reason="another request is being profiled")
+            if timing_requested(request):
+                run_summary = run.summary()
+                if profile is not None:
+                    run_summary["profile"] = profile.locations
+                return {"message": body, **run_summary}, status
+            return body, status
+        return wrapper
+    return decorator
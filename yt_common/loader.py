@@ -0,0 +1,42 @@
+"""
+Loading of the function modules into a single process.
+
+Every function keeps its entry point in a `main.py` of its own folder, so the
+modules are imported by path under unique names. Used by the orchestrator and the
+benchmark suite.
+"""
+import importlib.util
+import os
+import sys
+
+
+def load_function_module(jobs_root: str, function_dir: str):
+    """
+    Import the `main.py` of a function folder as `<function_dir>_main`.
+
+    The folder is added to `sys.path`, so that the packages it ships (e.g. `yt_config`)
+    can be imported by the module. A module already loaded is returned as is.
+
+    Args:
+        jobs_root (str): Directory containing the function folders.
+        function_dir (str): Name of the function folder.
+
+    Returns:
+        module: The imported module.
+    """
+    module_name = f"{function_dir}_main"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    path = os.path.join(jobs_root, function_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(path, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
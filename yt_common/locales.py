@@ -0,0 +1,95 @@
+"""
+Texts of the tweets and chart titles per locale.
+
+Every publishing target has a locale (see `yt_common.publishing`); the jobs look up their
+captions, templates and chart titles here instead of hard-coding them, so an account in
+another language only needs its entry in LOCALES.
+"""
+DEFAULT_LOCALE = "pl"
+
+LOCALES = {
+    "pl": {
+        "date_format": "%d.%m.%Y",
+        "daily_top_template": (
+            "#YT_DAILY_TOP w kategorii #{category}\n"
+            "Film: {title}\n"
+            "Views: {views}\n"
+            "#youtube #top #{channel}\n"
+            "{url}"
+        ),
+        "weekly_views_title": "Najwyższy tygodniowy wzrost wyświetleń",
+        "weekly_views_caption": "Najwyższy tygodniowy wzrost wyświetleń na Polskim YT ({date_range})",
+        "weekly_subs_title": "Najwyższy tygodniowy wzrost subskrybentów",
+        "weekly_subs_caption": "Najwyższy tygodniowy wzrost subskrybentów na Polskim YT ({date_range})",
+        "categories_title": "Najpopularniejsze kategorie w tym tygodniu",
+        "categories_caption": "Najpopularniejsze kategorie na Polskim YT w tym tygodniu",
+        "breakout_total_views_header": "#YT_BREAKOUT Kanały z nagłym wzrostem wyświetleń:",
+        "breakout_channel_subs_header": "#YT_BREAKOUT Kanały z nagłym wzrostem subskrypcji:",
+        "breakout_line": "{n}. #{channel}: +{gain} dziennie",
+        "breakout_footer": "#youtube #breakout",
+        "daily_top_record_all": "🏆 Najwięcej wyświetleń w historii #YT_DAILY_TOP!",
+        "daily_top_record_category": "🏆 Rekord wyświetleń w tej kategorii!",
+        "record_header": "#YT_REKORD Nowy rekord wszech czasów!",
+        "record_video_views": "Najwięcej wyświetleń filmu z karty Na czasie",
+        "record_video_likes": "Najwięcej polubień filmu z karty Na czasie",
+        "record_video_comments": "Najwięcej komentarzy filmu z karty Na czasie",
+        "record_channel_weekly_views": "Największy tygodniowy wzrost wyświetleń kanału",
+        "record_channel_weekly_subs": "Największy tygodniowy wzrost subskrybentów kanału",
+        "record_scope_all": "",
+        "record_scope_region": " ({region})",
+        "record_scope_category": " w kategorii #{category}",
+        "record_line": "{holder}: {value}",
+        "record_previous": "Poprzedni rekord: {value}",
+        "record_footer": "#youtube #rekord",
+    },
+    "en": {
+        "date_format": "%d.%m.%Y",
+        "daily_top_template": (
+            "#YT_DAILY_TOP in category #{category}\n"
+            "Video: {title}\n"
+            "Views: {views}\n"
+            "#youtube #top #{channel}\n"
+            "{url}"
+        ),
+        "weekly_views_title": "Highest weekly growth in views",
+        "weekly_views_caption": "Highest weekly growth in views on Polish YouTube ({date_range})",
+        "weekly_subs_title": "Highest weekly growth in subscribers",
+        "weekly_subs_caption": "Highest weekly growth in subscribers on Polish YouTube ({date_range})",
+        "categories_title": "Most popular categories this week",
+        "categories_caption": "Most popular categories on Polish YouTube this week",
+        "breakout_total_views_header": "#YT_BREAKOUT Channels with a sudden surge in views:",
+        "breakout_channel_subs_header": "#YT_BREAKOUT Channels with a sudden surge in subscribers:",
+        "breakout_line": "{n}. #{channel}: +{gain} per day",
+        "breakout_footer": "#youtube #breakout",
+        "daily_top_record_all": "🏆 Most views in #YT_DAILY_TOP history!",
+        "daily_top_record_category": "🏆 Record views in this category!",
+        "record_header": "#YT_RECORD New all-time record!",
+        "record_video_views": "Most views of a trending video",
+        "record_video_likes": "Most likes of a trending video",
+        "record_video_comments": "Most comments of a trending video",
+        "record_channel_weekly_views": "Largest weekly growth in channel views",
+        "record_channel_weekly_subs": "Largest weekly growth in channel subscribers",
+        "record_scope_all": "",
+        "record_scope_region": " ({region})",
+        "record_scope_category": " in category #{category}",
+        "record_line": "{holder}: {value}",
+        "record_previous": "Previous record: {value}",
+        "record_footer": "#youtube #record",
+    },
+}
+
+
+def localized(locale: str, key: str, **fields) -> str:
+    """
+    Return a text of a locale, with the fields filled in.
+
+    Args:
+        locale (str): A key of LOCALES.
+        key (str): The name of the text.
+        **fields: Values of the placeholders of the text.
+
+    Returns:
+        str: The text.
+    """
+    text = LOCALES[locale][key]
+    return text.format(**fields) if fields else text
@@ -0,0 +1,69 @@
+"""
+Localized titles over charts rendered once.
+
+The chart jobs render their charts without a title. For every locale the title is rendered
+on its own, as a text-only strip cached per text, style and width, and stacked on top of the
+chart. Posting a chart in several languages then costs a small composition per locale
+instead of a query and a render per account.
+"""
+import functools
+import io
+
+from matplotlib.figure import Figure
+from PIL import Image
+
+DPI = 300
+
+
+@functools.lru_cache(maxsize=64)
+def title_overlay(text: str, width: int, fontsize: float, color: str, background: str,
+                  fontfamily: str = None) -> bytes:
+    """
+    Render a title alone, centered on a strip of the given width.
+
+    Args:
+        text (str): The title.
+        width (int): Width of the strip in pixels, the width of the chart.
+        fontsize (float): Font size in points.
+        color (str): Color of the text.
+        background (str): Color of the strip.
+        fontfamily (str): Font family, the matplotlib default when not provided.
+
+    Returns:
+        bytes: The PNG image. Bytes rather than an image, so the cached value cannot be modified.
+    """
+    height = fontsize * 2 / 72
+    fig = Figure(figsize=(width / DPI, height), dpi=DPI, facecolor=background)
+    fig.text(0.5, 0.5, text, ha='center', va='center', fontsize=fontsize, fontweight='bold', color=color,
+             fontfamily=fontfamily)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=DPI, facecolor=background)
+    return buffer.getvalue()
+
+
+def add_title(chart: bytes, text: str, fontsize: float, color: str, background: str, fontfamily: str = None) -> bytes:
+    """
+    Stack a title on top of a chart.
+
+    Args:
+        chart (bytes): The PNG image of the chart.
+        text (str): The title.
+        fontsize (float): Font size in points.
+        color (str): Color of the text.
+        background (str): Color behind the title.
+        fontfamily (str): Font family, the matplotlib default when not provided.
+
+    Returns:
+        bytes: The PNG image of the titled chart.
+    """
+    chart_image = Image.open(io.BytesIO(chart))
+    overlay = Image.open(io.BytesIO(
+        title_overlay(text, chart_image.width, fontsize, color, background, fontfamily)
+    ))
+
+    canvas = Image.new("RGB", (chart_image.width, overlay.height + chart_image.height), background)
+    canvas.paste(overlay.convert("RGB"), (0, 0))
+    canvas.paste(chart_image.convert("RGB"), (0, overlay.height))
+    buffer = io.BytesIO()
+    canvas.save(buffer, format="PNG")
+    return buffer.getvalue()
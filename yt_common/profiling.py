@@ -0,0 +1,190 @@
+"""
+Opt-in profiling of a single function invocation.
+
+Profiling is enabled per request with the `X-Profile: 1` header or the `?profile=1`
+query parameter, or for every request with the `YT_PROFILE=1` environment variable.
+The entry point then runs under cProfile and tracemalloc, and three files tagged with
+the run id are saved to `PROFILE_OUTPUT`:
+
+- `<function>/<run_id>.prof`: cProfile stats, open with `pstats` or snakeviz,
+- `<function>/<run_id>.stats.txt`: the top functions by cumulative time,
+- `<function>/<run_id>.alloc.txt`: the top allocation sites and the traced peak.
+
+`PROFILE_OUTPUT` is either a local directory (default `/tmp/profiles`, the only
+writable location of a deployed function) or a `gs://bucket/prefix` URL.
+
+tracemalloc is process-wide, so one request is profiled at a time: a request asking for a
+profile while another one is profiled runs unprofiled. cProfile only sees the thread of the
+entry point. The work of the thread pools (the jobs run by the orchestrator DAG, the
+`HttpQueue` dispatches, the publishing to several accounts) shows up as the time spent
+waiting for them, while their allocations are traced with the rest.
+"""
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+DEFAULT_PROFILE_OUTPUT = "/tmp/profiles"
+TRACEMALLOC_FRAMES = 10
+TOP_FUNCTIONS = 50
+TOP_ALLOCATIONS = 25
+
+# Held while a request is profiled
+_PROFILE_LOCK = threading.Lock()
+
+
+def profiling_requested(request) -> bool:
+    """
+    Check whether the invocation should be profiled.
+
+    Args:
+        request (flask.Request): The request object, may be None.
+
+    Returns:
+        bool: True if enabled by header, query parameter or environment variable.
+    """
+    flags = [os.getenv("YT_PROFILE", "")]
+    if request is not None:
+        flags += [request.args.get("profile") or "", request.headers.get("X-Profile") or ""]
+    return any(flag.lower() in ("1", "true", "yes") for flag in flags)
+
+
+class LocalProfileStore:
+    """Saves profiles to a local directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def save(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class GCSProfileStore:
+    """Saves profiles to a Google Cloud Storage bucket."""
+
+    def __init__(self, url: str):
+        from google.cloud import storage
+
+        bucket_name, _, self.prefix = url[len("gs://"):].partition("/")
+        self.bucket = storage.Client().bucket(bucket_name)
+
+    def save(self, name: str, data: bytes) -> str:
+        blob_name = f"{self.prefix.rstrip('/')}/{name}" if self.prefix else name
+        self.bucket.blob(blob_name).upload_from_string(data)
+        return f"gs://{self.bucket.name}/{blob_name}"
+
+
+def get_profile_store(output: str = None):
+    """
+    Build the store for `PROFILE_OUTPUT`.
+
+    Args:
+        output (str): Local directory or `gs://` URL, defaults to the `PROFILE_OUTPUT` variable.
+
+    Returns:
+        LocalProfileStore | GCSProfileStore: The store.
+    """
+    output = output or os.getenv("PROFILE_OUTPUT", DEFAULT_PROFILE_OUTPUT)
+    if output.startswith("gs://"):
+        return GCSProfileStore(output)
+    return LocalProfileStore(output)
+
+
+class Profile:
+    """
+    Result of a profiled block.
+
+    Attributes:
+        locations (list): Where the profile files were saved, filled in when the block exits.
+        traced_peak (int): Peak of the memory traced by tracemalloc, in bytes.
+        error (str): Why the files could not all be saved, None when they were.
+    """
+
+    def __init__(self):
+        self.locations = []
+        self.traced_peak = 0
+        self.error = None
+
+
+def _stats_text(profiler: cProfile.Profile) -> str:
+    buffer = io.StringIO()
+    pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    return buffer.getvalue()
+
+
+def _stats_dump(profiler: cProfile.Profile) -> bytes:
+    with tempfile.NamedTemporaryFile(suffix=".prof") as f:
+        profiler.dump_stats(f.name)
+        return f.read()
+
+
+def _allocations_text(snapshot: tracemalloc.Snapshot, traced_peak: int) -> str:
+    lines = [f"Traced peak: {traced_peak / 2 ** 20:.1f} MiB", ""]
+    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+        lines.append(f"{stat.size / 2 ** 10:10.1f} KiB  {stat.count:8d} blocks  {stat.traceback[0]}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profiled(function_name: str, run_id: str, store=None):
+    """
+    Profile the enclosed block with cProfile and tracemalloc and save the results.
+
+    Only one block is profiled at a time in a process. While another one is, the block runs
+    unprofiled.
+
+    Args:
+        function_name (str): Name of the function, used as the folder of the files.
+        run_id (str): Identifier of the run, used as the file name.
+        store: Where to save the files, defaults to `get_profile_store()`.
+
+    Yields:
+        Profile: Filled in with the saved locations when the block exits, or the error of the
+        save, None when the block runs unprofiled.
+    """
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        yield None
+        return
+    try:
+        with _profiled(function_name, run_id, store) as profile:
+            yield profile
+    finally:
+        _PROFILE_LOCK.release()
+
+
+@contextmanager
+def _profiled(function_name: str, run_id: str, store=None):
+    profile = Profile()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profile
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        profile.traced_peak = tracemalloc.get_traced_memory()[1]
+        if started_tracing:
+            tracemalloc.stop()
+
+        # A failed save is reported on the profile, it must not replace an error of the block
+        prefix = f"{function_name}/{run_id}"
+        try:
+            store = store or get_profile_store()
+            profile.locations.append(store.save(f"{prefix}.prof", _stats_dump(profiler)))
+            profile.locations.append(store.save(f"{prefix}.stats.txt", _stats_text(profiler).encode()))
+            allocations = _allocations_text(snapshot, profile.traced_peak)
+            profile.locations.append(store.save(f"{prefix}.alloc.txt", allocations.encode()))
+        except Exception as error:
+            profile.error = repr(error)
@@ -0,0 +1,174 @@
+"""
+Publishing of the tweets to every configured account.
+
+The targets are read from the PUBLISH_TARGETS environment variable, a JSON list such as:
+
+    [{"name": "pl", "locale": "pl", "api_key": "...", "api_key_secret": "...",
+      "access_token": "...", "access_token_secret": "..."},
+     {"name": "en", "locale": "en", ...}]
+
+Without it, the account of the API_KEY, API_KEY_SECRET, ACCESS_TOKEN and ACCESS_TOKEN_SECRET
+variables is the only target, with the DEFAULT_LOCALE. The jobs query and render once, then
+`publish` composes the posts once per locale and sends them to all targets concurrently, so
+another account costs its posts only.
+"""
+import collections
+import contextvars
+import functools
+import io
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests_oauthlib import OAuth1
+
+from yt_common.dry_run import record_tweet
+from yt_common.instrumentation import TWEET, span
+from yt_common.locales import DEFAULT_LOCALE, LOCALES
+
+API_URL = "https://api.twitter.com/2/tweets"
+
+CREDENTIAL_KEYS = ("api_key", "api_key_secret", "access_token", "access_token_secret")
+
+MAX_CONCURRENT_TARGETS = 8
+
+# A tweet: its text and optionally an image (PNG bytes) uploaded under the filename
+Post = collections.namedtuple("Post", ["text", "image", "filename"], defaults=(None, None))
+
+
+@functools.lru_cache(maxsize=None)
+def load_targets() -> tuple:
+    """
+    Load the publishing targets from the environment.
+
+    Returns:
+        tuple: Dicts with the 'name', 'locale' and the credentials of every target.
+
+    Raises:
+        ValueError: When a target misses a credential or has an unknown locale.
+    """
+    config = os.getenv('PUBLISH_TARGETS')
+    if not config:
+        return ({
+            "name": "default",
+            "locale": DEFAULT_LOCALE,
+            "api_key": os.getenv('API_KEY'),
+            "api_key_secret": os.getenv('API_KEY_SECRET'),
+            "access_token": os.getenv('ACCESS_TOKEN'),
+            "access_token_secret": os.getenv('ACCESS_TOKEN_SECRET'),
+        },)
+
+    targets = []
+    for n, target in enumerate(json.loads(config)):
+        target = dict(target, name=target.get("name", str(n)), locale=target.get("locale", DEFAULT_LOCALE))
+        missing = [key for key in CREDENTIAL_KEYS if not target.get(key)]
+        if missing:
+            raise ValueError(f"Publishing target {target['name']} misses {', '.join(missing)}")
+        if target["locale"] not in LOCALES:
+            raise ValueError(f"Publishing target {target['name']} has an unknown locale {target['locale']!r}")
+        targets.append(target)
+    if not targets:
+        raise ValueError("PUBLISH_TARGETS lists no target")
+    return tuple(targets)
+
+
+def _oauth(target: dict) -> OAuth1:
+    return OAuth1(target["api_key"], target["api_key_secret"], target["access_token"], target["access_token_secret"])
+
+
+def upload_image(target: dict, image: bytes, filename: str) -> str:
+    """
+    Upload an image to the account of a target.
+
+    Args:
+        target (dict): The target.
+        image (bytes): The image.
+        filename (str): The name of the image, its extension gives the media type.
+
+    Returns:
+        str: The media id.
+    """
+    import tweepy
+
+    tweepy_auth = tweepy.OAuth1UserHandler(
+        target["api_key"], target["api_key_secret"], target["access_token"], target["access_token_secret"]
+    )
+    post = tweepy.API(tweepy_auth).simple_upload(filename, file=io.BytesIO(image))
+    return re.search("media_id=(.+?),", str(post)).group(1)
+
+
+def post_tweet(target: dict, post: Post) -> bool:
+    """
+    Post a tweet, with its image if any, to the account of a target.
+
+    Args:
+        target (dict): The target.
+        post (Post): The tweet.
+
+    Returns:
+        bool: Whether the tweet was created.
+    """
+    payload = {"text": post.text}
+    size = len(post.text.encode())
+    api_calls = 1
+    if post.image is not None:
+        size += len(post.image)
+        api_calls += 1
+
+    with span(TWEET, api_calls=api_calls, bytes=size):
+        if post.image is not None:
+            payload["media"] = {"media_ids": [upload_image(target, post.image, post.filename)]}
+        response = requests.post(API_URL, json=payload, auth=_oauth(target))
+
+    if response.status_code != 201:
+        print(f"Failed to post tweet to {target['name']}:", response.status_code, response.text)
+    return response.status_code == 201
+
+
+def record_post(target: dict, post: Post) -> bool:
+    """Write a tweet to the dry-run file, its image to the working directory."""
+    image_path = None
+    if post.image is not None:
+        image_path = f"{target['name']}_{post.filename}"
+        with open(image_path, "wb") as f:
+            f.write(post.image)
+    record_tweet(post.text, image_path, target=target["name"])
+    return True
+
+
+def _publish_to(target: dict, posts: list, dry_run: bool) -> int:
+    posted = 0
+    for post in posts:
+        if (record_post if dry_run else post_tweet)(target, post):
+            posted += 1
+    return posted
+
+
+def publish(compose, targets: tuple = None, dry_run: bool = False) -> int:
+    """
+    Post the tweets of a job to every target.
+
+    Args:
+        compose (callable): Called with a locale, returns the list of `Post` of that locale.
+            It is called once per locale, whatever the number of targets sharing it.
+        targets (tuple): The targets, defaults to `load_targets()`.
+        dry_run (bool): Write the tweets to the dry-run file instead of posting them.
+
+    Returns:
+        int: The number of posted tweets, over all targets.
+    """
+    targets = targets or load_targets()
+    posts = {}
+    for target in targets:
+        if target["locale"] not in posts:
+            posts[target["locale"]] = compose(target["locale"])
+
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_TARGETS, len(targets))) as executor:
+        # Copy the context for every target, so their spans are recorded in the current run
+        futures = [
+            executor.submit(contextvars.copy_context().run, _publish_to, target, posts[target["locale"]], dry_run)
+            for target in targets
+        ]
+        return sum(future.result() for future in futures)
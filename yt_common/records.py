@@ -0,0 +1,152 @@
+"""
+Reader of the all-time records index maintained by `youtube_data_pipeline`.
+
+The index holds the top entries of every metric overall, per category and per region.
+The ingestion updates it from the rows of each run only, so it never scans the history.
+It has a few rows per metric and scope, so the jobs load it whole. After that, every
+record check is a dictionary lookup.
+"""
+import collections
+import os
+
+import pandas as pd
+
+from yt_common.clients import get_bigquery_client
+from yt_common.instrumentation import BQ_QUERY, span
+
+# Entries kept per leaderboard by the ingestion
+RECORDS_TOP_K = int(os.getenv('RECORDS_TOP_K', '10'))
+
+# Metrics of the trending videos, the columns of their snapshots
+VIDEO_VIEWS = "video_views"
+VIDEO_LIKES = "video_likes"
+VIDEO_COMMENTS = "video_comments"
+VIDEO_METRICS = (VIDEO_VIEWS, VIDEO_LIKES, VIDEO_COMMENTS)
+
+# Metrics of the channels: metric -> counter whose gain over WEEKLY_GAIN_DAYS days is ranked
+CHANNEL_WEEKLY_VIEWS = "channel_weekly_views"
+CHANNEL_WEEKLY_SUBS = "channel_weekly_subs"
+CHANNEL_METRICS = {
+    CHANNEL_WEEKLY_VIEWS: "total_views",
+    CHANNEL_WEEKLY_SUBS: "channel_subs",
+}
+WEEKLY_GAIN_DAYS = 7
+
+# Scopes of the leaderboards, the "all" scope has an empty scope value
+ALL = "all"
+CATEGORY = "category"
+REGION = "region"
+SCOPES = (ALL, REGION, CATEGORY)
+
+RECORD_COLUMNS = [
+    "metric", "scope", "scope_value", "rank", "entity_id", "entity_name", "value", "achieved_on",
+    "previous_entity_id", "previous_value", "broken_on",
+]
+
+Record = collections.namedtuple("Record", RECORD_COLUMNS)
+
+
+def get_records(project_id: str, dataset_name: str, table_name: str):
+    """
+    Retrieve the whole records index.
+
+    Args:
+        project_id (str): The Google Cloud project.
+        dataset_name (str): The BigQuery dataset.
+        table_name (str): The records table.
+
+    Returns:
+        pandas.DataFrame: The rows of the index, shaped like RECORD_COLUMNS.
+    """
+    query = f"""
+    SELECT
+        {', '.join(RECORD_COLUMNS)}
+    FROM
+        `{project_id}.{dataset_name}.{table_name}`
+    """
+
+    with span(BQ_QUERY) as query_span:
+        records_query = get_bigquery_client(project_id).query(query)
+        records_df = records_query.to_dataframe()
+        query_span.add(bytes=records_query.total_bytes_processed, rows=len(records_df))
+
+    return records_df
+
+
+class RecordsIndex:
+    """
+    Leaderboards of the records index, keyed by metric, scope and scope value.
+
+    Args:
+        records_df (pandas.DataFrame): The rows of the index, from `get_records`.
+        top_k (int): The number of entries a leaderboard holds once full.
+    """
+
+    def __init__(self, records_df, top_k: int = RECORDS_TOP_K):
+        self.top_k = top_k
+        self._boards = {}
+        for row in records_df.sort_values("rank")[RECORD_COLUMNS].itertuples(index=False, name=None):
+            record = Record(*row)
+            self._boards.setdefault((record.metric, record.scope, str(record.scope_value)), []).append(record)
+
+    def board(self, metric: str, scope: str = ALL, scope_value: str = "") -> list:
+        """Return the `Record` entries of a leaderboard by rank, empty when it has none."""
+        return self._boards.get((metric, scope, str(scope_value)), [])
+
+    def record(self, metric: str, scope: str = ALL, scope_value: str = ""):
+        """Return the `Record` of the leader of a leaderboard, None when it has none."""
+        board = self.board(metric, scope, scope_value)
+        return board[0] if board else None
+
+    def is_record(self, metric: str, value, scope: str = ALL, scope_value: str = "") -> bool:
+        """
+        Check whether a value equals or beats the record of a leaderboard.
+
+        Args:
+            metric (str): The metric.
+            value: The value to check.
+            scope (str): ALL, CATEGORY or REGION.
+            scope_value (str): The category id or region code, empty for ALL.
+
+        Returns:
+            bool: True when the value is at least the record. A leaderboard without entries has
+            no record to beat, so it returns False.
+        """
+        record = self.record(metric, scope, scope_value)
+        return record is not None and value >= record.value
+
+    def holds_record(self, metric: str, entity_id: str, scope: str = ALL, scope_value: str = "") -> bool:
+        """Check whether a video or channel is the leader of a leaderboard."""
+        record = self.record(metric, scope, scope_value)
+        return record is not None and record.entity_id == entity_id
+
+    def rank_of(self, metric: str, value, scope: str = ALL, scope_value: str = ""):
+        """
+        Return the rank a value would take in a leaderboard, None when it falls outside its top_k entries.
+
+        A leaderboard not full yet has room for any value.
+        """
+        board = self.board(metric, scope, scope_value)
+        rank = 1 + sum(1 for record in board if record.value > value)
+        return rank if rank <= self.top_k else None
+
+    def broken_on(self, day) -> list:
+        """
+        Return the records taken from another video or channel on a day.
+
+        Args:
+            day (datetime.date): The day of the capture.
+
+        Returns:
+            list: The `Record` of the leaders, ordered by SCOPES and then by metric.
+        """
+        broken = [
+            board[0] for board in self._boards.values()
+            if pd.notna(board[0].broken_on) and pd.Timestamp(board[0].broken_on).date() == day
+        ]
+        return sorted(broken, key=lambda record: (SCOPES.index(record.scope), record.metric, record.scope_value))
+
+
+def load_records(project_id: str, dataset_name: str, table_name: str, top_k: int = RECORDS_TOP_K) -> RecordsIndex:
+    """Load the records index, see `get_records`."""
+    return RecordsIndex(get_records(project_id, dataset_name, table_name), top_k)
@@ -0,0 +1,51 @@
+"""
+Reader of the per-video velocity table maintained by `youtube_data_pipeline`.
+
+The table holds one row per recently trending video with its first capture, its last
+views, the number of days it trended and its velocity in views per hour, so the
+fastest rising videos are read without scanning the daily history.
+"""
+import datetime
+
+from yt_common.clients import get_bigquery_client
+from yt_common.instrumentation import BQ_QUERY, span
+
+NUM_OF_RISING_VIDEOS = 5
+
+
+def get_fastest_rising_videos(project_id: str, dataset_name: str, table_name: str,
+                              limit: int = NUM_OF_RISING_VIDEOS, run_date=None):
+    """
+    Retrieve the videos with the highest velocity among the ones trending on the run date or the day before.
+
+    Args:
+        project_id (str): The Google Cloud project.
+        dataset_name (str): The BigQuery dataset.
+        table_name (str): The velocity table.
+        limit (int): The number of videos.
+        run_date (datetime.date): The day of the run, defaults to today.
+
+    Returns:
+        pandas.DataFrame: The 'video_id', 'channel_id', 'video_title', 'last_views', 'days_trending'
+        and 'views_per_hour' of the videos, sorted by velocity.
+    """
+    run_date = (run_date or datetime.date.today()).strftime('%Y-%m-%d')
+    query = f"""
+    SELECT
+        video_id, channel_id, video_title, last_views, days_trending, views_per_hour
+    FROM
+        `{project_id}.{dataset_name}.{table_name}`
+    WHERE
+        DATE(last_captured_at) BETWEEN DATE_SUB(DATE('{run_date}'), INTERVAL 1 DAY) AND DATE('{run_date}')
+        AND views_per_hour IS NOT NULL
+    ORDER BY
+        views_per_hour DESC
+    LIMIT {limit}
+    """
+
+    with span(BQ_QUERY) as query_span:
+        rising_query = get_bigquery_client(project_id).query(query)
+        rising_df = rising_query.to_dataframe()
+        query_span.add(bytes=rising_query.total_bytes_processed, rows=len(rising_df))
+
+    return rising_df